@@ -0,0 +1,291 @@
+"""
+batch_analyze.py
+
+Headless batch analysis of recorded driving footage.
+
+Takes video files and/or directories, shards the files across a process
+pool (each worker holds its own FaceLandmarker) and runs every frame through
+the same DrowsinessDetector the Streamlit app uses, so offline and live
+scores match. Per-frame EAR / alarm results are streamed to one JSONL file
+per video, or written as a columnar NumPy `.npz` archive.
+
+Usage:
+    python batch_analyze.py recordings/ extra.mp4 -o results/ --workers 4
+    python batch_analyze.py recordings/ -o results/ --format npz
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Adjust path to ensure src imports work
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import *
+from src.core.detector import DrowsinessDetector
+from src.core.landmarker import LandmarkerPool
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+
+# Per-worker landmarker (one per process, reused across files)
+_WORKER_POOL = None
+
+
+def collect_videos(paths):
+    """
+    Expands files and directories (recursively) into videos.
+
+    Returns:
+        List[Tuple[str, str]]: Sorted (video path, name) pairs, where the
+            name is the path relative to the input it was found under (the
+            basename for files given directly).
+    """
+    videos = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for f in files:
+                    if f.lower().endswith(VIDEO_EXTENSIONS):
+                        video = os.path.normpath(os.path.join(root, f))
+                        videos.setdefault(video, os.path.relpath(video, path))
+        elif os.path.isfile(path):
+            videos.setdefault(os.path.normpath(path), os.path.basename(path))
+        else:
+            print(f"[WARNING] Skipping missing path: {path}")
+    return sorted(videos.items())
+
+
+def assign_outputs(videos, output_dir, extension):
+    """
+    Maps each video to its result file, mirroring its path below the input.
+
+    `day1/cam.mp4` -> `<output_dir>/day1/cam.<extension>`. Videos that differ
+    only in their extension keep it in the name (`a_mp4`, `a_avi`).
+
+    Raises:
+        ValueError: If two videos would still write the same file (e.g. the
+            same relative path under two input directories).
+    """
+    stems = {}
+    for video, name in videos:
+        stems.setdefault(os.path.splitext(name)[0], []).append(video)
+
+    targets = {}
+    for video, name in videos:
+        stem, video_ext = os.path.splitext(name)
+        if len(stems[stem]) > 1:
+            stem = f"{stem}_{video_ext.lstrip('.').lower()}"
+        targets.setdefault(os.path.join(output_dir, f"{stem}.{extension}"), []).append(video)
+
+    clashes = {path: sources for path, sources in targets.items() if len(sources) > 1}
+    if clashes:
+        lines = [f"  {path} <- {', '.join(sources)}" for path, sources in sorted(clashes.items())]
+        raise ValueError("Several videos map to the same result file:\n" + "\n".join(lines))
+    return {sources[0]: path for path, sources in targets.items()}
+
+
+def _init_worker(num_faces=MAX_FACES):
+    """Process-pool initializer: one landmarker per worker, single-threaded OpenCV."""
+    global _WORKER_POOL
+    cv2.setNumThreads(1)
+    _WORKER_POOL = LandmarkerPool(max_size=1, num_faces=num_faces)
+    _WORKER_POOL.warm_up(1)
+
+
+class _JsonlWriter:
+    """Streams one JSON record per frame."""
+
+    def __init__(self, path):
+        self._file = open(path, "w")
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class _NpzWriter:
+    """Fills fixed-size NumPy column chunks and writes one `.npz` archive on close."""
+
+    CHUNK_ROWS = 4096
+
+    def __init__(self, path):
+        self._path = path
+        self._dtypes = None
+        self._chunks = {}
+        self._current = None
+        self._fill = 0
+
+    def write(self, record):
+        if self._dtypes is None:
+            # Column types are fixed by the first record
+            self._dtypes = {key: np.asarray(value).dtype for key, value in record.items()}
+            self._chunks = {key: [] for key in record}
+        if self._current is None or self._fill == self.CHUNK_ROWS:
+            if self._current is not None:
+                for key, column in self._current.items():
+                    self._chunks[key].append(column)
+            self._current = {key: np.empty(self.CHUNK_ROWS, dtype) for key, dtype in self._dtypes.items()}
+            self._fill = 0
+        for key, value in record.items():
+            self._current[key][self._fill] = value
+        self._fill += 1
+
+    def close(self):
+        columns = {}
+        for key, chunks in self._chunks.items():
+            columns[key] = np.concatenate(chunks + [self._current[key][:self._fill]])
+        np.savez_compressed(self._path, **columns)
+
+
+def analyze_video(video_path, output_path, output_format, tracking, face_roi):
+    """
+    Runs the detection core over every frame of one video.
+
+    Failures (unreadable file, decode or landmarker errors) are reported in
+    the summary instead of raised, so one bad video does not abort the batch.
+
+    Returns:
+        dict: Summary (frames, alarm frames, wall and CPU seconds), or the
+            video and an `error` message.
+    """
+    try:
+        return _analyze_video(video_path, output_path, output_format, tracking, face_roi)
+    except Exception as e:
+        return {"video": video_path, "error": f"{type(e).__name__}: {e}"}
+
+
+def _analyze_video(video_path, output_path, output_format, tracking, face_roi):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return {"video": video_path, "error": "could not open video"}
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    writer = landmarker = detector = None
+    frames = 0
+    alarm_frames = 0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        writer = _JsonlWriter(output_path) if output_format == "jsonl" else _NpzWriter(output_path)
+        landmarker = _WORKER_POOL.checkout()
+        detector = DrowsinessDetector(tracking=tracking, face_roi=face_roi,
+                                      landmarker=landmarker, adaptive=False,
+                                      num_faces=_WORKER_POOL.num_faces)
+
+        while True:
+            success, image = cap.read()
+            if not success:
+                break
+
+            # Container timestamps, falling back to the nominal frame rate
+            timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if timestamp_ms <= 0 and frames > 0:
+                timestamp_ms = frames * 1000.0 / fps
+
+            result = detector.process(image, timestamp_ms)
+            left_ear, right_ear = (result.ears[0].tolist() if result.face_found
+                                   else (float("nan"), float("nan")))
+            writer.write({
+                "frame": frames,
+                "timestamp_ms": result.timestamp_ms,
+                "face": result.face_found,
+                "faces": len(result.face_ids),
+                "ear": result.ear,
+                "left_ear": left_ear,
+                "right_ear": right_ear,
+                "alarm": result.alarm_on,
+                "closed_ms": result.closed_ms,
+                "face_alarms": int(result.face_alarms.sum()),
+                "perclos": result.fatigue.perclos if result.fatigue else float("nan"),
+                "blink_rate": result.fatigue.blink_rate if result.fatigue else float("nan"),
+                "mean_blink_ms": result.fatigue.mean_blink_ms if result.fatigue else float("nan"),
+            })
+            frames += 1
+            alarm_frames += result.alarm_on
+    finally:
+        if writer is not None:
+            writer.close()
+        if detector is not None:
+            detector.close()
+        if landmarker is not None:
+            landmarker.release()
+        cap.release()
+
+    return {
+        "video": video_path,
+        "output": output_path,
+        "frames": frames,
+        "alarm_frames": alarm_frames,
+        "wall_s": time.perf_counter() - wall_start,
+        "cpu_s": time.process_time() - cpu_start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline drowsiness analysis of recorded video")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories")
+    parser.add_argument("-o", "--output-dir", default="batch_results",
+                        help="Directory for per-video result files")
+    parser.add_argument("--format", choices=("jsonl", "npz"), default="jsonl",
+                        help="Per-frame output format (JSONL stream or columnar .npz)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (each holds its own landmarker)")
+    parser.add_argument("--track", action="store_true", default=EYE_TRACKING_ENABLED,
+                        help="Use optical-flow eye tracking between keyframes")
+    parser.add_argument("--no-roi", dest="face_roi", action="store_false", default=FACE_ROI_ENABLED,
+                        help="Always run inference on the full frame")
+    parser.add_argument("--faces", type=int, default=MAX_FACES,
+                        help="Maximum number of faces to monitor per frame")
+    args = parser.parse_args()
+
+    videos = collect_videos(args.inputs)
+    if not videos:
+        print("[ERROR] No video files found.")
+        sys.exit(1)
+    try:
+        outputs = assign_outputs(videos, args.output_dir, args.format)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    workers = max(1, min(args.workers, len(videos)))
+    print(f"[INFO] Analysing {len(videos)} video(s) with {workers} worker(s)...")
+
+    # MediaPipe is not fork-safe: always spawn fresh interpreters
+    context = multiprocessing.get_context("spawn")
+    total_frames = 0
+    total_cpu = 0.0
+    wall_start = time.perf_counter()
+    with context.Pool(workers, initializer=_init_worker, initargs=(args.faces,)) as pool:
+        jobs = [pool.apply_async(analyze_video, (video, outputs[video], args.format,
+                                                 args.track, args.face_roi))
+                for video, _ in videos]
+        for job in jobs:
+            summary = job.get()
+            if "error" in summary:
+                print(f"[ERROR] {summary['video']}: {summary['error']}")
+                continue
+            total_frames += summary["frames"]
+            total_cpu += summary["cpu_s"]
+            fps = summary["frames"] / summary["wall_s"] if summary["wall_s"] else 0.0
+            print(f"[INFO] {summary['video']}: {summary['frames']} frames, "
+                  f"{summary['alarm_frames']} alarm frames, {fps:.1f} fps -> {summary['output']}")
+    wall = time.perf_counter() - wall_start
+
+    print(f"[INFO] Total: {total_frames} frames in {wall:.1f}s "
+          f"({total_frames / wall:.1f} fps overall, {total_frames / wall / workers:.1f} fps/core wall, "
+          f"{total_frames / total_cpu if total_cpu else 0.0:.1f} fps per CPU-second)")
+
+
+if __name__ == "__main__":
+    main()
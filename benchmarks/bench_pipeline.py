@@ -0,0 +1,427 @@
+"""
+benchmarks/bench_pipeline.py
+
+Reproducible benchmark for the detection pipeline.
+
+Drives the real code paths offline:
+    processor    the Streamlit app's DrowsinessProcessor.recv (decode, detect, render, encode)
+    results_only the same processor with annotate=False (decode, detect)
+    live_stream  the annotating processor with LIVE_STREAM (async) inference
+    local_debug  local_debug.py's DrowsinessDetector + draw_overlay loop
+
+over synthetic frames and/or recorded clips, at several resolutions and
+face counts. For N faces the clip is tiled N times into a grid before
+resizing, so a single-driver recording yields multi-face frames.
+
+Synthetic cases (seeded noise) swap MediaPipe for a stand-in landmarker
+that returns N fixed faces laid out on the same grid, so face ROI, EAR
+scoring, alarm state and overlay rendering all run; their "inference"
+stage measures only that stand-in, not the model. Cases in which no face
+was found (e.g. a clip the model sees no driver in) are flagged with a
+warning, since they only measure the no-face path.
+
+Each case runs in a fresh spawned interpreter so peak RSS is per case.
+Reported per case: throughput (fps), per-stage and end-to-end latency
+percentiles, peak RSS and transient allocation bytes per frame
+(tracemalloc peak, measured in a separate pass so it does not skew
+timing). Results are saved as JSON and can be compared against a
+previous run with --baseline.
+
+Usage:
+    python benchmarks/bench_pipeline.py --output bench.json
+    python benchmarks/bench_pipeline.py --clip drive.mp4 --faces 1 2 4 \\
+        --resolutions 720p 1080p --baseline bench.json --output bench_new.json
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+TARGETS = ("processor", "results_only", "live_stream", "local_debug")
+QUANTILES = (50, 95, 99)
+CLIP_FRAMES = 90          # distinct frames preloaded per case (cycled)
+ALLOC_FRAMES = 30         # frames in the tracemalloc pass
+
+
+# -----------------------------------------------------------------------------
+# FRAME SOURCES
+# -----------------------------------------------------------------------------
+def _tile(frame, faces):
+    """Tiles a frame into a near-square grid with `faces` cells."""
+    if faces <= 1:
+        return frame
+    cols = int(np.ceil(np.sqrt(faces)))
+    rows = int(np.ceil(faces / cols))
+    cells = [frame] * faces + [np.zeros_like(frame)] * (rows * cols - faces)
+    return np.vstack([np.hstack(cells[r * cols:(r + 1) * cols]) for r in range(rows)])
+
+
+def load_frames(source, resolution, faces, count=CLIP_FRAMES):
+    """Returns `count` BGR frames at `resolution` for a clip path or 'synthetic'."""
+    width, height = RESOLUTIONS[resolution]
+    if source == "synthetic":
+        rng = np.random.default_rng(0)
+        base = cv2.GaussianBlur((rng.random((height, width, 3)) * 255).astype(np.uint8), (9, 9), 0)
+        return [np.roll(base, 4 * i, axis=1) for i in range(count)]
+
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < count:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(cv2.resize(_tile(frame, faces), (width, height),
+                                 interpolation=cv2.INTER_AREA))
+    cap.release()
+    if not frames:
+        raise RuntimeError(f"Could not read frames from {source}")
+    return frames
+
+
+# -----------------------------------------------------------------------------
+# SYNTHETIC FACES
+# -----------------------------------------------------------------------------
+def _face_mesh(cx, cy, size, aspect):
+    """
+    Static 478-point mesh of one face with open eyes (EAR 0.3).
+
+    Only the points the pipeline reads are placed: the face oval on an
+    ellipse and the six EAR points of each eye; the rest sit at the centre.
+    `size` is the face height and `aspect` the width / height of the image,
+    both in normalized units.
+    """
+    from src.config import FACE_OVAL_INDICES, LEFT_EYE_INDICES, RIGHT_EYE_INDICES
+
+    points = np.tile([cx, cy], (478, 1))
+    angles = np.linspace(0.0, 2.0 * np.pi, len(FACE_OVAL_INDICES), endpoint=False)
+    points[FACE_OVAL_INDICES] = np.stack([cx + 0.35 * size * np.sin(angles) / aspect,
+                                          cy - 0.5 * size * np.cos(angles)], axis=1)
+    # p1..p6: outer corner, two upper lid points, inner corner, two lower lid points
+    eye = np.array([(-1.0, 0.0), (-0.33, -0.3), (0.33, -0.3),
+                    (1.0, 0.0), (0.33, 0.3), (-0.33, 0.3)]) * 0.1 * size
+    for indices, side in ((LEFT_EYE_INDICES, -1.0), (RIGHT_EYE_INDICES, 1.0)):
+        outline = eye if side > 0 else eye * [-1.0, 1.0]
+        points[indices] = np.stack([cx + (side * 0.2 * size + outline[:, 0]) / aspect,
+                                    cy - 0.1 * size + outline[:, 1]], axis=1)
+    return points
+
+
+class _FixedLandmarker:
+    """
+    FaceLandmarker stand-in for synthetic frames: returns the same `faces`
+    faces for every frame, one per cell of the `_tile` grid.
+
+    Face ROI patches get the faces where a real landmarker would find them
+    in the padded crop around the last result, so the ROI stays put instead
+    of drifting. Results are built once per input shape, so the stand-in
+    costs next to nothing.
+    """
+
+    def __init__(self, faces, result_callback=None):
+        self.faces = faces
+        self.result_callback = result_callback
+        self._frame_px = None       # (faces, 478, 2) pixel coordinates in the full frame
+        self._results = {}
+
+    def _frame_points(self, height, width):
+        cols = int(np.ceil(np.sqrt(self.faces)))
+        rows = int(np.ceil(self.faces / cols))
+        points = np.stack([_face_mesh((i % cols + 0.5) / cols, (i // cols + 0.5) / rows,
+                                      0.6 / max(rows, cols), width / height)
+                           for i in range(self.faces)])
+        self._frame_px = points * [width, height]
+        return points
+
+    def _patch_points(self):
+        from src.config import FACE_OVAL_INDICES, FACE_ROI_PADDING
+
+        oval = self._frame_px[:, FACE_OVAL_INDICES].reshape(-1, 2)
+        low, high = oval.min(axis=0), oval.max(axis=0)
+        side = (high - low).max() * (1.0 + 2.0 * FACE_ROI_PADDING)
+        return (self._frame_px - ((low + high) / 2.0 - side / 2.0)) / side
+
+    def _result(self, image):
+        from src.config import FACE_ROI_INPUT_SIZE
+
+        shape = (image.height, image.width) if hasattr(image, "height") else image.shape[:2]
+        # A square patch after the first frame is a face ROI crop (before it,
+        # e.g. the pool's warm-up image, it is treated as a frame)
+        patch = shape == (FACE_ROI_INPUT_SIZE, FACE_ROI_INPUT_SIZE) and self._frame_px is not None
+        result = self._results.get((shape, patch))
+        if result is None:
+            from mediapipe.tasks.python.components.containers import NormalizedLandmark
+
+            points = self._patch_points() if patch else self._frame_points(*shape)
+            faces = [[NormalizedLandmark(x=float(x), y=float(y), z=0.0) for x, y in mesh]
+                     for mesh in points]
+            result = types.SimpleNamespace(face_landmarks=faces, face_blendshapes=[],
+                                           facial_transformation_matrixes=[])
+            self._results[(shape, patch)] = result
+        return result
+
+    def detect_for_video(self, image, timestamp_ms):
+        return self._result(image)
+
+    def detect_async(self, image, timestamp_ms):
+        self.result_callback(self._result(image), image, timestamp_ms)
+
+    def close(self):
+        pass
+
+
+def _use_fixed_landmarker(faces):
+    """Makes every landmarker created in this interpreter a `_FixedLandmarker`."""
+    from src.core import landmarker
+
+    def create(num_faces, model_path, running_mode, result_callback=None):
+        return _FixedLandmarker(min(faces, num_faces), result_callback)
+
+    landmarker._create = create
+
+
+# -----------------------------------------------------------------------------
+# TARGET DRIVERS
+# -----------------------------------------------------------------------------
+class _ProcessorDriver:
+    """Feeds av.VideoFrames through the app's DrowsinessProcessor.recv."""
+
+    def __init__(self, frames, faces, annotate=True, live_stream=False):
+        import av
+        from src.processor import DrowsinessProcessor
+
+        # No telemetry files from benchmark runs
+        self.processor = DrowsinessProcessor(num_faces=faces, annotate=annotate,
+                                             live_stream=live_stream, telemetry=False)
+        self.metrics = self.processor.metrics
+        self.frames = [av.VideoFrame.from_ndarray(f, format="bgr24") for f in frames]
+        self.time_base = Fraction(1, 90000)
+
+    def step(self, index):
+        frame = self.frames[index % len(self.frames)]
+        frame.pts = index * 3000
+        frame.time_base = self.time_base
+        self.processor.recv(frame)
+
+    def face_found(self):
+        return self.processor.detector.eye_points is not None
+
+    def close(self):
+        self.processor.on_ended()
+
+
+class _LocalDebugDriver:
+    """Runs local_debug.py's per-frame work (detector + overlay) on BGR frames."""
+
+    def __init__(self, frames, faces):
+        import local_debug
+        from src.core.detector import DrowsinessDetector
+        from src.core.metrics import SessionMetrics
+
+        self._draw = local_debug.draw_overlay
+        self.metrics = SessionMetrics("bench")
+        self.detector = DrowsinessDetector(metrics=self.metrics, num_faces=faces)
+        self.frames = frames
+
+    def step(self, index):
+        image = self.frames[index % len(self.frames)].copy()
+        result = self.detector.process(image, index * 1000.0 / 30.0)
+        start = time.perf_counter()
+        self._draw(image, result)
+        self.metrics.observe("render", time.perf_counter() - start)
+
+    def face_found(self):
+        return self.detector.eye_points is not None
+
+    def close(self):
+        self.detector.close()
+
+
+class _ResultsOnlyDriver(_ProcessorDriver):
+    """DrowsinessProcessor in results-only mode (no overlay, no re-encode)."""
+
+    def __init__(self, frames, faces):
+        super().__init__(frames, faces, annotate=False)
+
+
+class _LiveStreamDriver(_ProcessorDriver):
+    """DrowsinessProcessor with LIVE_STREAM inference (frame path does not wait)."""
+
+    def __init__(self, frames, faces):
+        super().__init__(frames, faces, live_stream=True)
+
+
+DRIVERS = {"processor": _ProcessorDriver, "results_only": _ResultsOnlyDriver,
+           "live_stream": _LiveStreamDriver, "local_debug": _LocalDebugDriver}
+
+
+# -----------------------------------------------------------------------------
+# CASE RUNNER (executes in a spawned interpreter)
+# -----------------------------------------------------------------------------
+def run_case(case):
+    if case["single_thread"]:
+        cv2.setNumThreads(1)
+    if case["source"] == "synthetic":
+        _use_fixed_landmarker(case["faces"])
+    frames = load_frames(case["source"], case["resolution"], case["faces"])
+    driver = DRIVERS[case["target"]](frames, case["faces"])
+
+    index = itertools.count()
+    for _ in range(case["warmup"]):
+        driver.step(next(index))
+    driver.metrics.reset()
+
+    # Timed pass
+    totals = np.empty(case["frames"])
+    face_frames = 0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for i in range(case["frames"]):
+        start = time.perf_counter()
+        driver.step(next(index))
+        totals[i] = time.perf_counter() - start
+        face_frames += driver.face_found()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    stages = {}
+    for name, hist in driver.metrics.stages.items():
+        samples = hist.window()
+        if samples.size:
+            stages[name] = _percentiles_ms(samples)
+
+    # Allocation pass
+    tracemalloc.start()
+    alloc = np.empty(ALLOC_FRAMES)
+    for i in range(ALLOC_FRAMES):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        driver.step(next(index))
+        _, peak = tracemalloc.get_traced_memory()
+        alloc[i] = peak - before
+    tracemalloc.stop()
+
+    driver.close()
+    return {
+        **{k: case[k] for k in ("target", "source", "resolution", "faces")},
+        "frames": case["frames"],
+        "face_ratio": face_frames / case["frames"],
+        "fps": case["frames"] / wall,
+        "fps_per_cpu_second": case["frames"] / cpu if cpu else None,
+        "latency_ms": _percentiles_ms(totals),
+        "stages_ms": stages,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "alloc_bytes_per_frame": float(np.mean(alloc)),
+    }
+
+
+def _percentiles_ms(samples):
+    values = np.percentile(samples * 1000.0, QUANTILES)
+    return {f"p{q}": round(float(v), 4) for q, v in zip(QUANTILES, values)}
+
+
+# -----------------------------------------------------------------------------
+# REPORTING
+# -----------------------------------------------------------------------------
+def case_key(result):
+    return (result["target"], os.path.basename(result["source"]), result["resolution"], result["faces"])
+
+
+def print_result(result, baseline=None):
+    line = (f"{result['target']:<12} {os.path.basename(result['source']):<16} "
+            f"{result['resolution']:>6} x{result['faces']}  "
+            f"{result['fps']:8.1f} fps  p50 {result['latency_ms']['p50']:7.2f} ms  "
+            f"p99 {result['latency_ms']['p99']:7.2f} ms  "
+            f"rss {result['peak_rss_mb']:7.1f} MB  alloc {result['alloc_bytes_per_frame'] / 1024:8.1f} KiB/frame")
+    if baseline is not None:
+        fps_delta = (result["fps"] / baseline["fps"] - 1.0) * 100.0
+        p50_delta = (result["latency_ms"]["p50"] / baseline["latency_ms"]["p50"] - 1.0) * 100.0
+        line += f"  [fps {fps_delta:+.1f}%, p50 {p50_delta:+.1f}% vs baseline]"
+    print(line)
+    if not result.get("face_ratio"):
+        print(f"[WARNING] No face found in {os.path.basename(result['source'])}: "
+              f"this case only measures the no-face path")
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the drowsiness detection pipeline")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--faces", nargs="+", type=int, default=[1],
+                        help="Face counts (clips are tiled into a grid, synthetic frames "
+                             "get that many fixed faces)")
+    parser.add_argument("--clip", action="append", default=[],
+                        help="Recorded clip to benchmark (repeatable)")
+    parser.add_argument("--no-synthetic", action="store_true", help="Skip synthetic frames")
+    parser.add_argument("--frames", type=int, default=300, help="Timed frames per case")
+    parser.add_argument("--warmup", type=int, default=30, help="Untimed warm-up frames per case")
+    parser.add_argument("--single-thread", action="store_true", help="cv2.setNumThreads(1) in each case")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    sources = ([] if args.no_synthetic else ["synthetic"]) + args.clip
+    if not sources:
+        parser.error("nothing to benchmark: pass --clip or drop --no-synthetic")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {case_key(r): r for r in json.load(f)["results"]}
+
+    cases = []
+    for target, source, resolution, faces in itertools.product(
+            args.targets, sources, args.resolutions, args.faces):
+        cases.append({"target": target, "source": source, "resolution": resolution, "faces": faces,
+                      "frames": args.frames, "warmup": args.warmup,
+                      "single_thread": args.single_thread})
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for case in cases:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (case,))
+        results.append(result)
+        print_result(result, baseline.get(case_key(result)))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
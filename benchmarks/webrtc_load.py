@@ -0,0 +1,664 @@
+"""
+benchmarks/webrtc_load.py
+
+Capacity test for the WebRTC video path: N simulated clients on one machine.
+
+`webrtc_streamer` signals through Streamlit's browser component, which a
+headless client cannot drive. The server role (--serve) therefore hosts
+exactly the server side `main.py` creates for every stream: a
+streamlit-webrtc `WebRtcWorker` with the app's mode, processor factory
+(session admission included), async processing and receiver queue, behind
+a minimal HTTP signalling endpoint on localhost. The default role starts
+that server in a separate process (or targets --server) and connects
+aiortc clients to it. ICE uses host candidates only: no STUN/TURN server
+is contacted.
+
+Each client publishes a synthetic or recorded clip. Every frame carries
+its sequence number as a block code in a bottom band that the overlay
+does not draw over, so annotated frames coming back are matched to the
+time they were sent. The ramp adds clients step by step (--clients 1 2 4
+...) and measures each step over a fixed window, per client:
+
+    rtt          frame sent -> same frame received back (SENDRECV only)
+    drop rate    1 - frames analysed by the server / frames sent
+    alarm delay  start of a scripted eye closure (--closed, in clip seconds)
+                 -> the server's alarm transition (same machine, same clock)
+
+plus each session's admission mode and the server's CPU utilisation. The
+capacity is the largest step whose clients were all admitted in full,
+missed no alarm and stayed within --slo-ms (p95 rtt) and --max-drop.
+
+Clients use aiortc directly (the app only gets it through streamlit-webrtc),
+so install the benchmark extras first:
+
+    pip install -r requirements.txt -r benchmarks/requirements.txt
+
+Usage:
+    python benchmarks/webrtc_load.py --clients 1 2 4 8 --duration 20
+    python benchmarks/webrtc_load.py --clip closure.mp4 --closed 4-7 --closed 15-18 \\
+        --clients 1 2 4 8 16 --output load.json
+    python benchmarks/webrtc_load.py --serve --port 8765    # server only
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from fractions import Fraction
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+QUANTILES = (50, 95, 99)
+VIDEO_CLOCK_RATE = 90000
+SYNTHETIC_FRAMES = 90
+SIGNALLING_TIMEOUT_S = 30.0
+SERVER_START_TIMEOUT_S = 180.0
+ALARM_GRACE_S = 2.0       # alarm may fire this long after a closure ends
+
+# Frame code: CODE_BITS cells in a band above the bottom edge (clear of the
+# alarm border); the second row repeats the bits inverted as a check
+CODE_BITS = 16
+CODE_CELL_HEIGHT = 12
+CODE_MARGIN = 8
+
+
+# -----------------------------------------------------------------------------
+# FRAME CODE
+# -----------------------------------------------------------------------------
+def stamp_code(image, seq):
+    """Writes `seq` (mod 2**CODE_BITS) into the bottom band of an RGB frame in place."""
+    height, width = image.shape[:2]
+    cell = width // CODE_BITS
+    top = height - CODE_MARGIN - 2 * CODE_CELL_HEIGHT
+    for bit in range(CODE_BITS):
+        on = (seq >> bit) & 1
+        x = bit * cell
+        image[top:top + CODE_CELL_HEIGHT, x:x + cell] = 255 if on else 0
+        image[top + CODE_CELL_HEIGHT:top + 2 * CODE_CELL_HEIGHT, x:x + cell] = 0 if on else 255
+
+
+def read_code(image):
+    """Sequence number stamped by `stamp_code`, or None if the band is unreadable."""
+    height, width = image.shape[:2]
+    cell = width // CODE_BITS
+    top = height - CODE_MARGIN - 2 * CODE_CELL_HEIGHT
+    pad_y, pad_x = CODE_CELL_HEIGHT // 4, cell // 4
+    band = image[top:top + 2 * CODE_CELL_HEIGHT, :cell * CODE_BITS].mean(axis=2)
+    upper = band[pad_y:CODE_CELL_HEIGHT - pad_y].reshape(-1, CODE_BITS, cell)
+    lower = band[CODE_CELL_HEIGHT + pad_y:2 * CODE_CELL_HEIGHT - pad_y].reshape(-1, CODE_BITS, cell)
+    diff = upper[:, :, pad_x:cell - pad_x].mean(axis=(0, 2)) - lower[:, :, pad_x:cell - pad_x].mean(axis=(0, 2))
+    if np.any(np.abs(diff) < 64):
+        return None
+    return int(np.sum((diff > 0) << np.arange(CODE_BITS)))
+
+
+# -----------------------------------------------------------------------------
+# FRAME SOURCES
+# -----------------------------------------------------------------------------
+def synthetic_frames(width, height, count=SYNTHETIC_FRAMES):
+    """Gradient with a moving square: cheap to encode, exercises the no-face path."""
+    ramp = np.linspace(40, 200, width, dtype=np.float32)
+    base = np.repeat(np.broadcast_to(ramp[None, :, None], (height, width, 1)), 3, axis=2)
+    base = base.astype(np.uint8)
+    size = height // 6
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        x = int((width - size) * i / count)
+        frame[height // 3:height // 3 + size, x:x + size] = (230, 120, 60)
+        frames.append(frame)
+    return frames
+
+
+def load_clip(path, width, height):
+    """All frames of a clip as RGB arrays at (width, height), and its frame rate."""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = []
+    while True:
+        success, frame = cap.read()
+        if not success:
+            break
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    if not frames:
+        raise RuntimeError(f"Could not read frames from {path}")
+    return frames, fps
+
+
+def parse_interval(text):
+    """'4-7.5' -> (4.0, 7.5) seconds."""
+    start, _, end = text.partition("-")
+    start, end = float(start), float(end)
+    if end <= start:
+        raise argparse.ArgumentTypeError(f"empty closure interval '{text}'")
+    return start, end
+
+
+# -----------------------------------------------------------------------------
+# SERVER ROLE
+# -----------------------------------------------------------------------------
+class _ServerSession:
+    """One client's WebRtcWorker plus the wall times its alarm switched on."""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.processor = worker.video_processor
+        self.alarm_onsets = []
+        if getattr(self.processor, "alarm_signal", None) is not None:
+            threading.Thread(target=self._watch_alarm, name="load-alarm-watch", daemon=True).start()
+
+    def _watch_alarm(self):
+        # Same wake-up path as the app's UI event loop
+        signal = self.processor.alarm_signal
+        version = 0
+        while not signal.closed:
+            new_version, alarm_on = signal.wait_for_change(version, timeout=1.0)
+            if new_version != version and alarm_on and not signal.closed:
+                self.alarm_onsets.append(time.time())
+            version = new_version
+
+    def stats(self):
+        processor = self.processor
+        admission = getattr(processor, "admission", None)
+        stats = {"mode": admission.mode if admission is not None else "full",
+                 "alarm_onsets": list(self.alarm_onsets),
+                 "frames_received": 0, "frames_dropped": 0, "frames_processed": 0}
+        gate = getattr(processor, "gate", None)
+        if gate is not None:
+            stats["frames_received"] = gate.frames_received
+            stats["frames_dropped"] = gate.frames_dropped
+            stats["frames_processed"] = processor.metrics.counters["frames_processed"]
+        return stats
+
+
+class LoadServer:
+    """Hosts the app's per-stream WebRTC server side for HTTP-signalled clients."""
+
+    def __init__(self):
+        from aiortc.contrib.media import MediaRelay
+        from streamlit_webrtc.eventloop import loop_context
+
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="load-webrtc-loop", daemon=True).start()
+        with loop_context(self.loop):
+            self.relay = MediaRelay()
+        self.sessions = {}
+        self.ready = False
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        from src.config import INFERENCE_WORKERS
+        from src.core.landmarker import get_landmarker_pool
+        from src.core.workers import get_worker_pool
+
+        if INFERENCE_WORKERS > 0:
+            get_worker_pool().warm_up()
+        else:
+            get_landmarker_pool().warm_up()
+        self.ready = True
+
+    def offer(self, client, sdp, type_):
+        from aiortc import RTCConfiguration
+        from streamlit_webrtc import WebRtcMode
+        from streamlit_webrtc.webrtc import WebRtcWorker
+
+        from src.config import VIDEO_OUTPUT
+        from src.processor import admit_processor
+
+        # Same arguments as main.py's webrtc_streamer (defaults elsewhere)
+        worker = WebRtcWorker(
+            mode=WebRtcMode.SENDONLY if VIDEO_OUTPUT == "none" else WebRtcMode.SENDRECV,
+            rtc_configuration=RTCConfiguration(iceServers=[]),
+            source_video_track=None, source_audio_track=None,
+            sink_video_track=None, sink_audio_track=None,
+            player_factory=None, in_recorder_factory=None, out_recorder_factory=None,
+            video_frame_callback=None, audio_frame_callback=None,
+            queued_video_frames_callback=None, queued_audio_frames_callback=None,
+            on_video_ended=None, on_audio_ended=None,
+            video_processor_factory=admit_processor, audio_processor_factory=None,
+            async_processing=True, video_receiver_size=1, audio_receiver_size=4,
+            sendback_video=True, sendback_audio=False,
+            loop=self.loop, relay=self.relay,
+        )
+        answer = worker.process_offer(sdp, type_, timeout=SIGNALLING_TIMEOUT_S)
+        session = _ServerSession(worker)
+        with self._lock:
+            self.sessions[client] = session
+        return {"sdp": answer.sdp, "type": answer.type, "mode": session.stats()["mode"]}
+
+    def close(self, client):
+        with self._lock:
+            session = self.sessions.get(client)
+        if session is not None:
+            session.worker.stop(timeout=5.0)
+
+    def stats(self):
+        from src.core.sessions import get_session_manager
+
+        manager = get_session_manager()
+        with self._lock:
+            sessions = dict(self.sessions)
+        return {"ready": self.ready, "time": time.time(), "cpu": manager.cpu.utilization,
+                "active": manager.active,
+                "sessions": {client: s.stats() for client, s in sessions.items()}}
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/stats":
+                self.send_error(404)
+                return
+            self._reply(server.stats())
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            try:
+                if self.path == "/offer":
+                    self._reply(server.offer(str(request["client"]), request["sdp"], request["type"]))
+                elif self.path == "/close":
+                    server.close(str(request["client"]))
+                    self._reply({})
+                else:
+                    self.send_error(404)
+            except Exception as e:
+                self._reply({"error": repr(e)}, status=500)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host, port):
+    server = LoadServer()
+    httpd = ThreadingHTTPServer((host, port), _make_handler(server))
+    threading.Thread(target=httpd.serve_forever, name="load-signalling", daemon=True).start()
+    print(f"[INFO] Load server signalling on http://{host}:{port}", flush=True)
+    server.warm_up()
+    print("[INFO] Load server ready", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.shutdown()
+
+
+# -----------------------------------------------------------------------------
+# CLIENT ROLE
+# -----------------------------------------------------------------------------
+def _http(url, payload=None, timeout=SIGNALLING_TIMEOUT_S):
+    data = None if payload is None else json.dumps(payload).encode()
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _make_track(client):
+    from aiortc import VideoStreamTrack
+    import av
+
+    class ClipTrack(VideoStreamTrack):
+        """Publishes the clip at the client's frame rate with coded sequence numbers."""
+
+        def __init__(self):
+            super().__init__()
+            self._seq = 0
+            self._start = None
+
+        async def recv(self):
+            seq = self._seq
+            self._seq += 1
+            if self._start is None:
+                self._start = time.monotonic()
+            delay = self._start + seq / client.fps - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            image = client.frames[seq % len(client.frames)].copy()
+            stamp_code(image, seq)
+            frame = av.VideoFrame.from_ndarray(image, format="rgb24")
+            frame.pts = round(seq * VIDEO_CLOCK_RATE / client.fps)
+            frame.time_base = Fraction(1, VIDEO_CLOCK_RATE)
+            client.on_sent(seq)
+            return frame
+
+    return ClipTrack()
+
+
+class LoadClient:
+    """One simulated driver: an aiortc peer publishing a clip to the load server."""
+
+    def __init__(self, name, server_url, frames, fps, closures):
+        """
+        Args:
+            name: Client id sent with the offer (server stats are keyed by it).
+            server_url: Base URL of the load server.
+            frames: RGB frames of the clip, published in a loop.
+            fps: Publishing rate.
+            closures: Scripted eye closures as (first frame, frame count).
+        """
+        self.name = name
+        self.server_url = server_url
+        self.frames = frames
+        self.fps = fps
+        self.closure_frames = {start: count for start, count in closures}
+        self.mode = None
+        self.pc = None
+        self._sent_at = np.full(1 << CODE_BITS, np.nan)
+        self._reader = None
+        self.begin_window()
+
+    def begin_window(self):
+        self.sent = 0
+        self.returned = 0
+        self.unreadable = 0
+        self.rtts = []
+        self.closures = []          # (wall start, duration s) started in this window
+
+    def on_sent(self, seq):
+        now = time.time()
+        self._sent_at[seq & ((1 << CODE_BITS) - 1)] = now
+        self.sent += 1
+        count = self.closure_frames.get(seq % len(self.frames))
+        if count is not None:
+            self.closures.append((now, count / self.fps))
+
+    async def _read(self, track):
+        from aiortc.mediastreams import MediaStreamError
+
+        while True:
+            try:
+                frame = await track.recv()
+            except MediaStreamError:
+                return
+            now = time.time()
+            code = read_code(frame.to_ndarray(format="rgb24"))
+            if code is None:
+                self.unreadable += 1
+                continue
+            sent_at = self._sent_at[code]
+            if not np.isnan(sent_at):
+                self._sent_at[code] = np.nan
+                self.returned += 1
+                self.rtts.append(now - sent_at)
+
+    async def connect(self):
+        from aiortc import RTCConfiguration, RTCPeerConnection, RTCSessionDescription
+
+        self.pc = RTCPeerConnection(RTCConfiguration(iceServers=[]))
+        self.pc.addTrack(_make_track(self))
+
+        @self.pc.on("track")
+        def on_track(track):
+            if track.kind == "video":
+                self._reader = asyncio.ensure_future(self._read(track))
+
+        await self.pc.setLocalDescription(await self.pc.createOffer())
+        answer = await asyncio.get_running_loop().run_in_executor(
+            None, _http, self.server_url + "/offer",
+            {"client": self.name, "sdp": self.pc.localDescription.sdp,
+             "type": self.pc.localDescription.type})
+        self.mode = answer["mode"]
+        await self.pc.setRemoteDescription(RTCSessionDescription(answer["sdp"], answer["type"]))
+
+    async def close(self):
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, _http, self.server_url + "/close", {"client": self.name})
+        except (OSError, urllib.error.URLError):
+            pass
+        if self.pc is not None:
+            await self.pc.close()
+        if self._reader is not None:
+            self._reader.cancel()
+
+
+# -----------------------------------------------------------------------------
+# RAMP AND REPORTING
+# -----------------------------------------------------------------------------
+def _percentiles_ms(samples):
+    if not len(samples):
+        return None
+    values = np.percentile(np.asarray(samples) * 1000.0, QUANTILES)
+    return {f"p{q}": round(float(v), 2) for q, v in zip(QUANTILES, values)}
+
+
+def _alarm_delays(closures, onsets, window_end):
+    """Delays of the first alarm after each closure that could have completed."""
+    delays, missed = [], 0
+    for start, duration in closures:
+        deadline = start + duration + ALARM_GRACE_S
+        if deadline > window_end:
+            continue
+        hits = [t for t in onsets if start <= t <= deadline]
+        if hits:
+            delays.append(hits[0] - start)
+        else:
+            missed += 1
+    return delays, missed
+
+
+def summarize_step(clients, before, after, window_s):
+    per_client, rtts, delays = [], [], []
+    modes = {"full": 0, "degraded": 0, "rejected": 0}
+    missed = 0
+    for client in clients:
+        start = before["sessions"].get(client.name, {})
+        end = after["sessions"].get(client.name, {})
+        processed = end.get("frames_processed", 0) - start.get("frames_processed", 0)
+        client_delays, client_missed = _alarm_delays(client.closures, end.get("alarm_onsets", []),
+                                                     after["time"])
+        modes[client.mode] = modes.get(client.mode, 0) + 1
+        entry = {
+            "client": client.name,
+            "mode": client.mode,
+            "sent_fps": client.sent / window_s,
+            "returned_fps": client.returned / window_s,
+            "unreadable": client.unreadable,
+            "drop_rate": 1.0 - processed / client.sent if client.sent else None,
+            "rtt_ms": _percentiles_ms(client.rtts),
+            "alarm_delay_ms": _percentiles_ms(client_delays),
+            "alarms_missed": client_missed,
+        }
+        per_client.append(entry)
+        if client.mode != "rejected":
+            rtts.extend(client.rtts)
+            delays.extend(client_delays)
+            missed += client_missed
+
+    admitted = [c for c in per_client if c["mode"] != "rejected" and c["drop_rate"] is not None]
+    return {
+        "clients": len(clients),
+        "modes": modes,
+        "cpu": after["cpu"],
+        "rtt_ms": _percentiles_ms(rtts),
+        "drop_rate": float(np.mean([c["drop_rate"] for c in admitted])) if admitted else None,
+        "drop_rate_max": max((c["drop_rate"] for c in admitted), default=None),
+        "alarm_delay_ms": _percentiles_ms(delays),
+        "alarms_missed": missed,
+        "per_client": per_client,
+    }
+
+
+def step_ok(step, slo_ms, max_drop):
+    if step["modes"]["degraded"] or step["modes"]["rejected"] or step["alarms_missed"]:
+        return False
+    if step["rtt_ms"] is not None and step["rtt_ms"]["p95"] > slo_ms:
+        return False
+    return step["drop_rate_max"] is not None and step["drop_rate_max"] <= max_drop
+
+
+def print_step(step, ok):
+    modes = step["modes"]
+    rtt = step["rtt_ms"]
+    delay = step["alarm_delay_ms"]
+    line = (f"{step['clients']:>4} clients  full {modes['full']:>3} degraded {modes['degraded']:>3} "
+            f"rejected {modes['rejected']:>3}  cpu {step['cpu'] * 100:5.1f}%  ")
+    line += (f"rtt p50 {rtt['p50']:7.1f} / p95 {rtt['p95']:7.1f} ms  " if rtt else "rtt --  ")
+    if step["drop_rate"] is not None:
+        line += f"drop {step['drop_rate'] * 100:5.1f}% (max {step['drop_rate_max'] * 100:5.1f}%)  "
+    if delay:
+        line += f"alarm delay p50 {delay['p50']:7.1f} ms  missed {step['alarms_missed']}  "
+    print(line + ("ok" if ok else "OVER LIMIT"), flush=True)
+
+
+async def run_ramp(args, server_url, frames, fps, closures):
+    clients, steps = [], []
+    capacity, within = 0, True
+    try:
+        for target in sorted(args.clients):
+            while len(clients) < target:
+                client = LoadClient(f"c{len(clients) + 1}", server_url, frames, fps, closures)
+                await client.connect()
+                clients.append(client)
+            await asyncio.sleep(args.warmup)
+
+            loop = asyncio.get_running_loop()
+            before = await loop.run_in_executor(None, _http, server_url + "/stats")
+            for client in clients:
+                client.begin_window()
+            await asyncio.sleep(args.duration)
+            after = await loop.run_in_executor(None, _http, server_url + "/stats")
+
+            step = summarize_step(clients, before, after, args.duration)
+            ok = step_ok(step, args.slo_ms, args.max_drop)
+            print_step(step, ok)
+            steps.append(step)
+            # Capacity: last step of an unbroken run of steps within limits
+            within = within and ok
+            if within:
+                capacity = target
+            elif args.stop_on_failure:
+                break
+    finally:
+        for client in clients:
+            await client.close()
+    return steps, capacity
+
+
+def _wait_for_server(url, process):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("Load server exited during startup")
+        try:
+            if _http(url + "/stats", timeout=2.0)["ready"]:
+                return
+        except (OSError, urllib.error.URLError, ValueError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Load server at {url} not ready after {SERVER_START_TIMEOUT_S:.0f} s")
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp simulated WebRTC clients against the app's video path")
+    parser.add_argument("--serve", action="store_true", help="Run only the load server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--server", help="Base URL of a running load server (default: start one)")
+    parser.add_argument("--clients", nargs="+", type=int, default=[1, 2, 4, 8],
+                        help="Concurrent client counts to ramp through")
+    parser.add_argument("--clip", help="Recorded clip to publish (default: synthetic frames)")
+    parser.add_argument("--closed", action="append", type=parse_interval, default=[],
+                        metavar="START-END", help="Eye closure in the clip, seconds (repeatable)")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="480p")
+    parser.add_argument("--fps", type=float, help="Publishing rate (default: clip rate, or 30)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds before each measured window")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per step")
+    parser.add_argument("--slo-ms", type=float, default=250.0, help="p95 round-trip limit")
+    parser.add_argument("--max-drop", type=float, default=0.5, help="Per-client drop-rate limit")
+    parser.add_argument("--stop-on-failure", action="store_true", help="Stop at the first step over a limit")
+    parser.add_argument("--output", default="load_results.json", help="JSON results file")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.host, args.port)
+        return
+
+    width, height = RESOLUTIONS[args.resolution]
+    if args.clip:
+        frames, clip_fps = load_clip(args.clip, width, height)
+    else:
+        if args.closed:
+            parser.error("--closed needs a --clip with a face")
+        frames, clip_fps = synthetic_frames(width, height), 30.0
+    fps = args.fps or clip_fps
+    closures = []
+    for start, end in args.closed:
+        first = int(round(start * clip_fps))
+        count = int(round((end - start) * clip_fps))
+        if first >= len(frames):
+            parser.error(f"closure at {start} s is past the end of the clip")
+        closures.append((first, max(1, min(count, len(frames) - first))))
+
+    process = None
+    server_url = args.server
+    if server_url is None:
+        server_url = f"http://{args.host}:{args.port}"
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve",
+                                    "--host", args.host, "--port", str(args.port)])
+    try:
+        _wait_for_server(server_url, process)
+        steps, capacity = asyncio.run(run_ramp(args, server_url, frames, fps, closures))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print(f"[INFO] Capacity: {capacity} concurrent clients "
+          f"(p95 rtt <= {args.slo_ms:.0f} ms, drop <= {args.max_drop:.0%}, no degraded/missed alarms)")
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "clip": args.clip or "synthetic",
+            "resolution": args.resolution,
+            "fps": fps,
+            "closed": args.closed,
+        },
+        "capacity": capacity,
+        "steps": steps,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
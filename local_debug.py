@@ -8,8 +8,8 @@ This bypasses Streamlit and WebRTC to verify:
 3. Logic correctness (EAR calculation)
 """
 
+import argparse
 import cv2
-import mediapipe as mp
 import time
 import sys
 import os
@@ -19,137 +19,137 @@ import numpy as np
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.config import *
-from src.utils.geometry import calculate_ear
 from src.utils.sound import trigger_alarm, deactivate_alarm
+from src.core.detector import DrowsinessDetector
+from src.core.landmarker import MODEL_PATH, create_landmarker
+from src.core.pipeline import LocalPipeline
 
-def initialize_landmarker():
+def initialize_landmarker(num_faces=MAX_FACES, live_stream=False):
     """
-    Sets up the MediaPipe Face Landmarker (Tasks API).
+    Sets up the MediaPipe Face Landmarker (Tasks API), in LIVE_STREAM mode
+    (`detect_async` + result callback) when `live_stream` is set.
     """
-    BaseOptions = mp.tasks.BaseOptions
-    FaceLandmarker = mp.tasks.vision.FaceLandmarker
-    FaceLandmarkerOptions = mp.tasks.vision.FaceLandmarkerOptions
-    VisionRunningMode = mp.tasks.vision.RunningMode
-
-    # Model path
-    model_path = os.path.join(MODELS_DIR, "face_landmarker.task")
-
-    if not os.path.exists(model_path):
-        print(f"[ERROR] Model not found at {model_path}")
+    try:
+        return create_landmarker(num_faces=num_faces, live_stream=live_stream)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
         sys.exit(1)
 
-    options = FaceLandmarkerOptions(
-        base_options=BaseOptions(model_asset_path=model_path),
-        running_mode=VisionRunningMode.VIDEO,
-        num_faces=1,
-        min_face_detection_confidence=0.5,
-        min_face_presence_confidence=0.5,
-        min_tracking_confidence=0.5,
-    )
-    
-    return FaceLandmarker.create_from_options(options)
-
-def main():
+def draw_overlay(image, result, rgb=False):
+    """
+    Draws the debug overlay (status, EAR, eye points, alert) for a FrameResult.
+    Set `rgb` for RGB frames (e.g. decoded from WebRTC), BGR otherwise.
+    """
+    height, width, _ = image.shape
+    red = (255, 0, 0) if rgb else (0, 0, 255)
+
+    # Default text
+    text_color = (0, 255, 0)
+    status_text = "Status: AWAKE"
+
+    if result.face_found:
+        if result.alarm_on:
+            status_text = "Status: DROWSY!"
+            text_color = red
+            cv2.putText(image, "DROWSINESS ALERT!", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, red, 2)
+            cv2.rectangle(image, (0,0), (width, height), red, 5)
+
+        # Visual Feedback
+        cv2.putText(image, f"EAR: {result.ear:.2f}", (width - 150, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(image, f"THR: {result.face_thresholds[0]:.2f}", (width - 150, 55),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+        fatigue = result.fatigue
+        cv2.putText(image, f"PERCLOS: {fatigue.perclos * 100:.0f}%  "
+                           f"Blinks: {fatigue.blink_rate:.0f}/min ({fatigue.mean_blink_ms:.0f} ms)",
+                    (10, height - 45), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+
+        # Eye points of every monitored face (red while that face alarms)
+        for eye_points, face_alarm in zip(result.eye_points, result.face_alarms.tolist()):
+            color = red if face_alarm else (0, 255, 0)
+            for (x, y) in eye_points.reshape(-1, 2).astype(np.int32).tolist():
+                cv2.circle(image, (x, y), 1, color, -1)
+
+    # Draw status
+    cv2.putText(image, status_text, (10, height - 20),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2)
+
+def main(tracking=EYE_TRACKING_ENABLED, num_faces=MAX_FACES, calibration=EAR_CALIBRATION_MODE,
+         live_stream=LANDMARKER_LIVE_STREAM):
     print("[INFO] Starting Local Debug Mode (OpenCV)...")
-    print(f"[INFO] Model Path: {os.path.join(MODELS_DIR, 'face_landmarker.task')}")
+    print(f"[INFO] Model Path: {MODEL_PATH}")
+    if tracking:
+        print(f"[INFO] Eye tracking enabled (keyframe every {EYE_TRACKER_KEYFRAME_INTERVAL} frames)")
+    if num_faces > 1:
+        print(f"[INFO] Monitoring up to {num_faces} faces")
+    if live_stream:
+        print("[INFO] LIVE_STREAM inference: frames show the latest completed result")
+    if calibration != "off":
+        print(f"[INFO] EAR calibration: {calibration} (keep your eyes open for "
+              f"{EAR_CALIBRATION_MS / 1000:.0f}s after your face is found)")
     
     cap = cv2.VideoCapture(WEBCAM_ID)
     if not cap.isOpened():
         print(f"[ERROR] Could not open webcam with ID {WEBCAM_ID}")
         return
 
-    landmarker = initialize_landmarker()
+    landmarker = initialize_landmarker(num_faces, live_stream)
     
-    # State Variables
-    COUNTER = 0
-    ALARM_ON = False
+    # Shared detection core (same logic as the Streamlit processor). OpenCV
+    # captures and displays BGR, so only the inference crop is converted
+    detector = DrowsinessDetector(tracking=tracking, landmarker=landmarker, num_faces=num_faces,
+                                  calibration=calibration, live_stream=live_stream)
     
-    # Landmark Indices (Left and Right Eyes)
-    LEFT_EYE = [33, 160, 158, 133, 153, 144]
-    RIGHT_EYE = [362, 385, 387, 263, 373, 380]
-
-    # Timestamp for MediaPipe video mode
-    frame_timestamp_ms = 0
+    # Alarm on/off transitions, raised from the inference thread so the
+    # alarm does not wait for drawing / display (a lost face keeps the state)
+    alarm = {"on": False}
+
+    def update_alarm(result):
+        if not result.face_found:
+            return
+        if result.alarm_on and not alarm["on"]:
+            alarm["on"] = True
+            trigger_alarm()
+        elif not result.alarm_on and alarm["on"]:
+            alarm["on"] = False
+            deactivate_alarm()
+
+    # Capture and inference threads; this (main) thread only displays
+    pipeline = LocalPipeline(cap, detector, on_result=update_alarm)
+    next_report = time.monotonic() + PIPELINE_REPORT_INTERVAL_S
 
     print("[INFO] Press 'ESC' to exit.")
 
     try:
-        while cap.isOpened():
-            success, image = cap.read()
-            if not success:
-               print("[WARNING] Empty frame ignored.")
-               continue
-
-            height, width, _ = image.shape
-            
-            # Convert BGR (OpenCV) to RGB (MediaPipe)
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
-
-            # Inference
-            frame_timestamp_ms += 33
-            results = landmarker.detect_for_video(mp_image, frame_timestamp_ms)
-
-            # Default text
-            text_color = (0, 255, 0)
-            status_text = "Status: AWAKE"
-
-            if results.face_landmarks:
-                face_landmarks = results.face_landmarks[0]
-                
-                left_eye_points = []
-                right_eye_points = []
-
-                # Extract Normalized Coordinates -> Pixel Coordinates
-                for idx in LEFT_EYE:
-                    lm = face_landmarks[idx]
-                    left_eye_points.append((int(lm.x * width), int(lm.y * height)))
-                
-                for idx in RIGHT_EYE:
-                    lm = face_landmarks[idx]
-                    right_eye_points.append((int(lm.x * width), int(lm.y * height)))
-
-                # Geometry Logic
-                left_ear = calculate_ear(left_eye_points)
-                right_ear = calculate_ear(right_eye_points)
-                avg_ear = (left_ear + right_ear) / 2.0
-                
-                # Check Logic
-                if avg_ear < EYE_ASPECT_RATIO_THRESHOLD:
-                    COUNTER += 1
-                    if COUNTER >= EYE_ASPECT_RATIO_CONSEC_FRAMES:
-                        status_text = "Status: DROWSY!"
-                        text_color = (0, 0, 255)
-                        if not ALARM_ON:
-                            ALARM_ON = True
-                            trigger_alarm()
-                        
-                        cv2.putText(image, "DROWSINESS ALERT!", (10, 30),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                        cv2.rectangle(image, (0,0), (width, height), (0,0,255), 5)
-                else:
-                    COUNTER = 0
-                    if ALARM_ON:
-                        ALARM_ON = False
-                        deactivate_alarm()
-                
-                # Visual Feedback
-                cv2.putText(image, f"EAR: {avg_ear:.2f}", (width - 150, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                for (x, y) in left_eye_points + right_eye_points:
-                    cv2.circle(image, (x, y), 1, (0, 255, 0), -1)
+        pipeline.start()
+        while pipeline.running:
+            item = pipeline.next_result(timeout=0.1)
+            if item is not None:
+                start = time.monotonic()
+                image = item.frame.image
+                draw_overlay(image, item.result)
+                fps = pipeline.fps
+                cv2.putText(image, f"cap {fps['capture']:.0f} | inf {fps['inference']:.0f} | "
+                                   f"disp {fps['display']:.0f} fps",
+                            (10, 55), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+                cv2.imshow('Local Debug Mode (Press ESC to quit)', image)
+                pipeline.displayed(item, start)
             
-            # Draw status
-            cv2.putText(image, status_text, (10, height - 20),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2)
-
-            cv2.imshow('Local Debug Mode (Press ESC to quit)', image)
-            
-            if cv2.waitKey(5) & 0xFF == 27:
+            # Also keeps the window responsive while no new result is ready
+            if cv2.waitKey(1) & 0xFF == 27:
                 break
+            
+            if time.monotonic() >= next_report:
+                print(pipeline.report())
+                next_report += PIPELINE_REPORT_INTERVAL_S
                 
     finally:
+        pipeline.stop()
+        detector.close()
+        if pipeline.error is not None:
+            print(f"[ERROR] Pipeline stopped: {pipeline.error!r}")
+        print(pipeline.report())
         landmarker.close()
         cap.release()
         cv2.destroyAllWindows()
@@ -157,4 +157,19 @@ def main():
         print("[INFO] System Terminated.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Local OpenCV drowsiness debug mode")
+    parser.add_argument("--track", action="store_true", default=EYE_TRACKING_ENABLED,
+                        help="Run the landmarker on keyframes only and track eye points "
+                             "with optical flow in between")
+    parser.add_argument("--faces", type=int, default=MAX_FACES,
+                        help="Maximum number of faces to monitor (e.g. 2 for driver + co-driver)")
+    parser.add_argument("--calibration", choices=("off", "calibrate", "adaptive"),
+                        default=EAR_CALIBRATION_MODE,
+                        help="Per-user EAR threshold calibration mode")
+    parser.add_argument("--live-stream", action="store_true", default=LANDMARKER_LIVE_STREAM,
+                        help="Run MediaPipe in LIVE_STREAM mode (asynchronous inference)")
+    args = parser.parse_args()
+    if args.live_stream and args.track:
+        parser.error("--track needs VIDEO mode and can not be combined with --live-stream")
+    main(tracking=args.track, num_faces=args.faces, calibration=args.calibration,
+         live_stream=args.live_stream)
@@ -5,23 +5,21 @@ Drowsiness Detection System - Streamlit Web App (Hugging Face Compatible)
 Premium Safety Monitoring Dashboard with Real-Time Detection
 """
 
-import av
-import cv2
-import mediapipe as mp
-import numpy as np
 import streamlit as st
-from streamlit_webrtc import webrtc_streamer, VideoProcessorBase, WebRtcMode
+from streamlit_webrtc import webrtc_streamer, WebRtcMode
 import base64
+import math
 import threading
 import time
 import os
-import sys
+from collections import deque
 
-# Import from source package
+# Import from source package (light modules only: MediaPipe / OpenCV are
+# imported by the background prewarm or when the first stream starts)
 from src.config import *
-from src.utils.geometry import calculate_ear
-from src.utils.sound import trigger_alarm, deactivate_alarm
+from src.utils.startup import STARTUP
 from src.rtc_config import get_rtc_configuration
+from src.core.metrics import start_metrics_server
 
 # =============================================================================
 # PAGE CONFIGURATION
@@ -34,12 +32,18 @@ st.set_page_config(
 )
 
 # =============================================================================
-# LOAD CUSTOM CSS
+# LOAD CUSTOM CSS (read once per process, injected on every run)
 # =============================================================================
+@st.cache_resource(show_spinner=False)
+def read_css(file_name):
+    """Read the stylesheet once per process."""
+    with STARTUP.phase("css"):
+        with open(file_name) as f:
+            return f'<style>{f.read()}</style>'
+
 def load_css(file_name):
     """Load and inject custom CSS styles."""
-    with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    st.markdown(read_css(file_name), unsafe_allow_html=True)
 
 try:
     load_css(os.path.join(ASSETS_DIR, 'style.css'))
@@ -49,11 +53,13 @@ except Exception as e:
 # =============================================================================
 # AUDIO HANDLING (Client-Side)
 # =============================================================================
+@st.cache_resource(show_spinner=False)
 def get_audio_html(file_path):
-    """Generate HTML audio element with base64 encoded alarm.wav"""
+    """Generate HTML audio element with base64 encoded alarm.wav (once per process)"""
     try:
-        with open(file_path, "rb") as f:
-            b64_audio = base64.b64encode(f.read()).decode()
+        with STARTUP.phase("audio"):
+            with open(file_path, "rb") as f:
+                b64_audio = base64.b64encode(f.read()).decode()
         return f'''
             <audio autoplay loop>
                 <source src="data:audio/wav;base64,{b64_audio}" type="audio/wav">
@@ -65,129 +71,51 @@ def get_audio_html(file_path):
 AUDIO_HTML = get_audio_html(ALARM_SOUND_PATH)
 
 # =============================================================================
-# VIDEO PROCESSOR CLASS
+# BACKGROUND PREWARM (CV imports + model warm-up, once per process)
 # =============================================================================
-class DrowsinessProcessor(VideoProcessorBase):
-    """MediaPipe-based drowsiness detection processor for WebRTC streams."""
-    
-    def __init__(self):
-        self.frame_lock = threading.Lock()
-        self.alarm_on = False
-        self.current_ear = 0.0
-        
-        # Initialize MediaPipe
-        self.BaseOptions = mp.tasks.BaseOptions
-        self.FaceLandmarker = mp.tasks.vision.FaceLandmarker
-        self.FaceLandmarkerOptions = mp.tasks.vision.FaceLandmarkerOptions
-        self.VisionRunningMode = mp.tasks.vision.RunningMode
-        
-        # Path to model
-        model_path = os.path.join(MODELS_DIR, "face_landmarker.task")
-        
-        options = self.FaceLandmarkerOptions(
-            base_options=self.BaseOptions(model_asset_path=model_path),
-            running_mode=self.VisionRunningMode.VIDEO,
-            num_faces=1,
-            min_face_detection_confidence=0.5,
-            min_face_presence_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        
-        self.landmarker = self.FaceLandmarker.create_from_options(options)
-        self.timestamp_ms = 0
-        
-        # Eye landmark indices
-        self.LEFT_EYE = [33, 160, 158, 133, 153, 144]
-        self.RIGHT_EYE = [362, 385, 387, 263, 373, 380]
-        self.consec_frames = 0
-        
-    def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
-        """Process incoming video frame for drowsiness detection."""
-        image = frame.to_ndarray(format="bgr24")
-        height, width, _ = image.shape
-        
-        # MediaPipe expects RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
-        
-        # Update timestamp (simulating ~30fps for MP tracking)
-        self.timestamp_ms += 33
-        
-        try:
-            results = self.landmarker.detect_for_video(mp_image, self.timestamp_ms)
-            is_drowsy_now = False
-            avg_ear = 0.0
-            
-            if results.face_landmarks:
-                face_landmarks = results.face_landmarks[0]
-                
-                left_eye_points = []
-                right_eye_points = []
+def _prewarm():
+    try:
+        with STARTUP.phase("cv_imports"):
+            import src.processor
+            from src.core.landmarker import get_landmarker_pool
+            from src.core.workers import get_worker_pool
+        with STARTUP.phase("model_warmup"):
+            if INFERENCE_WORKERS > 0:
+                get_worker_pool().warm_up()
+            else:
+                get_landmarker_pool().warm_up()
+        STARTUP.mark("ready")
+    except Exception as e:
+        print(f"Warning: Could not warm up landmarker pool: {e}")
+    print(STARTUP.report())
 
-                for idx in self.LEFT_EYE:
-                    lm = face_landmarks[idx]
-                    left_eye_points.append((int(lm.x * width), int(lm.y * height)))
-                
-                for idx in self.RIGHT_EYE:
-                    lm = face_landmarks[idx]
-                    right_eye_points.append((int(lm.x * width), int(lm.y * height)))
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    """Start the prewarm thread; the page renders while the model loads."""
+    thread = threading.Thread(target=_prewarm, name="model-prewarm", daemon=True)
+    thread.start()
+    return thread
 
-                left_ear = calculate_ear(left_eye_points)
-                right_ear = calculate_ear(right_eye_points)
-                avg_ear = (left_ear + right_ear) / 2.0
-                
-                # Draw EAR value with styled background
-                ear_text = f"EAR: {avg_ear:.3f}"
-                (text_width, text_height), baseline = cv2.getTextSize(
-                    ear_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
-                
-                # Semi-transparent background for EAR display
-                overlay = image.copy()
-                cv2.rectangle(overlay, 
-                             (width - text_width - 30, 10), 
-                             (width - 10, text_height + 25), 
-                             (15, 23, 42), -1)
-                cv2.addWeighted(overlay, 0.7, image, 0.3, 0, image)
-                
-                # EAR text
-                cv2.putText(image, ear_text, (width - text_width - 20, text_height + 17),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (34, 211, 238), 2)
-                
-                # Draw eye landmark points
-                for (x, y) in left_eye_points + right_eye_points:
-                    cv2.circle(image, (x, y), 2, (16, 185, 129), -1)
-                    cv2.circle(image, (x, y), 4, (16, 185, 129), 1)
-                
-                # Drowsiness detection logic
-                if avg_ear < EYE_ASPECT_RATIO_THRESHOLD:
-                    self.consec_frames += 1
-                    if self.consec_frames >= EYE_ASPECT_RATIO_CONSEC_FRAMES:
-                        is_drowsy_now = True
-                        
-                        # Draw alert overlay
-                        overlay = image.copy()
-                        cv2.rectangle(overlay, (0, 0), (width, 60), (239, 68, 68), -1)
-                        cv2.addWeighted(overlay, 0.3, image, 0.7, 0, image)
-                        
-                        # Alert text with icon
-                        alert_text = "⚠ DROWSINESS DETECTED"
-                        cv2.putText(image, alert_text, (20, 40),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
-                        
-                        # Alert border
-                        cv2.rectangle(image, (0, 0), (width-1, height-1), (239, 68, 68), 4)
-                else:
-                    self.consec_frames = 0
-            
-            # Thread-safe update of alarm state and EAR
-            with self.frame_lock:
-                self.alarm_on = is_drowsy_now
-                self.current_ear = avg_ear
-                
-        except Exception as e:
-            print(f"Error in processing: {e}")
-            
-        return av.VideoFrame.from_ndarray(image, format="bgr24")
+start_prewarm()
+
+def create_processor():
+    """
+    Video processor factory (imports the CV stack if the prewarm has not yet).
+
+    The session manager admits the stream first; rejected streams get a
+    pass-through processor that allocates no model or buffers.
+    """
+    from src.processor import admit_processor
+    return admit_processor()
+
+# =============================================================================
+# METRICS ENDPOINT (Prometheus text format on a local port)
+# =============================================================================
+if METRICS_ENABLED:
+    try:
+        start_metrics_server()
+    except OSError as e:
+        print(f"Warning: Could not start metrics server: {e}")
 
 # =============================================================================
 # SIDEBAR CONFIGURATION
@@ -238,18 +166,25 @@ def render_sidebar():
         # Detection Parameters (Display Only)
         st.markdown("### ⚙️ Detection Parameters")
         
+        # With calibration on, the global value only applies until a driver
+        # is calibrated; the live panel shows the effective threshold
+        if EAR_CALIBRATION_MODE == "off":
+            threshold_text = f"{EYE_ASPECT_RATIO_THRESHOLD}"
+        else:
+            threshold_text = f"{EYE_ASPECT_RATIO_THRESHOLD} → per driver ({EAR_CALIBRATION_MODE})"
+        
         st.markdown(f"""
         <div class="metric-container">
             <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;">
                 <span style="font-size: 0.75rem; color: #94a3b8;">EAR Threshold</span>
                 <span style="font-family: 'JetBrains Mono', monospace; color: #22d3ee; font-weight: 600;">
-                    {EYE_ASPECT_RATIO_THRESHOLD}
+                    {threshold_text}
                 </span>
             </div>
             <div style="display: flex; justify-content: space-between; align-items: center;">
-                <span style="font-size: 0.75rem; color: #94a3b8;">Consec. Frames</span>
+                <span style="font-size: 0.75rem; color: #94a3b8;">Closed Duration</span>
                 <span style="font-family: 'JetBrains Mono', monospace; color: #22d3ee; font-weight: 600;">
-                    {EYE_ASPECT_RATIO_CONSEC_FRAMES}
+                    {EYE_CLOSED_DURATION_MS} ms
                 </span>
             </div>
         </div>
@@ -264,8 +199,8 @@ def render_sidebar():
             MediaPipe's Face Mesh to monitor eye aspect ratio (EAR) 
             in real-time.
             
-            When drowsiness is detected (eyes closed for consecutive 
-            frames), an audible alarm is triggered to alert the user.
+            When drowsiness is detected (eyes closed for longer than 
+            the configured duration), an audible alarm is triggered to alert the user.
             
             ---
             
@@ -275,6 +210,135 @@ def render_sidebar():
             - 🐍 Streamlit Framework
             """)
 
+# =============================================================================
+# LIVE METRICS PANEL
+# =============================================================================
+def _gauge_percent(ear):
+    """EAR as a percentage of the gauge width."""
+    return max(0.0, min(100.0, ear / PANEL_EAR_SCALE * 100.0))
+
+def status_card_html(sample):
+    """System status card for the latest sample (None before the stream starts)."""
+    if sample is None:
+        css_class, text = "status-safe", "● Monitoring Active"
+    elif sample.alarm_on:
+        css_class, text = "status-danger", "Drowsiness Detected"
+    elif not sample.face_found:
+        css_class, text = "status-safe", "○ No Face Detected"
+    else:
+        css_class, text = "status-safe", "● Eyes Open"
+    return f"""
+    <div class="metric-card">
+        <div class="metric-label">System Status</div>
+        <div class="{css_class}" style="margin-top: 8px; padding: 10px 16px; border-radius: 8px;">
+            {text}
+        </div>
+    </div>
+    """
+
+def sparkline_svg(history, threshold):
+    """Inline SVG of recent EAR values; NaN points (no face) leave gaps."""
+    if len(history) < 2:
+        return ""
+    step = 100.0 / (PANEL_SPARKLINE_POINTS - 1)
+    offset = PANEL_SPARKLINE_POINTS - len(history)
+    segments, points = [], []
+    for i, ear in enumerate(history):
+        if math.isnan(ear):
+            if points:
+                segments.append(points)
+                points = []
+            continue
+        y = 24.0 - _gauge_percent(ear) * 0.24
+        points.append(f"{(offset + i) * step:.1f},{y:.1f}")
+    if points:
+        segments.append(points)
+    lines = "".join(
+        f'<polyline points="{" ".join(pts)}" fill="none" stroke="#22d3ee" '
+        f'stroke-width="1.5" vector-effect="non-scaling-stroke"/>'
+        for pts in segments if len(pts) > 1
+    )
+    threshold_y = 24.0 - _gauge_percent(threshold) * 0.24
+    return f"""
+        <svg viewBox="0 0 100 24" preserveAspectRatio="none" style="width: 100%; height: 32px; margin-top: 8px;">
+            <line x1="0" y1="{threshold_y:.1f}" x2="100" y2="{threshold_y:.1f}" stroke="#f43f5e"
+                  stroke-width="1" stroke-dasharray="2,2" vector-effect="non-scaling-stroke"/>
+            {lines}
+        </svg>"""
+
+def ear_card_html(ear, threshold, history):
+    """EAR card: current value, gauge with threshold marker and sparkline."""
+    value = "--" if ear is None else f"{ear:.3f}"
+    fill = 0.0 if ear is None else _gauge_percent(ear)
+    return f"""
+    <div class="metric-card">
+        <div class="metric-label">Eye Aspect Ratio</div>
+        <div style="display: flex; align-items: baseline; gap: 4px; margin-top: 4px;">
+            <span class="metric-value">{value}</span>
+            <span class="metric-unit">EAR</span>
+        </div>
+        <div class="ear-gauge">
+            <div class="ear-gauge-fill" style="width: {fill:.0f}%;"></div>
+            <div class="ear-gauge-threshold" style="left: {_gauge_percent(threshold):.0f}%;"></div>
+        </div>
+        {sparkline_svg(history, threshold)}
+    </div>
+    """
+
+def fatigue_card_html(sample):
+    """PERCLOS and blink rate over the fatigue window."""
+    if sample is None or not sample.face_found:
+        perclos, blinks = "--", "--"
+    else:
+        perclos, blinks = f"{sample.perclos * 100:.0f}", f"{sample.blink_rate:.0f}"
+    return f"""
+    <div class="metric-card">
+        <div class="metric-label">PERCLOS</div>
+        <div style="display: flex; align-items: baseline; gap: 4px; margin-top: 4px;">
+            <span class="metric-value">{perclos}</span>
+            <span class="metric-unit">%</span>
+        </div>
+        <div style="font-size: 0.75rem; color: #64748b; margin-top: 8px;">
+            {blinks} blinks/min over the last {FATIGUE_WINDOW_MS // 1000} s
+        </div>
+    </div>
+    """
+
+class LivePanel:
+    """
+    Metric cards fed from the processor's LiveFeed.
+
+    Each card lives in its own placeholder and is only re-sent to the
+    browser when its HTML changed, so a steady state costs no updates.
+    """
+
+    def __init__(self, status_slot, ear_slot, fatigue_slot):
+        self._slots = (status_slot, ear_slot, fatigue_slot)
+        self._html = [None, None, None]
+        self.history = deque(maxlen=PANEL_SPARKLINE_POINTS)
+        self.latest = None
+        self.threshold = EYE_ASPECT_RATIO_THRESHOLD
+
+    def _show(self, index, html):
+        if html != self._html[index]:
+            self._html[index] = html
+            self._slots[index].markdown(html, unsafe_allow_html=True)
+
+    def update(self, samples):
+        """Folds in the samples drained since the last tick and redraws."""
+        ears = [s.ear for s in samples if s.face_found]
+        if samples:
+            self.latest = samples[-1]
+            # One sparkline point per tick keeps its time span fixed
+            self.history.append(sum(ears) / len(ears) if ears else math.nan)
+        latest = self.latest
+        ear = None
+        if latest is not None and latest.face_found:
+            ear, self.threshold = latest.ear, latest.threshold
+        self._show(0, status_card_html(latest))
+        self._show(1, ear_card_html(ear, self.threshold, self.history))
+        self._show(2, fatigue_card_html(latest))
+
 # =============================================================================
 # MAIN APPLICATION
 # =============================================================================
@@ -327,14 +391,20 @@ def main():
         
         # WebRTC Streamer with STUN + TURN configuration for reliable connectivity
         # Uses Metered.ca Open Relay TURN servers (20GB free/month)
+        # VIDEO_OUTPUT = "none" only sends video: frames are analysed and
+        # dropped server-side (receiver queue of 1, never read)
         ctx = webrtc_streamer(
             key="drowsiness-detection", 
-            mode=WebRtcMode.SENDRECV,
+            mode=WebRtcMode.SENDONLY if VIDEO_OUTPUT == "none" else WebRtcMode.SENDRECV,
             rtc_configuration=get_rtc_configuration(),
-            video_processor_factory=DrowsinessProcessor,
+            video_processor_factory=create_processor,
             media_stream_constraints={"video": True, "audio": False},
             async_processing=True,
+            video_receiver_size=1,
         )
+        if VIDEO_OUTPUT == "none":
+            st.caption("Results-only mode: video is analysed on the server and not sent back.")
+        session_notice = st.empty()
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -343,45 +413,10 @@ def main():
     # ==========================================================================
     # STATUS & METRICS ROW
     # ==========================================================================
+    # Cards are placeholders, updated in place by the event loop below
     metric_col1, metric_col2, metric_col3 = st.columns(3)
-    
-    with metric_col1:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-label">System Status</div>
-            <div class="status-safe" style="margin-top: 8px; padding: 10px 16px; border-radius: 8px;">
-                ● Monitoring Active
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with metric_col2:
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Eye Aspect Ratio</div>
-            <div style="display: flex; align-items: baseline; gap: 4px; margin-top: 4px;">
-                <span class="metric-value">--</span>
-                <span class="metric-unit">EAR</span>
-            </div>
-            <div class="ear-gauge">
-                <div class="ear-gauge-fill" style="width: 70%;"></div>
-                <div class="ear-gauge-threshold" style="left: 30%;"></div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with metric_col3:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-label">Detection Sensitivity</div>
-            <div style="display: flex; align-items: baseline; gap: 4px; margin-top: 4px;">
-                <span class="metric-value">High</span>
-            </div>
-            <div style="font-size: 0.75rem; color: #64748b; margin-top: 8px;">
-                Optimized for safety
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+    panel = LivePanel(metric_col1.empty(), metric_col2.empty(), metric_col3.empty())
+    panel.update([])
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -399,24 +434,52 @@ def main():
     sound_placeholder = st.empty()
     
     # ==========================================================================
-    # POLLING LOOP FOR AUDIO TRIGGER
+    # EVENT LOOP (audio on alarm transitions, panel at PANEL_REFRESH_HZ)
     # ==========================================================================
     if ctx.state.playing:
-        while True:
-            if ctx.video_processor:
-                drowsy = False
-                with ctx.video_processor.frame_lock:
-                    drowsy = ctx.video_processor.alarm_on
-                
+        version = 0
+        tick_s = 1.0 / PANEL_REFRESH_HZ
+        next_tick = time.monotonic()
+        admission_shown = False
+        while ctx.state.playing:
+            processor = ctx.video_processor
+            if processor is None:
+                # Processor is created shortly after the stream starts
+                time.sleep(0.1)
+                continue
+            
+            if not admission_shown:
+                admission_shown = True
+                admission = processor.admission
+                if admission is not None and admission.rejected:
+                    session_notice.warning(f"⚠️ The server is at capacity ({admission.reason}). "
+                                           "Please stop the stream and try again later.")
+                    break
+                if admission is not None and admission.degraded:
+                    session_notice.info(f"The server is busy: video is analysed at "
+                                        f"{admission.degraded_fps:g} fps for this session.")
+            
+            timeout = max(0.0, next_tick - time.monotonic())
+            new_version, drowsy = processor.alarm_signal.wait_for_change(version, timeout=timeout)
+            changed = new_version != version
+            version = new_version
+            
+            if changed:
                 if drowsy:
-                    # Inject audio HTML - plays alarm.wav
+                    # Inject audio HTML once per onset - plays alarm.wav (looped)
                     sound_placeholder.markdown(AUDIO_HTML, unsafe_allow_html=True)
                 else:
                     # Remove audio element to stop playback
                     sound_placeholder.empty()
             
-            # Fast polling (50ms)
-            time.sleep(0.05)
+            # Alarm transitions show at once, everything else on the next tick
+            now = time.monotonic()
+            if changed or now >= next_tick:
+                panel.update(processor.live_feed.drain())
+                next_tick = max(next_tick + tick_s, now)
+            
+            if processor.alarm_signal.closed:
+                break
     
     # ==========================================================================
     # FOOTER
@@ -441,6 +504,8 @@ def main():
         </div>
     </div>
     """, unsafe_allow_html=True)
+    
+    STARTUP.mark("first_render")
 
 # =============================================================================
 # ENTRY POINT
@@ -22,7 +22,210 @@ MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
 # EYE ASPECT RATIO (EAR) SETTINGS
 # -----------------------------------------------------------------------------
 EYE_ASPECT_RATIO_THRESHOLD = 0.175
-EYE_ASPECT_RATIO_CONSEC_FRAMES = 8
+# Eyes must stay closed this long (frame time, not frame count) to alarm.
+# 270 ms matches the previous 8-frame rule at 30 fps.
+EYE_CLOSED_DURATION_MS = 270
+
+# -----------------------------------------------------------------------------
+# PER-USER EAR CALIBRATION
+# -----------------------------------------------------------------------------
+# "off":       always use EYE_ASPECT_RATIO_THRESHOLD
+# "calibrate": learn each face's open-eye EAR for EAR_CALIBRATION_MS, then fix
+#              its threshold (the global threshold applies meanwhile)
+# "adaptive":  calibrate, then keep following slow drift (lighting, pose)
+#              with an exponentially weighted mean/variance
+EAR_CALIBRATION_MODE = "off"
+EAR_CALIBRATION_MS = 5000
+EAR_CALIBRATION_MIN_SAMPLES = 30
+EAR_CALIBRATION_RATIO = 0.7         # threshold = ratio * open-eye mean ...
+EAR_CALIBRATION_SIGMAS = 3.0        # ... but at least this many std below it
+EAR_CALIBRATION_MIN_OPEN = 0.1      # samples below this are never "open"
+EAR_CALIBRATION_BOUNDS = (0.10, 0.30)
+EAR_ADAPT_HALFLIFE_MS = 120000      # memory of the adaptive statistics
+
+# -----------------------------------------------------------------------------
+# FATIGUE METRICS (PERCLOS / BLINKS)
+# -----------------------------------------------------------------------------
+# Computed per face over a sliding window of frame time. Closures up to
+# FATIGUE_MAX_BLINK_MS count as blinks; longer ones only add to PERCLOS.
+FATIGUE_WINDOW_MS = 60000
+FATIGUE_MAX_FPS = 60                # sizes the preallocated ring buffers
+FATIGUE_MAX_BLINK_MS = 500
+FATIGUE_MAX_FRAME_GAP_MS = 200      # longer gaps (face lost) are not counted
+
+# -----------------------------------------------------------------------------
+# LANDMARK SETTINGS
+# -----------------------------------------------------------------------------
+# MediaPipe Face Mesh indices (p1..p6) for each eye
+LEFT_EYE_INDICES = [33, 160, 158, 133, 153, 144]
+RIGHT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
+
+# Face oval (used to derive the face bounding box)
+FACE_OVAL_INDICES = [
+    10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288,
+    397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136,
+    172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109,
+]
+
+# -----------------------------------------------------------------------------
+# MULTI-FACE MONITORING
+# -----------------------------------------------------------------------------
+# Faces scored per frame (e.g. 2 for driver + co-driver). Each face keeps its
+# own alarm timing, matched across frames by eye-region centroid distance.
+MAX_FACES = 1
+FACE_ID_MAX_DISTANCE = 1.0          # centroid shift, in eye-region widths ...
+FACE_ID_DISTANCE_STEP_MS = 100      # ... per this much time since last seen
+FACE_ID_MAX_MISSING_MS = 1000       # forget an unseen face after this long
+# With fewer faces than MAX_FACES tracked, the face ROI is dropped for one
+# full-frame inference at this interval so new faces can be picked up.
+FACE_SEARCH_INTERVAL_MS = 1000
+
+# -----------------------------------------------------------------------------
+# INFERENCE SCHEDULING
+# -----------------------------------------------------------------------------
+# Run the landmarker every N frames (1 = every frame); skipped frames reuse
+# the last landmarks. When adaptive, the interval grows up to the maximum
+# while inference latency exceeds the measured frame interval.
+INFERENCE_FRAME_INTERVAL = 1
+INFERENCE_MAX_FRAME_INTERVAL = 4
+INFERENCE_ADAPTIVE = True
+
+# -----------------------------------------------------------------------------
+# EYE TRACKING (OPTICAL FLOW BETWEEN KEYFRAMES)
+# -----------------------------------------------------------------------------
+# When enabled, the landmarker only runs on keyframes and the 12 eye points
+# are propagated with Lucas-Kanade flow in between.
+EYE_TRACKING_ENABLED = False
+EYE_TRACKER_KEYFRAME_INTERVAL = 10
+EYE_TRACKER_FB_THRESHOLD = 1.5      # pixels
+EYE_TRACKER_MAX_SCALE_DRIFT = 0.15  # relative eye-width change
+EYE_TRACKER_ROI_MARGIN = 0.3        # fraction of eye-region width
+
+# -----------------------------------------------------------------------------
+# FACE ROI (CROP + DOWNSCALE BEFORE INFERENCE)
+# -----------------------------------------------------------------------------
+# When a face was found on the previous inference, only a padded square
+# around it is cropped, resized to FACE_ROI_INPUT_SIZE and sent to MediaPipe.
+# Falls back to the full frame when the face is lost.
+FACE_ROI_ENABLED = True
+FACE_ROI_INPUT_SIZE = 256           # pixels (square)
+FACE_ROI_PADDING = 0.4              # fraction of face size added per side
+FACE_ROI_MIN_FACE_SIZE = 24         # pixels; smaller boxes count as lost
+
+# -----------------------------------------------------------------------------
+# VIDEO OUTPUT (STREAMLIT APP)
+# -----------------------------------------------------------------------------
+# "annotated":   draw the overlay and send the video back (SENDRECV)
+# "passthrough": send the original frames back untouched (no drawing or
+#                BGR re-encode; the browser still shows the camera)
+# "none":        results only (SENDONLY); alarm and metrics are delivered
+#                out-of-band and no video is sent back
+VIDEO_OUTPUT = "annotated"
+
+# -----------------------------------------------------------------------------
+# LIVE METRICS PANEL (STREAMLIT APP)
+# -----------------------------------------------------------------------------
+# The UI drains per-frame samples from a bounded queue and redraws the
+# panel at most PANEL_REFRESH_HZ times per second, independent of video FPS.
+PANEL_REFRESH_HZ = 5
+PANEL_QUEUE_SIZE = 64               # samples buffered between UI ticks
+PANEL_SPARKLINE_POINTS = 50         # one point per UI tick (~10 s at 5 Hz)
+PANEL_EAR_SCALE = 0.4               # EAR shown as a full gauge / sparkline top
+
+# -----------------------------------------------------------------------------
+# BACKPRESSURE (WEBRTC ASYNC PROCESSING)
+# -----------------------------------------------------------------------------
+# Which queued frames are analysed when processing falls behind:
+# "latest", "drop_oldest" (keep BACKPRESSURE_MAX_BATCH newest) or
+# "fixed_rate" (BACKPRESSURE_SAMPLE_FPS of frame time). Only the newest
+# analysed frame is annotated and sent back.
+BACKPRESSURE_POLICY = "latest"
+BACKPRESSURE_MAX_BATCH = 3
+BACKPRESSURE_SAMPLE_FPS = 15
+
+# Frame time is built from pts deltas (RTP timestamps start at a random
+# value and wrap at 2**32 ticks). A delta above this, or backwards by more,
+# counts as a clock jump and is replaced by the elapsed wall-clock time.
+FRAME_CLOCK_MAX_JUMP_MS = 5000.0
+
+# -----------------------------------------------------------------------------
+# ASYNCHRONOUS INFERENCE (MEDIAPIPE LIVE_STREAM MODE)
+# -----------------------------------------------------------------------------
+# When enabled, frames are submitted with detect_async and the landmarks
+# arrive on MediaPipe's thread, which also advances the alarm state. The
+# frame path no longer waits for inference: each frame is annotated with
+# the most recent completed result, and frames arriving while an inference
+# is in flight are not submitted. Eye tracking (optical flow) needs VIDEO mode.
+LANDMARKER_LIVE_STREAM = False
+LIVE_STREAM_RESULT_TIMEOUT_MS = 1000  # resubmit if a result never arrives
+
+# -----------------------------------------------------------------------------
+# LANDMARKER POOL (SHARED ACROSS WEBRTC SESSIONS)
+# -----------------------------------------------------------------------------
+LANDMARKER_POOL_SIZE = 8            # max landmarkers (= concurrent sessions)
+LANDMARKER_POOL_WARM = 1            # created and warmed up at startup
+LANDMARKER_POOL_TIMEOUT_S = 5.0     # wait for a free landmarker on connect
+# Idle landmarkers beyond LANDMARKER_POOL_WARM are closed once unused this
+# long, so churning sessions reuse warm models but a past spike's do not linger
+LANDMARKER_POOL_IDLE_TIMEOUT_S = 300.0
+
+# -----------------------------------------------------------------------------
+# INFERENCE WORKER PROCESSES
+# -----------------------------------------------------------------------------
+# With INFERENCE_WORKERS > 0, landmark inference runs in that many spawned
+# worker processes instead of the sessions' threads, so concurrent sessions
+# use several cores. Frames are handed over through preallocated shared
+# memory (one slot per concurrent session, LANDMARKER_POOL_SIZE slots).
+# 0 keeps inference in-process. Not combinable with LANDMARKER_LIVE_STREAM.
+INFERENCE_WORKERS = 0
+INFERENCE_WORKER_MAX_FRAME = (1280, 720)    # larger inputs are downscaled into the slot
+INFERENCE_WORKER_TIMEOUT_S = 2.0            # unanswered request -> worker restarted
+INFERENCE_WORKER_HEALTH_INTERVAL_S = 1.0    # ping interval
+
+# -----------------------------------------------------------------------------
+# SESSION ADMISSION CONTROL
+# -----------------------------------------------------------------------------
+# New streams are admitted by a process-wide session manager. Beyond
+# SESSION_MAX_CONCURRENT active sessions they are rejected. While node CPU
+# utilisation (0..1 of all cores, projected to include sessions admitted
+# since the last sample) is at or above SESSION_CPU_BUDGET, new sessions are
+# "degrade"d to SESSION_DEGRADED_FPS analysed frames per second or
+# "reject"ed. Running sessions are never downgraded. 0 disables the budget.
+SESSION_MAX_CONCURRENT = LANDMARKER_POOL_SIZE
+SESSION_CPU_BUDGET = 0.85
+SESSION_SATURATION_POLICY = "degrade"
+SESSION_DEGRADED_FPS = 5
+SESSION_CPU_SAMPLE_INTERVAL_S = 1.0
+SESSION_CPU_SMOOTHING = 0.5         # EMA factor per sample
+
+# -----------------------------------------------------------------------------
+# METRICS (PROMETHEUS TEXT FORMAT)
+# -----------------------------------------------------------------------------
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+METRICS_WINDOW = 1024               # samples per stage histogram
+
+# -----------------------------------------------------------------------------
+# SESSION TELEMETRY (BINARY, MEMORY-MAPPED)
+# -----------------------------------------------------------------------------
+# One fixed-width record per analysed frame, appended by a writer thread to
+# TELEMETRY_DIR/<start time>_<session>.tlm. Load with
+# `src.core.telemetry.load_telemetry`. Off by default: files accumulate
+# until removed, so point TELEMETRY_DIR at a data volume before enabling.
+TELEMETRY_ENABLED = False
+TELEMETRY_DIR = os.path.join(PROJECT_ROOT, "telemetry")
+TELEMETRY_BUFFER_RECORDS = 4096     # staged in memory; extra records are dropped
+TELEMETRY_FLUSH_INTERVAL_S = 1.0
+TELEMETRY_GROW_RECORDS = 108000     # file grows in ~1 h chunks at 30 fps
+
+# -----------------------------------------------------------------------------
+# LOCAL PIPELINE (local_debug.py)
+# -----------------------------------------------------------------------------
+# Capture, inference and display run on separate threads linked by
+# single-slot queues that always hold the newest frame.
+PIPELINE_STATS_WINDOW = 300         # frames per stage latency window
+PIPELINE_REPORT_INTERVAL_S = 5.0    # console report of per-stage FPS / latency
 
 # -----------------------------------------------------------------------------
 # HARDWARE SETTINGS
@@ -0,0 +1,156 @@
+"""
+src/core/backpressure.py
+
+Backpressure policies for the WebRTC video processor.
+
+With `async_processing=True`, streamlit-webrtc hands the processor every
+frame that arrived while the previous batch was being processed. `FrameGate`
+decides which of those frames are analysed and drops (and counts) the rest,
+so a saturated node processes fresh video instead of an ever-growing
+backlog.
+
+Policies:
+    latest       Analyse only the newest frame of each batch.
+    drop_oldest  Analyse at most `max_batch` newest frames of each batch.
+    fixed_rate   Analyse frames at most `sample_fps` times per second of
+                 frame time, regardless of how they are batched.
+
+Frame time comes from `FrameClock`, a session-relative clock built from
+pts deltas, so it is immune to the random start and 32-bit wraparound of
+RTP timestamps.
+"""
+
+import threading
+import time
+from fractions import Fraction
+from typing import List, Optional, Sequence, TypeVar
+
+from src.config import (
+    BACKPRESSURE_MAX_BATCH,
+    BACKPRESSURE_POLICY,
+    BACKPRESSURE_SAMPLE_FPS,
+    FRAME_CLOCK_MAX_JUMP_MS,
+)
+
+T = TypeVar("T")
+
+POLICY_LATEST = "latest"
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_FIXED_RATE = "fixed_rate"
+POLICIES = (POLICY_LATEST, POLICY_DROP_OLDEST, POLICY_FIXED_RATE)
+
+# Slack for pts rounding / capture jitter when sampling at a fixed rate
+_SAMPLE_TOLERANCE_MS = 1.0
+
+# RTP timestamps are 32-bit
+_PTS_WRAP = 2 ** 32
+
+
+class FrameClock:
+    """
+    Session-relative frame time in ms, from pts deltas unwrapped modulo 2**32.
+
+    The first frame is at the wall-clock time since the clock was created.
+    Each later frame advances the clock by its pts delta to the newest frame
+    seen so far; a slightly older frame (e.g. earlier in the same queued
+    batch) is placed before it without moving the clock back. A jump beyond
+    `max_jump_ms` in either direction (sender restart, clock reset) advances
+    the clock by the elapsed wall-clock time instead, as do frames without pts.
+    """
+
+    def __init__(self, max_jump_ms: float = FRAME_CLOCK_MAX_JUMP_MS):
+        self.max_jump_ms = max_jump_ms
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._pts: Optional[int] = None     # pts of the newest frame
+        self._ms = 0.0                      # its session time
+        self._wall = self._start            # when it arrived
+
+    def timestamp_ms(self, pts: Optional[int], time_base: Optional[Fraction]) -> float:
+        """Session time (ms) of a frame with the given pts and time base."""
+        now = time.monotonic()
+        with self._lock:
+            if pts is None or time_base is None or self._pts is None:
+                if self._pts is None:
+                    self._ms = (now - self._start) * 1000.0
+                else:
+                    self._ms += (now - self._wall) * 1000.0
+                self._pts = pts
+                self._wall = now
+                return self._ms
+
+            ticks = (pts - self._pts) % _PTS_WRAP
+            if ticks >= _PTS_WRAP // 2:
+                ticks -= _PTS_WRAP
+            delta_ms = float(ticks * time_base) * 1000.0
+            if -self.max_jump_ms <= delta_ms < 0:
+                return self._ms + delta_ms
+            if delta_ms < 0 or delta_ms > self.max_jump_ms:
+                delta_ms = (now - self._wall) * 1000.0
+            self._pts = pts
+            self._ms += delta_ms
+            self._wall = now
+            return self._ms
+
+
+class FrameGate:
+    """Selects which queued frames get analysed and counts the dropped ones."""
+
+    def __init__(self,
+                 policy: str = BACKPRESSURE_POLICY,
+                 max_batch: int = BACKPRESSURE_MAX_BATCH,
+                 sample_fps: float = BACKPRESSURE_SAMPLE_FPS):
+        """
+        Args:
+            policy: One of `POLICIES`.
+            max_batch: Frames kept per batch for `drop_oldest`.
+            sample_fps: Analysis rate for `fixed_rate`.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected one of {POLICIES}")
+        self.policy = policy
+        self.max_batch = max(1, int(max_batch))
+        self.sample_interval_ms = 1000.0 / sample_fps if sample_fps > 0 else 0.0
+
+        self._lock = threading.Lock()
+        self._last_sampled_ms = None
+        self.frames_received = 0
+        self.frames_dropped = 0
+
+    def select(self, frames: Sequence[T], timestamps_ms: Sequence[float]) -> List[T]:
+        """
+        Picks the frames to analyse from one queued batch.
+
+        Args:
+            frames: Queued frames, oldest first.
+            timestamps_ms: Frame timestamps (ms), same order as `frames`.
+
+        Returns:
+            List[T]: Frames to analyse, oldest first (may be empty for
+                `fixed_rate`). Everything else is counted as dropped.
+        """
+        if self.policy == POLICY_LATEST:
+            selected = list(frames[-1:])
+        elif self.policy == POLICY_DROP_OLDEST:
+            selected = list(frames[-self.max_batch:])
+        else:
+            selected = []
+            for frame, ts in zip(frames, timestamps_ms):
+                if (self._last_sampled_ms is None
+                        or ts - self._last_sampled_ms >= self.sample_interval_ms - _SAMPLE_TOLERANCE_MS
+                        or ts < self._last_sampled_ms):
+                    selected.append(frame)
+                    self._last_sampled_ms = ts
+
+        with self._lock:
+            self.frames_received += len(frames)
+            self.frames_dropped += len(frames) - len(selected)
+        return selected
+
+    @property
+    def drop_ratio(self) -> float:
+        """Fraction of received frames that were not analysed."""
+        with self._lock:
+            if self.frames_received == 0:
+                return 0.0
+            return self.frames_dropped / self.frames_received
@@ -0,0 +1,159 @@
+"""
+src/core/calibration.py
+
+Per-user EAR threshold calibration from streaming statistics.
+
+Open-eye EAR differs a lot between people, so a single global threshold
+alarms too early for narrow eyes and too late for wide ones. Each face
+keeps O(1) running statistics of its open-eye EAR (Welford mean/variance,
+optionally exponentially weighted) and derives its own threshold from
+them. Samples are consumed one at a time in the frame path; no history
+is stored.
+"""
+
+import math
+from typing import Optional
+
+from src.config import (
+    EAR_ADAPT_HALFLIFE_MS,
+    EAR_CALIBRATION_BOUNDS,
+    EAR_CALIBRATION_MIN_OPEN,
+    EAR_CALIBRATION_MIN_SAMPLES,
+    EAR_CALIBRATION_MODE,
+    EAR_CALIBRATION_MS,
+    EAR_CALIBRATION_RATIO,
+    EAR_CALIBRATION_SIGMAS,
+    EYE_ASPECT_RATIO_THRESHOLD,
+)
+
+MODE_OFF = "off"
+MODE_CALIBRATE = "calibrate"
+MODE_ADAPTIVE = "adaptive"
+MODES = (MODE_OFF, MODE_CALIBRATE, MODE_ADAPTIVE)
+
+# Once this many samples are in, values far below the mean are blinks
+_OUTLIER_MIN_SAMPLES = 10
+_OUTLIER_SIGMAS = 2.5
+
+
+class RunningStats:
+    """
+    Weighted Welford mean / variance in constant memory.
+
+    With `decay` < 1 the previous samples are down-weighted before each
+    update, giving an exponentially weighted mean and variance.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.weight = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value: float, decay: float = 1.0):
+        self.count += 1
+        self.weight = self.weight * decay + 1.0
+        delta = value - self.mean
+        self.mean += delta / self.weight
+        self._m2 = self._m2 * decay + delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.weight if self.weight > 0 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.variance, 0.0))
+
+
+class EARCalibrator:
+    """Learns one face's open-eye EAR and turns it into an alarm threshold."""
+
+    def __init__(self,
+                 mode: str = EAR_CALIBRATION_MODE,
+                 calibration_ms: float = EAR_CALIBRATION_MS,
+                 min_samples: int = EAR_CALIBRATION_MIN_SAMPLES,
+                 ratio: float = EAR_CALIBRATION_RATIO,
+                 sigmas: float = EAR_CALIBRATION_SIGMAS,
+                 min_open: float = EAR_CALIBRATION_MIN_OPEN,
+                 bounds=EAR_CALIBRATION_BOUNDS,
+                 halflife_ms: float = EAR_ADAPT_HALFLIFE_MS,
+                 default_threshold: float = EYE_ASPECT_RATIO_THRESHOLD):
+        """
+        Args:
+            mode: "off", "calibrate" (learn once, then fix the threshold) or
+                "adaptive" (keep learning after calibration).
+            calibration_ms: Length of the calibration phase in frame time.
+            min_samples: Open-eye samples needed before calibration ends.
+            ratio: Threshold as a fraction of the open-eye mean EAR.
+            sigmas: The threshold also stays this many standard deviations
+                below the mean, so noisy landmarks do not alarm.
+            min_open: Samples below this EAR never count as open eyes.
+            bounds: (low, high) clamp for the derived threshold.
+            halflife_ms: Half-life of the adaptive statistics.
+            default_threshold: Threshold used until calibration completes.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown calibration mode {mode!r} (expected one of {MODES})")
+        self.mode = mode
+        self.calibration_ms = calibration_ms
+        self.min_samples = min_samples
+        self.ratio = ratio
+        self.sigmas = sigmas
+        self.min_open = min_open
+        self.bounds = bounds
+        self.halflife_ms = halflife_ms
+        self.default_threshold = default_threshold
+        self.reset()
+
+    def reset(self):
+        self.stats = RunningStats()
+        self.threshold = self.default_threshold
+        self.calibrated = False
+        self._start_ms: Optional[float] = None
+        self._last_ms: Optional[float] = None
+
+    def _is_open(self, ear: float) -> bool:
+        if ear < self.min_open:
+            return False
+        if self.calibrated:
+            return ear >= self.threshold
+        stats = self.stats
+        return (stats.count < _OUTLIER_MIN_SAMPLES
+                or ear >= stats.mean - _OUTLIER_SIGMAS * stats.std)
+
+    def _derive_threshold(self) -> float:
+        mean, std = self.stats.mean, self.stats.std
+        threshold = min(self.ratio * mean, mean - self.sigmas * std)
+        low, high = self.bounds
+        return min(max(threshold, low), high)
+
+    def update(self, ear: float, timestamp_ms: float) -> float:
+        """
+        Feeds one EAR sample of this face.
+
+        Returns:
+            float: The threshold to apply to this frame.
+        """
+        if self.mode == MODE_OFF:
+            return self.threshold
+        if self._start_ms is None:
+            self._start_ms = timestamp_ms
+
+        if self.calibrated and self.mode == MODE_CALIBRATE:
+            return self.threshold
+
+        if self._is_open(ear):
+            decay = 1.0
+            if self.calibrated and self._last_ms is not None:
+                decay = 0.5 ** ((timestamp_ms - self._last_ms) / self.halflife_ms)
+            self.stats.update(ear, decay)
+            self._last_ms = timestamp_ms
+
+        if self.calibrated:
+            self.threshold = self._derive_threshold()
+        elif (timestamp_ms - self._start_ms >= self.calibration_ms
+              and self.stats.count >= self.min_samples):
+            self.calibrated = True
+            self.threshold = self._derive_threshold()
+        return self.threshold
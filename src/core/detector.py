@@ -0,0 +1,472 @@
+"""
+src/core/detector.py
+
+Detection core shared by the Streamlit app and the local OpenCV debug mode.
+
+`DrowsinessDetector` turns (BGR or RGB frame, capture timestamp) pairs into
+`FrameResult`s: it schedules landmark inference, tracks / crops around the
+face, scores EAR and runs a time-based alarm state machine per tracked face
+(multiple faces are scored together in one vectorized pass). All timing is
+driven by the caller's frame timestamps (WebRTC pts or monotonic capture
+time), so alarm latency no longer depends on the frame rate the client
+reaches.
+
+In LIVE_STREAM mode `process` only submits the frame to the landmarker and
+returns the most recent completed result; landmarks are scored (identity,
+calibration, alarm, fatigue) by the result callback on MediaPipe's thread,
+in frame-timestamp order.
+"""
+
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from src.config import (
+    EAR_CALIBRATION_MODE,
+    EYE_ASPECT_RATIO_THRESHOLD,
+    EYE_CLOSED_DURATION_MS,
+    EYE_TRACKER_KEYFRAME_INTERVAL,
+    EYE_TRACKING_ENABLED,
+    FACE_ROI_ENABLED,
+    FACE_SEARCH_INTERVAL_MS,
+    INFERENCE_ADAPTIVE,
+    INFERENCE_MAX_FRAME_INTERVAL,
+    LANDMARKER_LIVE_STREAM,
+    LIVE_STREAM_RESULT_TIMEOUT_MS,
+    MAX_FACES,
+)
+from src.core.calibration import MODES as CALIBRATION_MODES, EARCalibrator
+from src.core.fatigue import FatigueMonitor, FatigueSnapshot
+from src.core.identity import FaceIdentityTracker
+from src.core.landmarker import create_landmarker
+from src.core.roi import FaceROI, ROITransform
+from src.core.scheduler import InferenceScheduler
+from src.core.tracker import EyeFlowTracker
+from src.utils.geometry import EYE_INDICES, eye_aspect_ratios
+
+
+class FrameResult(NamedTuple):
+    """Per-frame output of the detection core."""
+    timestamp_ms: int
+    ear: float                          # average EAR of the first face (0.0 if none)
+    alarm_on: bool                      # any face is alarming
+    face_found: bool
+    eye_points: Optional[np.ndarray]    # (N_faces, 2, 6, 2) frame pixels
+    ears: Optional[np.ndarray]          # (N_faces, 2)
+    closed_ms: float                    # longest current eye closure of any face
+    inferred: bool                      # landmarker ran on this frame
+    face_ids: np.ndarray                # (N_faces,) stable identity per face
+    face_ears: np.ndarray               # (N_faces,) average EAR per face
+    face_alarms: np.ndarray             # (N_faces,) bool alarm per face
+    face_thresholds: np.ndarray         # (N_faces,) EAR threshold per face
+    fatigue: Optional[FatigueSnapshot]  # PERCLOS / blinks of the first face
+    face_fatigue: List[FatigueSnapshot] # per face
+
+
+class DrowsinessStateMachine:
+    """
+    Duration-based eye-closure alarm.
+
+    The alarm is raised once EAR has stayed below the threshold for
+    `closed_duration_ms` of frame time, and cleared on the first open-eye
+    frame. Frames without a face report no alarm; a face gap longer than
+    the closure duration ends the current closure episode.
+    """
+
+    def __init__(self,
+                 threshold: float = EYE_ASPECT_RATIO_THRESHOLD,
+                 closed_duration_ms: float = EYE_CLOSED_DURATION_MS):
+        self.threshold = threshold
+        self.closed_duration_ms = closed_duration_ms
+        self.reset()
+
+    def reset(self):
+        self.closed_since_ms: Optional[float] = None
+        self.last_face_ms: Optional[float] = None
+        self.alarm_on = False
+
+    def closed_ms(self, timestamp_ms: float) -> float:
+        """Duration of the current closure episode at `timestamp_ms`."""
+        if self.closed_since_ms is None:
+            return 0.0
+        return timestamp_ms - self.closed_since_ms
+
+    def update(self, ear: Optional[float], timestamp_ms: float) -> bool:
+        """
+        Feeds one frame.
+
+        Args:
+            ear: Average EAR, or None when no face is visible.
+            timestamp_ms: Frame timestamp in milliseconds.
+
+        Returns:
+            bool: Whether the alarm is on after this frame.
+        """
+        if ear is None:
+            if (self.last_face_ms is not None
+                    and timestamp_ms - self.last_face_ms > self.closed_duration_ms):
+                self.closed_since_ms = None
+            self.alarm_on = False
+            return False
+
+        self.last_face_ms = timestamp_ms
+        if ear < self.threshold:
+            if self.closed_since_ms is None:
+                self.closed_since_ms = timestamp_ms
+            self.alarm_on = self.closed_ms(timestamp_ms) >= self.closed_duration_ms
+        else:
+            self.closed_since_ms = None
+            self.alarm_on = False
+        return self.alarm_on
+
+
+class FaceState:
+    """Everything the detector tracks for one face identity."""
+
+    def __init__(self, calibration: str = EAR_CALIBRATION_MODE):
+        self.alarm = DrowsinessStateMachine()
+        self.calibrator = EARCalibrator(mode=calibration)
+        self.fatigue = FatigueMonitor()
+
+
+class DrowsinessDetector:
+    """Frame-in, result-out drowsiness detection pipeline."""
+
+    def __init__(self,
+                 tracking: bool = EYE_TRACKING_ENABLED,
+                 face_roi: bool = FACE_ROI_ENABLED,
+                 landmarker=None,
+                 adaptive: bool = INFERENCE_ADAPTIVE,
+                 metrics=None,
+                 num_faces: int = MAX_FACES,
+                 calibration: str = EAR_CALIBRATION_MODE,
+                 rgb_input: bool = False,
+                 live_stream: bool = LANDMARKER_LIVE_STREAM):
+        """
+        Args:
+            tracking: Propagate eye points with optical flow between keyframes.
+            face_roi: Crop and downscale around the last face before inference.
+            landmarker: Existing FaceLandmarker in the matching running mode,
+                or a `WorkerLease` (one is created when omitted and closed
+                by `close()`).
+            adaptive: Let the scheduler skip more frames under load. Offline
+                analysis turns this off so results do not depend on CPU speed.
+            metrics: Optional `SessionMetrics` receiving per-stage latencies.
+            num_faces: Maximum faces to monitor. A passed-in `landmarker`
+                must have been created with the same `num_faces`.
+            calibration: Per-face EAR threshold calibration mode ("off",
+                "calibrate" or "adaptive", see `EARCalibrator`).
+            rgb_input: Frames passed to `process` are RGB (e.g. decoded
+                with `format="rgb24"`), so no color conversion is needed
+                before inference.
+            live_stream: Submit frames with `detect_async` and score results
+                in the landmarker's callback (`landmarker` must then be a
+                `LiveStreamLandmarker` or a lease from a live-stream pool).
+                Not combinable with `tracking`.
+        """
+        if live_stream and tracking:
+            raise ValueError("Eye tracking needs VIDEO mode (live_stream=False)")
+        if live_stream and getattr(landmarker, "array_input", False):
+            raise ValueError("LIVE_STREAM mode needs an in-process landmarker")
+        self.num_faces = num_faces
+        self.rgb_input = rgb_input
+        self.live_stream = live_stream
+        self._owns_landmarker = landmarker is None
+        self.landmarker = (landmarker if landmarker is not None
+                           else create_landmarker(num_faces=num_faces, live_stream=live_stream))
+        self._last_timestamp_ms = -1
+        # Inference worker leases take the NumPy input directly (no mp.Image)
+        self._array_input = getattr(self.landmarker, "array_input", False)
+
+        # Frame skipping: skipped frames reuse the last eye points / EARs,
+        # or propagate them with optical flow when tracking is enabled
+        if tracking:
+            self.scheduler = InferenceScheduler(
+                base_interval=EYE_TRACKER_KEYFRAME_INTERVAL,
+                max_interval=max(EYE_TRACKER_KEYFRAME_INTERVAL, INFERENCE_MAX_FRAME_INTERVAL),
+                adaptive=adaptive)
+            self.tracker = EyeFlowTracker(rgb_input=rgb_input)
+        else:
+            self.scheduler = InferenceScheduler(adaptive=adaptive)
+            self.tracker = None
+        self.eye_points = None
+        self.ears = None
+
+        # Crop + downscale around the last face before inference
+        self.roi = FaceROI(rgb_input=rgb_input) if face_roi else None
+        self._last_search_ms = None
+
+        # Alarm, calibration and fatigue state per face, keyed by a stable
+        # identity
+        if calibration not in CALIBRATION_MODES:
+            raise ValueError(f"Unknown calibration mode {calibration!r} "
+                             f"(expected one of {CALIBRATION_MODES})")
+        self.identities = FaceIdentityTracker(max_faces=num_faces)
+        self.calibration = calibration
+        self.faces: Dict[int, FaceState] = {}
+        self._retired_face: Optional[FaceState] = None
+
+        # Reused full-frame RGB buffer (when the ROI path is disabled)
+        self._rgb = None
+
+        self.metrics = metrics
+
+        # LIVE_STREAM mode: frames in flight (timestamp -> transform, submit
+        # time) and the latest scored result, shared with the callback thread
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[ROITransform, float]] = {}
+        self._latest: Optional[FrameResult] = None
+        if live_stream:
+            self.landmarker.result_callback = self._on_result
+
+    def _next_timestamp(self, timestamp_ms: float) -> int:
+        """MediaPipe VIDEO mode needs strictly increasing integer timestamps."""
+        ts = max(int(timestamp_ms), self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = ts
+        return ts
+
+    def _prepare(self, image: np.ndarray, timestamp_ms: int):
+        """RGB inference input and its transform back to frame pixels."""
+        height, width = image.shape[:2]
+
+        # With room for more faces, periodically look at the full frame
+        # so a newly seated passenger is not hidden by the face crop
+        if self.roi is not None and self.roi.active:
+            tracked = 0 if self.eye_points is None else len(self.eye_points)
+            if (tracked < self.num_faces and self._last_search_ms is not None
+                    and timestamp_ms - self._last_search_ms >= FACE_SEARCH_INTERVAL_MS):
+                self.roi.reset()
+        if self.roi is None or not self.roi.active:
+            self._last_search_ms = timestamp_ms
+
+        # MediaPipe expects RGB (face crop when tracked, else full frame)
+        if self.roi is not None:
+            image_rgb, transform = self.roi.prepare(image)
+        elif self.rgb_input:
+            image_rgb = image
+            transform = ROITransform(0.0, 0.0, width, height)
+        else:
+            if self._rgb is None or self._rgb.shape != image.shape:
+                self._rgb = np.empty_like(image)
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            transform = ROITransform(0.0, 0.0, width, height)
+        return image_rgb, transform
+
+    def _infer(self, image: np.ndarray, timestamp_ms: int):
+        t_start = time.perf_counter()
+        image_rgb, transform = self._prepare(image, timestamp_ms)
+        if not self._array_input:
+            image_rgb = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
+
+        t_convert = time.perf_counter()
+        results = self.landmarker.detect_for_video(image_rgb, timestamp_ms)
+        t_infer = time.perf_counter()
+        self.scheduler.record_inference(t_infer - t_convert)
+
+        self._apply(results, transform, image)
+
+        if self.metrics is not None:
+            self.metrics.observe("cvtcolor", t_convert - t_start)
+            self.metrics.observe("inference", t_infer - t_convert)
+            self.metrics.observe("ear", time.perf_counter() - t_infer)
+
+    def _apply(self, results, transform: ROITransform, image: Optional[np.ndarray]):
+        """Takes over the eye points / EARs of a landmarker result."""
+        if self.roi is not None:
+            self.roi.update(results.face_landmarks, transform)
+
+        if results.face_landmarks:
+            # (N_faces, 2, 6, 2) float eye points -> (N_faces, 2) EARs
+            self.eye_points = FaceROI.to_frame(results.face_landmarks, transform, EYE_INDICES)
+            self.ears = eye_aspect_ratios(self.eye_points)
+            if self.tracker is not None:
+                self.tracker.start(image, self.eye_points)
+        else:
+            if self.eye_points is not None:
+                # Face just lost: look again on the next frame rather than
+                # reporting "no face" for a whole skip interval
+                self.scheduler.force_inference()
+            self.eye_points = None
+            self.ears = None
+            if self.tracker is not None:
+                self.tracker.reset()
+
+    # -------------------------------------------------------------------------
+    # LIVE_STREAM mode
+    # -------------------------------------------------------------------------
+    def _submit(self, image: np.ndarray, timestamp_ms: int) -> FrameResult:
+        """Queues the frame unless an inference is in flight; returns the latest result."""
+        t_start = time.perf_counter()
+        with self._lock:
+            # A result MediaPipe never delivered stops blocking after a timeout
+            for ts in [ts for ts in self._pending
+                       if timestamp_ms - ts >= LIVE_STREAM_RESULT_TIMEOUT_MS]:
+                del self._pending[ts]
+            submit = not self._pending
+            if submit:
+                image_rgb, transform = self._prepare(image, timestamp_ms)
+                # mp.Image copies the pixels, so the reused buffers are free again
+                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
+                self._pending[timestamp_ms] = (transform, time.perf_counter())
+        if submit:
+            if self.metrics is not None:
+                self.metrics.observe("cvtcolor", time.perf_counter() - t_start)
+            self.landmarker.detect_async(mp_image, timestamp_ms)
+
+        latest = self._latest
+        if latest is None:
+            return self._empty_result(timestamp_ms)
+        return latest
+
+    def _on_result(self, results, timestamp_ms: int):
+        """Result callback (MediaPipe's thread): scores the submitted frame."""
+        t_start = time.perf_counter()
+        try:
+            with self._lock:
+                pending = self._pending.pop(timestamp_ms, None)
+                if pending is None:
+                    return  # timed out, or submitted before a reset
+                transform, t_submit = pending
+                self._apply(results, transform, None)
+                self._latest = self._result(timestamp_ms, inferred=True)
+        except Exception as e:
+            print(f"Error in landmarker callback: {e}")
+            return
+        if self.metrics is not None:
+            self.metrics.observe("inference", t_start - t_submit)
+            self.metrics.observe("ear", time.perf_counter() - t_start)
+
+    @staticmethod
+    def _empty_result(timestamp_ms: int) -> FrameResult:
+        """Result for frames before the first LIVE_STREAM result arrived."""
+        return FrameResult(
+            timestamp_ms=timestamp_ms, ear=0.0, alarm_on=False, face_found=False,
+            eye_points=None, ears=None, closed_ms=0.0, inferred=False,
+            face_ids=np.empty(0, dtype=np.int64), face_ears=np.empty(0, dtype=np.float32),
+            face_alarms=np.empty(0, dtype=bool), face_thresholds=np.empty(0, dtype=np.float32),
+            fatigue=None, face_fatigue=[],
+        )
+
+    def process(self, image: np.ndarray, timestamp_ms: float) -> FrameResult:
+        """
+        Runs detection on one frame.
+
+        Args:
+            image: BGR frame (RGB when `rgb_input`).
+            timestamp_ms: Capture / presentation time of the frame in ms.
+
+        Returns:
+            FrameResult: Landmarks, EAR and alarm state for this frame. In
+                LIVE_STREAM mode, the most recent completed result (its
+                `timestamp_ms` is that of the analysed frame).
+        """
+        timestamp_ms = self._next_timestamp(timestamp_ms)
+        if self.live_stream:
+            return self._submit(image, timestamp_ms)
+
+        run_inference = self.scheduler.should_infer(now=timestamp_ms / 1000.0)
+        measured = run_inference
+
+        if not run_inference and self.tracker is not None and self.eye_points is not None:
+            t_start = time.perf_counter()
+            tracked = self.tracker.update(image)
+            if tracked is not None:
+                self.eye_points = tracked
+                self.ears = eye_aspect_ratios(tracked)
+                measured = True
+                if self.metrics is not None:
+                    self.metrics.observe("track", time.perf_counter() - t_start)
+            else:
+                # Drift / low confidence: re-detect on this frame
+                self.scheduler.infer_now()
+                run_inference = measured = True
+
+        if run_inference:
+            self._infer(image, timestamp_ms)
+        return self._result(timestamp_ms, run_inference, measured)
+
+    def _result(self, timestamp_ms: int, inferred: bool, measured: bool = True) -> FrameResult:
+        face_ids, face_ears, face_alarms, face_thresholds, face_fatigue, closed_ms = \
+            self._score(timestamp_ms, measured)
+        face_found = self.eye_points is not None
+
+        return FrameResult(
+            timestamp_ms=timestamp_ms,
+            ear=float(face_ears[0]) if face_found else 0.0,
+            alarm_on=bool(face_alarms.any()),
+            face_found=face_found,
+            eye_points=self.eye_points,
+            ears=self.ears,
+            closed_ms=closed_ms,
+            inferred=inferred,
+            face_ids=face_ids,
+            face_ears=face_ears,
+            face_alarms=face_alarms,
+            face_thresholds=face_thresholds,
+            fatigue=face_fatigue[0] if face_fatigue else None,
+            face_fatigue=face_fatigue,
+        )
+
+    def _score(self, timestamp_ms: int, measured: bool):
+        """
+        Matches faces to identities and advances each face's state.
+
+        On frames that reused the last EARs (`measured` False) only the
+        alarm timing advances: calibration and fatigue windows take real
+        measurements only, so a stale keyframe is not counted repeatedly.
+        """
+        face_ids = self.identities.update(self.eye_points, timestamp_ms)
+        if self.ears is None:
+            face_ears = np.empty(0, dtype=np.float32)
+        else:
+            face_ears = self.ears.mean(axis=1)
+        face_alarms = np.zeros(len(face_ids), dtype=bool)
+        face_thresholds = np.empty(len(face_ids), dtype=np.float32)
+        face_fatigue = []
+
+        closed_ms = 0.0
+        for i, face_id in enumerate(face_ids.tolist()):
+            face = self.faces.get(face_id)
+            if face is None:
+                face = self.faces[face_id] = self._new_face()
+            ear = float(face_ears[i])
+            alarm = face.alarm
+            if measured:
+                alarm.threshold = face.calibrator.update(ear, timestamp_ms)
+                face_fatigue.append(face.fatigue.update(ear < alarm.threshold, timestamp_ms))
+            else:
+                face_fatigue.append(face.fatigue.snapshot())
+            face_thresholds[i] = alarm.threshold
+            face_alarms[i] = alarm.update(ear, timestamp_ms)
+            closed_ms = max(closed_ms, alarm.closed_ms(timestamp_ms))
+
+        # Faces briefly out of view keep their closure episode until the gap
+        # exceeds the closure duration; forgotten faces drop their state
+        for face_id in self.identities.missing:
+            face = self.faces.get(face_id)
+            if face is not None:
+                face.alarm.update(None, timestamp_ms)
+        for face_id in self.identities.expired:
+            self._retired_face = self.faces.pop(face_id, None)
+        return face_ids, face_ears, face_alarms, face_thresholds, face_fatigue, closed_ms
+
+    def _new_face(self) -> FaceState:
+        # A single-face session is one user: a face that returns after
+        # looking away keeps its calibration and fatigue history
+        if self.num_faces == 1 and self._retired_face is not None:
+            face, self._retired_face = self._retired_face, None
+            return face
+        return FaceState(self.calibration)
+
+    def close(self):
+        """Releases the landmarker if this detector created it."""
+        if self.landmarker is not None:
+            if self._owns_landmarker:
+                self.landmarker.close()
+            elif self.live_stream:
+                self.landmarker.result_callback = None
+        self.landmarker = None
@@ -0,0 +1,109 @@
+"""
+src/core/events.py
+
+Event primitives for handing detection state from the video thread to the UI.
+
+The video thread publishes the alarm state on every frame, but waiters are
+only woken when it actually changes. Each transition bumps a version
+number so a waiter never misses (or double-handles) an edge.
+
+`LiveFeed` carries the per-frame values shown in the live metrics panel.
+It is bounded (oldest samples are dropped), so a slow or absent UI reader
+never holds more than a fixed number of samples.
+"""
+
+import threading
+from collections import deque
+from typing import List, NamedTuple, Optional, Tuple
+
+from src.config import PANEL_QUEUE_SIZE
+
+
+class AlarmSignal:
+    """Condition-backed alarm state with versioned transitions."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._alarm_on = False
+        self._version = 0
+        self._closed = False
+
+    @property
+    def alarm_on(self) -> bool:
+        with self._cond:
+            return self._alarm_on
+
+    @property
+    def version(self) -> int:
+        with self._cond:
+            return self._version
+
+    def publish(self, alarm_on: bool):
+        """Sets the alarm state; wakes waiters only on a transition."""
+        with self._cond:
+            if alarm_on == self._alarm_on:
+                return
+            self._alarm_on = alarm_on
+            self._version += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """Wakes all waiters for good (the stream has ended)."""
+        with self._cond:
+            self._closed = True
+            self._alarm_on = False
+            self._version += 1
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        with self._cond:
+            return self._closed
+
+    def wait_for_change(self, last_version: int,
+                        timeout: Optional[float] = None) -> Tuple[int, bool]:
+        """
+        Blocks until the state moves past `last_version` (or timeout).
+
+        Args:
+            last_version: Version the caller has already handled.
+            timeout: Max seconds to wait (None = forever).
+
+        Returns:
+            Tuple[int, bool]: (current version, alarm state). The version is
+                unchanged when the wait timed out.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._version != last_version, timeout)
+            return self._version, self._alarm_on
+
+
+class PanelSample(NamedTuple):
+    """Values of one analysed frame for the live metrics panel."""
+    timestamp_ms: int
+    face_found: bool
+    ear: float
+    threshold: float
+    perclos: float
+    blink_rate: float
+    alarm_on: bool
+
+
+class LiveFeed:
+    """Bounded single-producer / single-consumer sample queue (drops oldest)."""
+
+    def __init__(self, maxlen: int = PANEL_QUEUE_SIZE):
+        self._samples = deque(maxlen=maxlen)
+
+    def push(self, sample: PanelSample):
+        # deque append / popleft are atomic, no lock needed
+        self._samples.append(sample)
+
+    def drain(self) -> List[PanelSample]:
+        """Removes and returns every queued sample, oldest first."""
+        samples = []
+        while True:
+            try:
+                samples.append(self._samples.popleft())
+            except IndexError:
+                return samples
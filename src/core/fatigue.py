@@ -0,0 +1,153 @@
+"""
+src/core/fatigue.py
+
+Windowed fatigue metrics: PERCLOS, blink rate and mean blink duration.
+
+Every metric is a running sum over a time-based sliding window. Samples
+live in preallocated NumPy ring buffers; each frame appends one sample and
+evicts the samples that fell out of the window, updating the sums
+incrementally, so the per-frame cost is O(1) amortised regardless of the
+window length.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from src.config import (
+    FATIGUE_MAX_BLINK_MS,
+    FATIGUE_MAX_FPS,
+    FATIGUE_MAX_FRAME_GAP_MS,
+    FATIGUE_WINDOW_MS,
+)
+
+# Blinks can not be closer together than this; sizes the blink ring
+_MIN_BLINK_INTERVAL_MS = 100.0
+
+
+class FatigueSnapshot(NamedTuple):
+    """Fatigue metrics of one face at one frame."""
+    perclos: float              # fraction of observed time with eyes closed
+    blink_rate: float           # blinks per minute of observed time
+    mean_blink_ms: float        # mean duration of blinks in the window
+    observed_ms: float          # face-visible time covered by the window
+
+
+class TimeWindow:
+    """Sliding window of (timestamp, value) samples with a running total."""
+
+    def __init__(self, window_ms: float, capacity: int):
+        self.window_ms = window_ms
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._head = 0
+        self._size = 0
+        self.total = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _pop(self):
+        self.total -= float(self._values[self._head])
+        self._head = (self._head + 1) % self._values.size
+        self._size -= 1
+        if self._size == 0:
+            self.total = 0.0  # drop accumulated rounding error
+
+    def expire(self, now_ms: float):
+        """Evicts samples older than the window."""
+        cutoff = now_ms - self.window_ms
+        while self._size and self._timestamps[self._head] <= cutoff:
+            self._pop()
+
+    def push(self, timestamp_ms: float, value: float):
+        if self._size == self._values.size:
+            self._pop()  # over capacity: the window shrinks rather than grows
+        index = (self._head + self._size) % self._values.size
+        self._timestamps[index] = timestamp_ms
+        self._values[index] = value
+        self._size += 1
+        self.total += value
+        self.expire(timestamp_ms)
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+        self.total = 0.0
+
+
+class FatigueMonitor:
+    """Tracks PERCLOS and blink statistics for one face."""
+
+    def __init__(self,
+                 window_ms: float = FATIGUE_WINDOW_MS,
+                 max_fps: float = FATIGUE_MAX_FPS,
+                 max_blink_ms: float = FATIGUE_MAX_BLINK_MS,
+                 max_frame_gap_ms: float = FATIGUE_MAX_FRAME_GAP_MS):
+        """
+        Args:
+            window_ms: Sliding window length in frame time.
+            max_fps: Highest expected frame rate (sizes the frame ring).
+            max_blink_ms: Longer closures are not counted as blinks.
+            max_frame_gap_ms: Frame intervals longer than this (dropped
+                frames, face out of view) are not counted as observed time.
+        """
+        self.max_blink_ms = max_blink_ms
+        self.max_frame_gap_ms = max_frame_gap_ms
+        frame_capacity = int(np.ceil(window_ms / 1000.0 * max_fps)) + 1
+        blink_capacity = int(np.ceil(window_ms / _MIN_BLINK_INTERVAL_MS)) + 1
+        self._observed = TimeWindow(window_ms, frame_capacity)
+        self._closed = TimeWindow(window_ms, frame_capacity)
+        self._blinks = TimeWindow(window_ms, blink_capacity)
+        self.reset()
+
+    def reset(self):
+        self._observed.clear()
+        self._closed.clear()
+        self._blinks.clear()
+        self._last_ms: Optional[float] = None
+        self._closed_since_ms: Optional[float] = None
+
+    def update(self, closed: bool, timestamp_ms: float) -> FatigueSnapshot:
+        """
+        Feeds one frame of this face.
+
+        Args:
+            closed: Whether the eyes are closed (EAR below threshold).
+            timestamp_ms: Frame timestamp in milliseconds.
+
+        Returns:
+            FatigueSnapshot: Metrics over the window ending at this frame.
+        """
+        gap = None if self._last_ms is None else timestamp_ms - self._last_ms
+        self._last_ms = timestamp_ms
+        if gap is None or gap > self.max_frame_gap_ms:
+            # Face was out of view: do not count the gap or a closure across it
+            dt = 0.0
+            self._closed_since_ms = timestamp_ms if closed else None
+        else:
+            dt = gap
+
+        self._observed.push(timestamp_ms, dt)
+        self._closed.push(timestamp_ms, dt if closed else 0.0)
+
+        if closed:
+            if self._closed_since_ms is None:
+                self._closed_since_ms = timestamp_ms
+        elif self._closed_since_ms is not None:
+            duration = timestamp_ms - self._closed_since_ms
+            if duration <= self.max_blink_ms:
+                self._blinks.push(timestamp_ms, duration)
+            self._closed_since_ms = None
+        self._blinks.expire(timestamp_ms)
+        return self.snapshot()
+
+    def snapshot(self) -> FatigueSnapshot:
+        observed = self._observed.total
+        blinks = len(self._blinks)
+        return FatigueSnapshot(
+            perclos=self._closed.total / observed if observed > 0 else 0.0,
+            blink_rate=blinks * 60000.0 / observed if observed > 0 else 0.0,
+            mean_blink_ms=self._blinks.total / blinks if blinks else 0.0,
+            observed_ms=observed,
+        )
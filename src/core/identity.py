@@ -0,0 +1,130 @@
+"""
+src/core/identity.py
+
+Lightweight face identity tracking across frames.
+
+MediaPipe returns faces in no guaranteed order, so per-face alarm state
+cannot be keyed by result index. Each face is summarised by the centroid
+and width of its eye region; new detections are greedily matched to the
+known faces by centroid distance (normalised by eye-region width), and
+unmatched detections get fresh ids. The allowed distance grows with the
+time a face has gone unseen, so low analysis rates and dropped frames do
+not split one face into two. A face that stays unmatched for longer than
+`max_missing_ms` is forgotten.
+
+With `max_faces=1` there is only ever one person to follow: the single
+detection always continues the most recently seen identity.
+"""
+
+import itertools
+from typing import List
+
+import numpy as np
+
+from src.config import (
+    FACE_ID_DISTANCE_STEP_MS,
+    FACE_ID_MAX_DISTANCE,
+    FACE_ID_MAX_MISSING_MS,
+    MAX_FACES,
+)
+
+
+class FaceIdentityTracker:
+    """Assigns stable integer ids to (N_faces, 2, 6, 2) eye points."""
+
+    def __init__(self,
+                 max_distance: float = FACE_ID_MAX_DISTANCE,
+                 max_missing_ms: float = FACE_ID_MAX_MISSING_MS,
+                 distance_step_ms: float = FACE_ID_DISTANCE_STEP_MS,
+                 max_faces: int = MAX_FACES):
+        """
+        Args:
+            max_distance: Largest centroid shift, in eye-region widths, that
+                still counts as the same face after `distance_step_ms`
+                (or less) unseen; scaled up linearly for longer gaps.
+            max_missing_ms: How long an unseen face keeps its id.
+            distance_step_ms: Time unseen per `max_distance` of allowed shift.
+            max_faces: Faces monitored; with 1, every detection continues
+                the single known identity regardless of distance.
+        """
+        self.max_distance = max_distance
+        self.max_missing_ms = max_missing_ms
+        self.distance_step_ms = distance_step_ms
+        self.max_faces = max_faces
+        self._next_id = itertools.count()
+        self.reset()
+
+    def reset(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self._centroids = np.empty((0, 2), dtype=np.float32)
+        self._widths = np.empty(0, dtype=np.float32)
+        self._last_seen_ms = np.empty(0, dtype=np.float64)
+        self.missing: List[int] = []
+        self.expired: List[int] = []
+
+    @staticmethod
+    def _describe(eye_points: np.ndarray):
+        """Eye-region centroids (N, 2) and widths (N,)."""
+        flat = eye_points.reshape(eye_points.shape[0], -1, 2)
+        lo = flat.min(axis=1)
+        hi = flat.max(axis=1)
+        return (lo + hi) * 0.5, np.maximum(hi[:, 0] - lo[:, 0], 1.0)
+
+    def update(self, eye_points, timestamp_ms: float) -> np.ndarray:
+        """
+        Matches this frame's faces to known identities.
+
+        Args:
+            eye_points: (N_faces, 2, 6, 2) frame pixels, or None for no face.
+            timestamp_ms: Frame timestamp in milliseconds.
+
+        Returns:
+            np.ndarray: (N_faces,) ids aligned with `eye_points`. Known faces
+                not seen on this frame are listed in `self.missing`, ids
+                dropped on this call in `self.expired`.
+        """
+        if eye_points is None or len(eye_points) == 0:
+            centroids = np.empty((0, 2), dtype=np.float32)
+            widths = np.empty(0, dtype=np.float32)
+        else:
+            centroids, widths = self._describe(eye_points)
+
+        n_new, n_known = len(centroids), len(self.ids)
+        assigned = np.full(n_new, -1, dtype=np.int64)
+        matched = np.zeros(n_known, dtype=bool)
+
+        if n_new == 1 and n_known and self.max_faces == 1:
+            j = int(np.argmax(self._last_seen_ms))
+            assigned[0] = j
+            matched[j] = True
+        elif n_new and n_known:
+            # (N_new, N_known) normalised distances, matched greedily; the
+            # limit grows with the time each known face has been unseen
+            dist = np.linalg.norm(centroids[:, None, :] - self._centroids[None, :, :], axis=2)
+            dist /= np.maximum(widths[:, None], self._widths[None, :])
+            gap_ms = timestamp_ms - self._last_seen_ms
+            limit = self.max_distance * np.maximum(1.0, gap_ms / self.distance_step_ms)
+            for flat in np.argsort(dist, axis=None):
+                i, j = divmod(int(flat), n_known)
+                if dist[i, j] > limit[j] or assigned[i] >= 0 or matched[j]:
+                    continue
+                assigned[i] = j
+                matched[j] = True
+
+        ids = np.empty(n_new, dtype=np.int64)
+        known = assigned >= 0
+        ids[known] = self.ids[assigned[known]]
+        ids[~known] = [next(self._next_id) for _ in range(int((~known).sum()))]
+
+        # Refresh matched faces, keep recently missed ones, forget stale ones
+        stale = ~matched & (timestamp_ms - self._last_seen_ms > self.max_missing_ms)
+        keep = ~matched & ~stale
+        self.missing = self.ids[keep].tolist()
+        self.expired = self.ids[stale].tolist()
+        self.ids = np.concatenate([ids, self.ids[keep]])
+        self._centroids = np.concatenate([centroids, self._centroids[keep]]).astype(np.float32)
+        self._widths = np.concatenate([widths, self._widths[keep]]).astype(np.float32)
+        self._last_seen_ms = np.concatenate(
+            [np.full(n_new, timestamp_ms, dtype=np.float64), self._last_seen_ms[keep]])
+        return ids
+
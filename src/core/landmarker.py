@@ -0,0 +1,353 @@
+"""
+src/core/landmarker.py
+
+Factory and process-wide pool for the MediaPipe Face Landmarker (Tasks API).
+
+Landmarkers run in VIDEO mode (`detect_for_video` blocks the caller until
+the result is ready) or, optionally, in LIVE_STREAM mode (`detect_async`
+returns at once and the result is delivered to a callback on MediaPipe's
+own thread).
+"""
+
+import os
+import threading
+import time
+
+import mediapipe as mp
+import numpy as np
+
+from src.config import (
+    LANDMARKER_LIVE_STREAM,
+    LANDMARKER_POOL_IDLE_TIMEOUT_S,
+    LANDMARKER_POOL_SIZE,
+    LANDMARKER_POOL_TIMEOUT_S,
+    LANDMARKER_POOL_WARM,
+    MAX_FACES,
+    MODELS_DIR,
+)
+
+MODEL_PATH = os.path.join(MODELS_DIR, "face_landmarker.task")
+
+# Upper bound on the first (graph-initialising) LIVE_STREAM inference
+_WARM_UP_TIMEOUT_S = 10.0
+
+
+def _create(num_faces: int, model_path: str, running_mode, result_callback=None):
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found at {model_path}")
+
+    options = mp.tasks.vision.FaceLandmarkerOptions(
+        base_options=mp.tasks.BaseOptions(model_asset_path=model_path),
+        running_mode=running_mode,
+        num_faces=num_faces,
+        min_face_detection_confidence=0.5,
+        min_face_presence_confidence=0.5,
+        min_tracking_confidence=0.5,
+        result_callback=result_callback,
+    )
+    return mp.tasks.vision.FaceLandmarker.create_from_options(options)
+
+
+class LiveStreamLandmarker:
+    """
+    LIVE_STREAM-mode FaceLandmarker with a rebindable result callback.
+
+    MediaPipe fixes the callback when the task is created. This wrapper
+    forwards every result to `result_callback(result, timestamp_ms)`, so
+    the callback can be set after creation and a pooled instance can serve
+    one session after another. Results arriving while no callback is set
+    are discarded.
+    """
+
+    def __init__(self, num_faces: int = MAX_FACES, model_path: str = MODEL_PATH):
+        self.result_callback = None
+        self._landmarker = _create(num_faces, model_path,
+                                   mp.tasks.vision.RunningMode.LIVE_STREAM, self._dispatch)
+
+    def _dispatch(self, result, output_image, timestamp_ms: int):
+        callback = self.result_callback
+        if callback is not None:
+            callback(result, timestamp_ms)
+
+    def detect_async(self, image, timestamp_ms: int):
+        """Queues a frame; MediaPipe copies `image` before this returns."""
+        self._landmarker.detect_async(image, int(timestamp_ms))
+
+    def close(self):
+        self._landmarker.close()
+
+
+def create_landmarker(num_faces: int = MAX_FACES, model_path: str = MODEL_PATH,
+                      live_stream: bool = False):
+    """
+    Creates a FaceLandmarker in VIDEO (or LIVE_STREAM) running mode.
+
+    Args:
+        num_faces: Maximum number of faces to detect.
+        model_path: Path to the `.task` model bundle.
+        live_stream: Create a `LiveStreamLandmarker` (`detect_async` plus
+            a result callback) instead of a blocking VIDEO-mode landmarker.
+
+    Returns:
+        mp.tasks.vision.FaceLandmarker | LiveStreamLandmarker: Ready-to-use
+            landmarker. The caller owns it and must call `close()`.
+    """
+    if live_stream:
+        return LiveStreamLandmarker(num_faces, model_path)
+    return _create(num_faces, model_path, mp.tasks.vision.RunningMode.VIDEO)
+
+
+# -----------------------------------------------------------------------------
+# PROCESS-WIDE LANDMARKER POOL
+# -----------------------------------------------------------------------------
+class LandmarkerPoolExhausted(RuntimeError):
+    """Raised when no landmarker becomes available before the timeout."""
+
+
+class _PoolEntry:
+    """A pooled landmarker and the last timestamp it has seen."""
+
+    def __init__(self, landmarker):
+        self.landmarker = landmarker
+        self.last_timestamp_ms = -1
+        self.idle_since = time.monotonic()
+
+
+class PooledLandmarker:
+    """
+    Session-scoped lease on a pooled landmarker.
+
+    VIDEO and LIVE_STREAM modes require strictly increasing timestamps per
+    landmarker instance, across every session that ever used it. The lease
+    shifts the session's own timestamps by a fixed offset so each session
+    can start its clock at zero (results are reported in session time).
+    """
+
+    def __init__(self, pool: "LandmarkerPool", entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+        self._offset = None
+        self._result_callback = None
+
+    def _shift(self, timestamp_ms: int) -> int:
+        if self._entry is None:
+            raise RuntimeError("Landmarker lease has already been released")
+        if self._offset is None:
+            self._offset = self._entry.last_timestamp_ms + 1 - int(timestamp_ms)
+        return int(timestamp_ms) + self._offset
+
+    def detect_for_video(self, image, timestamp_ms: int):
+        timestamp_ms = self._shift(timestamp_ms)
+        result = self._entry.landmarker.detect_for_video(image, timestamp_ms)
+        self._entry.last_timestamp_ms = timestamp_ms
+        return result
+
+    def detect_async(self, image, timestamp_ms: int):
+        timestamp_ms = self._shift(timestamp_ms)
+        self._entry.landmarker.detect_async(image, timestamp_ms)
+        self._entry.last_timestamp_ms = timestamp_ms
+
+    @property
+    def result_callback(self):
+        return self._result_callback
+
+    @result_callback.setter
+    def result_callback(self, callback):
+        """Receives this session's LIVE_STREAM results as (result, session timestamp)."""
+        if self._entry is None:
+            raise RuntimeError("Landmarker lease has already been released")
+        self._result_callback = callback
+        if callback is None:
+            self._entry.landmarker.result_callback = None
+        else:
+            self._entry.landmarker.result_callback = \
+                lambda result, timestamp_ms: callback(result, timestamp_ms - self._offset)
+
+    def release(self):
+        """Returns the landmarker to the pool (idempotent)."""
+        if self._entry is not None:
+            if self._pool.live_stream:
+                # Late results of this session must not reach the next one
+                self._entry.landmarker.result_callback = None
+            self._pool._release(self._entry)
+            self._entry = None
+
+    # Lets a lease stand in for an owned landmarker
+    close = release
+
+
+class LandmarkerPool:
+    """
+    Bounded pool of VIDEO-mode (or LIVE_STREAM-mode) landmarkers shared by
+    all sessions.
+
+    Instances are created lazily up to `max_size` (or eagerly by
+    `warm_up`), checked out for the lifetime of a session and returned on
+    `release()`. A checkout blocks up to `timeout` seconds when every
+    instance is in use. Idle instances beyond `keep_idle` are closed once
+    they have been unused for `idle_timeout` seconds.
+    """
+
+    def __init__(self, max_size: int = LANDMARKER_POOL_SIZE, num_faces: int = MAX_FACES,
+                 live_stream: bool = False, keep_idle: int = LANDMARKER_POOL_WARM,
+                 idle_timeout: float = LANDMARKER_POOL_IDLE_TIMEOUT_S):
+        self.max_size = max(1, int(max_size))
+        self.num_faces = num_faces
+        self.live_stream = live_stream
+        self.keep_idle = max(0, int(keep_idle))
+        self.idle_timeout = idle_timeout
+        self._idle = []                 # least recently used first
+        self._created = 0
+        self._cond = threading.Condition()
+        self._reaper = None
+        self._closed = False
+
+    def _create_entry(self) -> _PoolEntry:
+        entry = _PoolEntry(create_landmarker(num_faces=self.num_faces,
+                                             live_stream=self.live_stream))
+        # One inference on a blank frame initialises the graph
+        blank = mp.Image(image_format=mp.ImageFormat.SRGB,
+                         data=np.zeros((256, 256, 3), np.uint8))
+        if self.live_stream:
+            done = threading.Event()
+            entry.landmarker.result_callback = lambda result, timestamp_ms: done.set()
+            entry.landmarker.detect_async(blank, 0)
+            done.wait(_WARM_UP_TIMEOUT_S)
+            entry.landmarker.result_callback = None
+        else:
+            entry.landmarker.detect_for_video(blank, 0)
+        entry.last_timestamp_ms = 0
+        return entry
+
+    def warm_up(self, count: int = LANDMARKER_POOL_WARM):
+        """Creates and initialises landmarkers until `count` exist."""
+        count = min(int(count), self.max_size)
+        while True:
+            with self._cond:
+                if self._created >= count:
+                    return
+                self._created += 1
+            try:
+                entry = self._create_entry()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                raise
+            with self._cond:
+                if not self._closed:
+                    self._idle.append(entry)
+                    self._cond.notify()
+                    continue
+                self._created -= 1
+            entry.landmarker.close()
+            return
+
+    def checkout(self, timeout: float = LANDMARKER_POOL_TIMEOUT_S) -> PooledLandmarker:
+        """
+        Leases a landmarker for one session.
+
+        Raises:
+            LandmarkerPoolExhausted: If none is free within `timeout` seconds.
+            RuntimeError: If the pool has been closed.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._closed and not self._idle and self._created >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and not self._closed:
+                        raise LandmarkerPoolExhausted(
+                            f"All {self.max_size} landmarkers are in use")
+            if self._closed:
+                raise RuntimeError("Landmarker pool is closed")
+            if self._idle:
+                return PooledLandmarker(self, self._idle.pop())
+            self._created += 1
+
+        try:
+            entry = self._create_entry()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        return PooledLandmarker(self, entry)
+
+    def _release(self, entry: _PoolEntry):
+        with self._cond:
+            if not self._closed:
+                entry.idle_since = time.monotonic()
+                self._idle.append(entry)
+                self._cond.notify()
+                self._schedule_reap()
+                return
+            self._created -= 1
+        # Returned after close(): nothing will lease it again
+        entry.landmarker.close()
+
+    def _schedule_reap(self):
+        # Called with the lock held; at most one timer is pending
+        if self._reaper is None and len(self._idle) > self.keep_idle:
+            self._reaper = threading.Timer(self.idle_timeout, self._reap)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def _reap(self):
+        with self._cond:
+            self._reaper = None
+        self.trim(self.keep_idle, self.idle_timeout)
+        with self._cond:
+            self._schedule_reap()
+
+    @property
+    def in_use(self) -> int:
+        with self._cond:
+            return self._created - len(self._idle)
+
+    @property
+    def available(self) -> int:
+        """Landmarkers that can be checked out without waiting."""
+        with self._cond:
+            return len(self._idle) + (self.max_size - self._created)
+
+    def trim(self, keep: int = LANDMARKER_POOL_WARM, min_idle_s: float = 0.0):
+        """
+        Closes idle landmarkers beyond the `keep` most recently used ones
+        that have been idle for at least `min_idle_s`, freeing their models.
+        """
+        deadline = time.monotonic() - min_idle_s
+        with self._cond:
+            surplus = self._idle[:max(0, len(self._idle) - max(0, int(keep)))]
+            expired = [entry for entry in surplus if entry.idle_since <= deadline]
+            self._idle = [entry for entry in self._idle if entry not in expired]
+            self._created -= len(expired)
+        for entry in expired:
+            entry.landmarker.close()
+
+    def close(self):
+        """Closes idle landmarkers (leased ones are closed when returned)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for entry in idle:
+            entry.landmarker.close()
+
+
+_POOLS = {}
+_POOL_LOCK = threading.Lock()
+
+
+def get_landmarker_pool(num_faces: int = MAX_FACES,
+                        live_stream: bool = LANDMARKER_LIVE_STREAM) -> LandmarkerPool:
+    """Returns the process-wide landmarker pool for `num_faces` and mode (created on first use)."""
+    key = (num_faces, live_stream)
+    with _POOL_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = LandmarkerPool(num_faces=num_faces, live_stream=live_stream)
+        return pool
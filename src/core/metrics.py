@@ -0,0 +1,228 @@
+"""
+src/core/metrics.py
+
+Per-stage latency instrumentation and Prometheus export.
+
+Every session owns a `SessionMetrics` with one rolling histogram per
+pipeline stage and a set of counters. Each session is written by a single
+thread (its video worker), so recording is lock-free: a histogram is a
+fixed-size NumPy ring buffer plus a write counter. Percentiles are computed
+only when metrics are scraped, over each session's window and over the
+union of all sessions' windows (aggregate).
+
+The registry is exposed in Prometheus text format by a small HTTP server
+(`start_metrics_server`) bound to a local port.
+"""
+
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.config import METRICS_HOST, METRICS_PORT, METRICS_WINDOW
+from src.core.sessions import get_session_manager
+from src.utils.startup import STARTUP
+
+STAGES = ("decode", "cvtcolor", "inference", "track", "ear", "render", "encode")
+COUNTERS = ("frames_processed", "frames_dropped", "faces_lost", "alarms_raised", "errors")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingHistogram:
+    """Fixed-size ring of the most recent samples (single writer, lock-free)."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._buf = np.zeros(window, dtype=np.float64)
+        self._count = 0
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        self._buf[self._count % self._buf.size] = value
+        self._count += 1
+        self._sum += value
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def total(self) -> float:
+        return self._sum
+
+    def window(self) -> np.ndarray:
+        """Copy of the samples currently in the window."""
+        return self._buf[:min(self._count, self._buf.size)].copy()
+
+
+class SessionMetrics:
+    """Stage histograms and counters for one video session."""
+
+    def __init__(self, session_id: str, window: int = METRICS_WINDOW):
+        self.session_id = session_id
+        self.stages = {stage: RollingHistogram(window) for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def reset(self):
+        """Clears all histograms and counters (e.g. after a warm-up)."""
+        window = self.stages[STAGES[0]]._buf.size
+        self.stages = {stage: RollingHistogram(window) for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def observe(self, stage: str, seconds: float):
+        """Records one stage latency in seconds."""
+        self.stages[stage].observe(seconds)
+
+    def inc(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+
+
+class MetricsRegistry:
+    """Tracks live sessions and renders all metrics as Prometheus text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, SessionMetrics] = {}
+        self._retired_counters = dict.fromkeys(COUNTERS, 0)
+        # (count, sum) per stage of ended sessions, so aggregates never reset
+        self._retired_stages = {stage: (0, 0.0) for stage in STAGES}
+        self._ids = itertools.count(1)
+
+    def register(self, session_id: Optional[str] = None) -> SessionMetrics:
+        """Creates and tracks metrics for a new session."""
+        with self._lock:
+            if session_id is None:
+                session_id = f"s{next(self._ids)}"
+            metrics = SessionMetrics(session_id)
+            self._sessions[session_id] = metrics
+        return metrics
+
+    def unregister(self, metrics: SessionMetrics):
+        """Stops tracking a session; its counters and stage sums stay in the aggregates."""
+        with self._lock:
+            if self._sessions.pop(metrics.session_id, None) is not None:
+                for name, value in metrics.counters.items():
+                    self._retired_counters[name] += value
+                for stage, hist in metrics.stages.items():
+                    count, total = self._retired_stages[stage]
+                    self._retired_stages[stage] = (count + hist.count, total + hist.total)
+
+    def render_prometheus(self) -> str:
+        """Renders every metric family in Prometheus text exposition format."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            retired = dict(self._retired_counters)
+            retired_stages = dict(self._retired_stages)
+
+        lines: List[str] = [
+            "# HELP drowsiness_stage_latency_seconds Pipeline stage latency over a rolling window.",
+            "# TYPE drowsiness_stage_latency_seconds summary",
+        ]
+        for stage in STAGES:
+            windows = []
+            for session in sessions:
+                hist = session.stages[stage]
+                samples = hist.window()
+                windows.append(samples)
+                labels = f'stage="{stage}",session="{session.session_id}"'
+                lines.extend(_summary_lines(labels, samples, hist.count, hist.total))
+
+            # Quantiles cover live sessions; _sum / _count are cumulative
+            merged = np.concatenate(windows) if windows else np.empty(0)
+            count, total = retired_stages[stage]
+            count += sum(s.stages[stage].count for s in sessions)
+            total += sum(s.stages[stage].total for s in sessions)
+            lines.extend(_summary_lines(f'stage="{stage}"', merged, count, total))
+
+        for name in COUNTERS:
+            metric = f"drowsiness_{name}_total"
+            lines.append(f"# HELP {metric} {name.replace('_', ' ').capitalize()}.")
+            lines.append(f"# TYPE {metric} counter")
+            for session in sessions:
+                lines.append(f'{metric}{{session="{session.session_id}"}} {session.counters[name]}')
+            lines.append(f"{metric} {retired[name] + sum(s.counters[name] for s in sessions)}")
+
+        lines.append("# HELP drowsiness_active_sessions Sessions currently streaming.")
+        lines.append("# TYPE drowsiness_active_sessions gauge")
+        lines.append(f"drowsiness_active_sessions {len(sessions)}")
+
+        manager = get_session_manager()
+        lines.append("# HELP drowsiness_sessions_admitted_total Admission decisions by mode.")
+        lines.append("# TYPE drowsiness_sessions_admitted_total counter")
+        for mode, count in list(manager.counters.items()):
+            lines.append(f'drowsiness_sessions_admitted_total{{mode="{mode}"}} {count}')
+        lines.append("# HELP drowsiness_degraded_sessions Active sessions analysed at the degraded rate.")
+        lines.append("# TYPE drowsiness_degraded_sessions gauge")
+        lines.append(f"drowsiness_degraded_sessions {manager.degraded}")
+        lines.append("# HELP drowsiness_cpu_utilization Smoothed node CPU utilisation used for admission.")
+        lines.append("# TYPE drowsiness_cpu_utilization gauge")
+        lines.append(f"drowsiness_cpu_utilization {manager.cpu.utilization:.4f}")
+
+        lines.append("# HELP drowsiness_startup_phase_seconds Duration of each cold-start phase.")
+        lines.append("# TYPE drowsiness_startup_phase_seconds gauge")
+        for phase, seconds in list(STARTUP.durations.items()):
+            lines.append(f'drowsiness_startup_phase_seconds{{phase="{phase}"}} {seconds:.6f}')
+        lines.append("# HELP drowsiness_startup_milestone_seconds Time from process start to each milestone.")
+        lines.append("# TYPE drowsiness_startup_milestone_seconds gauge")
+        for milestone, seconds in list(STARTUP.milestones.items()):
+            lines.append(f'drowsiness_startup_milestone_seconds{{milestone="{milestone}"}} {seconds:.6f}')
+        lines.append("# HELP drowsiness_ready Whether the landmarker model is warmed up.")
+        lines.append("# TYPE drowsiness_ready gauge")
+        lines.append(f"drowsiness_ready {int(STARTUP.elapsed('ready') is not None)}")
+        return "\n".join(lines) + "\n"
+
+
+def _summary_lines(labels: str, samples: np.ndarray, count: int, total: float) -> List[str]:
+    name = "drowsiness_stage_latency_seconds"
+    lines = []
+    if samples.size:
+        values = np.quantile(samples, QUANTILES)
+        for q, v in zip(QUANTILES, values):
+            lines.append(f'{name}{{{labels},quantile="{q}"}} {v:.6f}')
+    lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {count}")
+    return lines
+
+
+_REGISTRY = MetricsRegistry()
+_SERVER = None
+_SERVER_LOCK = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Returns the process-wide metrics registry."""
+    return _REGISTRY
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = _REGISTRY.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """
+    Serves `/metrics` on a daemon thread (idempotent per process).
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    global _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            _SERVER = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _SERVER.daemon_threads = True
+            threading.Thread(target=_SERVER.serve_forever, name="metrics-http",
+                             daemon=True).start()
+        return _SERVER
@@ -0,0 +1,224 @@
+"""
+src/core/pipeline.py
+
+Threaded capture -> inference -> display pipeline for local (OpenCV) runs.
+
+Each stage runs on its own thread and hands its output to the next one
+through a `LatestSlot`: a single-slot queue whose `put` replaces an item
+that was not consumed yet instead of blocking. A slow stage therefore
+never stalls the stage before it and always starts on the newest frame
+(replaced items are counted as dropped). Camera reads, inference and
+display overlap, so the camera-to-alarm latency is one frame read plus
+one inference instead of the sum of all stages, and frames never queue
+up in the camera buffer while inference runs.
+
+Alarm callbacks are invoked from the inference thread, so the alarm does
+not wait for the frame to be drawn and shown.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Generic, NamedTuple, Optional, TypeVar
+
+import numpy as np
+
+from src.config import PIPELINE_STATS_WINDOW
+from src.core.metrics import RollingHistogram
+
+T = TypeVar("T")
+
+STAGES = ("capture", "inference", "display")
+
+
+class CapturedFrame(NamedTuple):
+    index: int
+    image: np.ndarray           # BGR, owned by the pipeline after capture
+    capture_ms: float           # monotonic time the read returned
+
+
+class InferredFrame(NamedTuple):
+    frame: CapturedFrame
+    result: object              # FrameResult
+
+
+class LatestSlot(Generic[T]):
+    """Single-slot queue: `put` overwrites, `get` blocks until an item arrives."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item: Optional[T] = None
+        self._full = False
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item: T):
+        with self._cond:
+            if self._full:
+                self.dropped += 1
+            self._item = item
+            self._full = True
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[T]:
+        """Takes the item, or returns None on timeout / once closed."""
+        with self._cond:
+            if not self._full and not self._closed:
+                self._cond.wait(timeout)
+            if not self._full:
+                return None
+            item, self._item, self._full = self._item, None, False
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """
+    Throughput and latency of one pipeline stage (single writer).
+
+    `busy` is the time spent in the stage's own work for one frame, `age`
+    the time from camera capture until the stage finished with the frame.
+    """
+
+    def __init__(self, name: str, window: int = PIPELINE_STATS_WINDOW):
+        self.name = name
+        self.busy = RollingHistogram(window)
+        self.age = RollingHistogram(window)
+        self._last_count = 0
+        self._last_time = time.monotonic()
+
+    def observe(self, busy_s: float, age_s: float):
+        self.busy.observe(busy_s)
+        self.age.observe(age_s)
+
+    def rate(self) -> float:
+        """Frames per second since the previous call."""
+        now = time.monotonic()
+        count = self.busy.count
+        elapsed = now - self._last_time
+        fps = (count - self._last_count) / elapsed if elapsed > 0 else 0.0
+        self._last_count, self._last_time = count, now
+        return fps
+
+    def summary(self, fps: float) -> str:
+        busy, age = self.busy.window(), self.age.window()
+        if busy.size == 0:
+            return f"{self.name} --"
+        return (f"{self.name} {fps:.1f} fps, busy {np.median(busy) * 1000:.1f} ms, "
+                f"age p50 {np.median(age) * 1000:.1f} / p95 {np.percentile(age, 95) * 1000:.1f} ms")
+
+
+class LocalPipeline:
+    """Runs capture and inference threads; the caller's thread displays."""
+
+    def __init__(self, capture, detector,
+                 on_result: Optional[Callable[[object], None]] = None,
+                 stats_window: int = PIPELINE_STATS_WINDOW):
+        """
+        Args:
+            capture: Opened `cv2.VideoCapture` (or anything with `read()`).
+            detector: `DrowsinessDetector` fed with BGR frames.
+            on_result: Called with each FrameResult on the inference thread.
+            stats_window: Frames per stage latency window.
+        """
+        self.capture = capture
+        self.detector = detector
+        self.on_result = on_result
+        self.stats: Dict[str, StageStats] = {
+            stage: StageStats(stage, stats_window) for stage in STAGES
+        }
+        self.frames = LatestSlot[CapturedFrame]()
+        self.results = LatestSlot[InferredFrame]()
+        self.error: Optional[BaseException] = None
+        self.fps: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._guard, args=(self._capture_loop,),
+                             name="pipeline-capture", daemon=True),
+            threading.Thread(target=self._guard, args=(self._inference_loop,),
+                             name="pipeline-inference", daemon=True),
+        ]
+
+    @property
+    def running(self) -> bool:
+        return not self._stop.is_set()
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stops and joins the stage threads (idempotent)."""
+        self._stop.set()
+        self.frames.close()
+        self.results.close()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join()
+
+    def _guard(self, loop):
+        # A failing stage stops the whole pipeline; the caller reports `error`
+        try:
+            loop()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._stop.set()
+            self.frames.close()
+            self.results.close()
+
+    # -------------------------------------------------------------------------
+    # Stages
+    # -------------------------------------------------------------------------
+    def _capture_loop(self):
+        stats = self.stats["capture"]
+        index = 0
+        while not self._stop.is_set():
+            start = time.monotonic()
+            success, image = self.capture.read()
+            if not success:
+                print("[WARNING] Empty frame ignored.")
+                time.sleep(0.01)
+                continue
+            now = time.monotonic()
+            self.frames.put(CapturedFrame(index, image, now * 1000.0))
+            stats.observe(now - start, 0.0)
+            index += 1
+
+    def _inference_loop(self):
+        stats = self.stats["inference"]
+        while not self._stop.is_set():
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                continue
+            start = time.monotonic()
+            result = self.detector.process(frame.image, frame.capture_ms)
+            if self.on_result is not None:
+                self.on_result(result)
+            now = time.monotonic()
+            stats.observe(now - start, now - frame.capture_ms / 1000.0)
+            self.results.put(InferredFrame(frame, result))
+
+    def next_result(self, timeout: Optional[float] = None) -> Optional[InferredFrame]:
+        """Newest analysed frame for the display stage (None on timeout / stop)."""
+        return self.results.get(timeout)
+
+    def displayed(self, item: InferredFrame, start: float):
+        """Records that the display stage finished `item` (work began at `start`)."""
+        now = time.monotonic()
+        self.stats["display"].observe(now - start, now - item.frame.capture_ms / 1000.0)
+
+    # -------------------------------------------------------------------------
+    # Reporting
+    # -------------------------------------------------------------------------
+    def report(self) -> str:
+        """Stage summary since the previous report; also refreshes `fps`."""
+        self.fps = {stage: stats.rate() for stage, stats in self.stats.items()}
+        lines = [stats.summary(self.fps[stage]) for stage, stats in self.stats.items()]
+        lines.append(f"dropped: {self.frames.dropped} before inference, "
+                     f"{self.results.dropped} before display")
+        return "[INFO] Pipeline: " + " | ".join(lines)
@@ -0,0 +1,157 @@
+"""
+src/core/renderer.py
+
+Overlay rendering for the Streamlit video feed.
+
+All drawing happens in place on the decoded frame: translucent panels are
+alpha-blended only inside their own rectangle (against a cached solid
+color block), and text is stamped from cached anti-aliased text sprites instead of
+re-rasterised every frame. No full-frame copies are made. Frames can be
+BGR (OpenCV) or RGB (decoded straight from the WebRTC frame); colors are
+mapped once per renderer.
+"""
+
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Colors (BGR)
+BADGE_BG = (15, 23, 42)
+BADGE_TEXT = (34, 211, 238)
+EYE_POINT = (16, 185, 129)
+ALERT_RED = (239, 68, 68)
+WHITE = (255, 255, 255)
+
+BANNER_HEIGHT = 60
+ALERT_TEXT = "DROWSINESS DETECTED"
+
+
+@lru_cache(maxsize=512)
+def text_sprite(text: str, font_scale: float, thickness: int) -> Tuple[np.ndarray, int]:
+    """
+    Rasterises `text` once into an anti-aliased coverage sprite.
+
+    Returns:
+        Tuple[np.ndarray, int]: (alpha (H, W, 1) float32 in [0, 1], text
+            height above the baseline) so the sprite can be placed like
+            `cv2.putText`.
+    """
+    (text_w, text_h), baseline = cv2.getTextSize(text, FONT, font_scale, thickness)
+    pad = thickness
+    canvas = np.zeros((text_h + baseline + 2 * pad, text_w + 2 * pad), np.uint8)
+    cv2.putText(canvas, text, (pad, text_h + pad), FONT, font_scale, 255, thickness)
+    alpha = (canvas.astype(np.float32) / 255.0)[..., None]
+    alpha.setflags(write=False)
+    return alpha, text_h + pad
+
+
+class OverlayRenderer:
+    """Per-session renderer with cached color blocks and text sprites."""
+
+    def __init__(self, rgb: bool = False):
+        """
+        Args:
+            rgb: Draw on RGB frames (the color constants are BGR).
+        """
+        self.rgb = rgb
+        self._blocks: Dict[Tuple[int, int, Tuple[int, int, int]], np.ndarray] = {}
+
+    def _color(self, bgr: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        return bgr[::-1] if self.rgb else bgr
+
+    def _color_block(self, height: int, width: int, color: Tuple[int, int, int]) -> np.ndarray:
+        key = (height, width, color)
+        block = self._blocks.get(key)
+        if block is None:
+            block = np.empty((height, width, 3), np.uint8)
+            block[:] = color
+            self._blocks[key] = block
+        return block
+
+    def blend_rect(self, image: np.ndarray, x0: int, y0: int, x1: int, y1: int,
+                   color: Tuple[int, int, int], alpha: float):
+        """
+        Alpha-blends a solid rectangle into `image` in place (ROI only).
+
+        Corners are inclusive, as with `cv2.rectangle`.
+        """
+        height, width = image.shape[:2]
+        x0, x1 = max(0, x0), min(width, x1 + 1)
+        y0, y1 = max(0, y0), min(height, y1 + 1)
+        if x1 <= x0 or y1 <= y0:
+            return
+        roi = image[y0:y1, x0:x1]
+        cv2.addWeighted(self._color_block(y1 - y0, x1 - x0, color), alpha,
+                        roi, 1.0 - alpha, 0, dst=roi)
+
+    @staticmethod
+    def stamp_text(image: np.ndarray, text: str, origin: Tuple[int, int],
+                   font_scale: float, color: Tuple[int, int, int], thickness: int = 2):
+        """Draws cached text with its baseline-left corner at `origin` (like putText)."""
+        alpha, ascent = text_sprite(text, font_scale, thickness)
+        height, width = image.shape[:2]
+        x0 = origin[0] - thickness
+        y0 = origin[1] - ascent
+        x1 = x0 + alpha.shape[1]
+        y1 = y0 + alpha.shape[0]
+
+        # Clip sprite to the frame
+        mx0, my0 = max(0, -x0), max(0, -y0)
+        mx1 = alpha.shape[1] - max(0, x1 - width)
+        my1 = alpha.shape[0] - max(0, y1 - height)
+        if mx1 <= mx0 or my1 <= my0:
+            return
+        roi = image[y0 + my0:y0 + my1, x0 + mx0:x0 + mx1]
+        a = alpha[my0:my1, mx0:mx1]
+        blended = roi * (1.0 - a) + np.asarray(color, np.float32) * a
+        np.rint(blended, out=blended)
+        np.copyto(roi, blended, casting="unsafe")
+
+    def draw_ear_badge(self, image: np.ndarray, ear: float):
+        """EAR value on a translucent badge in the top-right corner."""
+        width = image.shape[1]
+        ear_text = f"EAR: {ear:.3f}"
+        alpha, ascent = text_sprite(ear_text, 0.7, 2)
+        text_width = alpha.shape[1] - 4
+        text_height = ascent - 2
+
+        self.blend_rect(image, width - text_width - 30, 10, width - 10, text_height + 25,
+                        self._color(BADGE_BG), 0.7)
+        self.stamp_text(image, ear_text, (width - text_width - 20, text_height + 17),
+                        0.7, self._color(BADGE_TEXT))
+
+    @staticmethod
+    def draw_eye_points(image: np.ndarray, eye_points: np.ndarray,
+                        color: Tuple[int, int, int] = EYE_POINT):
+        """Eye landmark markers for one face ((2, 6, 2) pixels)."""
+        for (x, y) in eye_points.reshape(-1, 2).astype(np.int32).tolist():
+            cv2.circle(image, (x, y), 2, color, -1)
+            cv2.circle(image, (x, y), 4, color, 1)
+
+    def draw_alert(self, image: np.ndarray):
+        """Red banner, alert text and frame border."""
+        height, width = image.shape[:2]
+        self.blend_rect(image, 0, 0, width, BANNER_HEIGHT, self._color(ALERT_RED), 0.3)
+        self.stamp_text(image, ALERT_TEXT, (20, 40), 1.0, WHITE)
+        cv2.rectangle(image, (0, 0), (width - 1, height - 1), self._color(ALERT_RED), 4)
+
+    def render(self, image: np.ndarray, result):
+        """
+        Draws the full overlay for a detection result in place.
+
+        Args:
+            image: BGR frame, RGB when `rgb` (modified in place).
+            result: `FrameResult` from the detection core.
+        """
+        if not result.face_found:
+            return
+        self.draw_ear_badge(image, result.ear)
+        for eye_points, face_alarm in zip(result.eye_points, result.face_alarms.tolist()):
+            self.draw_eye_points(image, eye_points,
+                                 self._color(ALERT_RED if face_alarm else EYE_POINT))
+        if result.alarm_on:
+            self.draw_alert(image)
@@ -0,0 +1,148 @@
+"""
+src/core/roi.py
+
+Face region-of-interest pipeline for MediaPipe inference.
+
+Instead of converting and analysing the full 720p/1080p frame, the previous
+inference's face box is expanded to a padded square, cropped and resized to
+a fixed inference size in a single `cv2.warpAffine` call (out-of-frame parts
+are zero-padded), and only that small patch is converted to RGB. Landmarks
+come back normalized to the patch and are mapped to full-frame pixels with
+the returned transform. When no face is tracked the full frame is used.
+Frames that are already RGB (decoded with `format="rgb24"`) skip the color
+conversion entirely: the patch is warped straight into the RGB buffer and
+a full frame is passed through as is.
+"""
+
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from src.config import (
+    FACE_OVAL_INDICES,
+    FACE_ROI_INPUT_SIZE,
+    FACE_ROI_MIN_FACE_SIZE,
+    FACE_ROI_PADDING,
+)
+from src.utils.geometry import landmarks_to_array
+
+_FACE_OVAL = np.array(FACE_OVAL_INDICES, dtype=np.intp)
+
+
+class ROITransform(NamedTuple):
+    """Maps normalized landmarks to frame pixels: frame = origin + norm * scale."""
+    x0: float
+    y0: float
+    scale_x: float
+    scale_y: float
+
+
+class FaceROI:
+    """Crops, pads and downsizes the frame around the last known face."""
+
+    def __init__(self,
+                 input_size: int = FACE_ROI_INPUT_SIZE,
+                 padding: float = FACE_ROI_PADDING,
+                 min_face_size: float = FACE_ROI_MIN_FACE_SIZE,
+                 rgb_input: bool = False):
+        """
+        Args:
+            input_size: Side of the square patch fed to MediaPipe.
+            padding: Fraction of the face size added on each side.
+            min_face_size: Face boxes smaller than this (pixels) count as lost.
+            rgb_input: Frames passed to `prepare` are RGB instead of BGR.
+        """
+        self.input_size = int(input_size)
+        self.padding = padding
+        self.min_face_size = min_face_size
+        self.rgb_input = rgb_input
+
+        # Square region (x0, y0, side) in frame pixels, None when lost
+        self.region: Optional[Tuple[float, float, float]] = None
+
+        # Preallocated patch buffers (reused every frame)
+        self._patch_bgr = np.zeros((self.input_size, self.input_size, 3), np.uint8)
+        self._patch_rgb = np.zeros_like(self._patch_bgr)
+        self._frame_rgb = None
+
+    @property
+    def active(self) -> bool:
+        return self.region is not None
+
+    def reset(self):
+        """Forces full-frame detection on the next call."""
+        self.region = None
+
+    def prepare(self, image: np.ndarray) -> Tuple[np.ndarray, ROITransform]:
+        """
+        Produces the RGB inference input for a frame.
+
+        Args:
+            image: Full BGR frame (RGB when `rgb_input`).
+
+        Returns:
+            Tuple[np.ndarray, ROITransform]: RGB image for MediaPipe (the
+                padded patch, or the full frame when no face is tracked) and
+                the transform back to frame pixels.
+        """
+        if self.region is None:
+            height, width = image.shape[:2]
+            if self.rgb_input:
+                return image, ROITransform(0.0, 0.0, width, height)
+            if self._frame_rgb is None or self._frame_rgb.shape != image.shape:
+                self._frame_rgb = np.empty_like(image)
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self._frame_rgb)
+            return self._frame_rgb, ROITransform(0.0, 0.0, width, height)
+
+        x0, y0, side = self.region
+        scale = self.input_size / side
+        matrix = np.array([[scale, 0.0, -x0 * scale],
+                           [0.0, scale, -y0 * scale]], dtype=np.float32)
+        patch = self._patch_rgb if self.rgb_input else self._patch_bgr
+        cv2.warpAffine(image, matrix, (self.input_size, self.input_size),
+                       dst=patch, flags=cv2.INTER_LINEAR,
+                       borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        if not self.rgb_input:
+            cv2.cvtColor(self._patch_bgr, cv2.COLOR_BGR2RGB, dst=self._patch_rgb)
+        return self._patch_rgb, ROITransform(x0, y0, side, side)
+
+    @staticmethod
+    def to_frame(face_landmarks: Sequence, transform: ROITransform,
+                 indices: np.ndarray) -> np.ndarray:
+        """
+        Maps selected landmarks from inference space to frame pixels.
+
+        Returns:
+            np.ndarray: (N_faces, *indices.shape, 2) float32 frame coordinates.
+        """
+        points = landmarks_to_array(face_landmarks, transform.scale_x, transform.scale_y, indices)
+        if transform.x0 or transform.y0:
+            points += np.array([transform.x0, transform.y0], dtype=np.float32)
+        return points
+
+    def update(self, face_landmarks: Optional[Sequence], transform: ROITransform):
+        """
+        Sets the crop region for the next inference from this result.
+
+        Args:
+            face_landmarks: MediaPipe `results.face_landmarks` (empty/None
+                when no face was found, which drops back to full frame).
+            transform: Transform returned by `prepare` for this result.
+        """
+        if not face_landmarks:
+            self.region = None
+            return
+
+        oval = self.to_frame(face_landmarks, transform, _FACE_OVAL).reshape(-1, 2)
+        x_min, y_min = oval.min(axis=0)
+        x_max, y_max = oval.max(axis=0)
+        face_size = float(max(x_max - x_min, y_max - y_min))
+        if face_size < self.min_face_size:
+            self.region = None
+            return
+
+        side = face_size * (1.0 + 2.0 * self.padding)
+        center_x = float(x_min + x_max) / 2.0
+        center_y = float(y_min + y_max) / 2.0
+        self.region = (center_x - side / 2.0, center_y - side / 2.0, side)
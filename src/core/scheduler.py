@@ -0,0 +1,127 @@
+"""
+src/core/scheduler.py
+
+Adaptive inference scheduler for the detection pipeline.
+
+Decides, frame by frame, whether the FaceLandmarker should run or whether the
+previous landmarks can be reused. The cadence is either fixed
+(`base_interval`) or load-adaptive: the scheduler measures the real frame
+interval and the inference latency and backs off when inference no longer
+fits the per-frame budget.
+"""
+
+import math
+import time
+from typing import Optional
+
+from src.config import (
+    INFERENCE_ADAPTIVE,
+    INFERENCE_FRAME_INTERVAL,
+    INFERENCE_MAX_FRAME_INTERVAL,
+)
+
+
+class InferenceScheduler:
+    """
+    Frame-skipping scheduler with latency-based back-off.
+
+    Usage:
+        if scheduler.should_infer():
+            start = time.perf_counter()
+            results = landmarker.detect_for_video(...)
+            scheduler.record_inference(time.perf_counter() - start)
+        else:
+            ...reuse the last landmarks...
+    """
+
+    def __init__(self,
+                 base_interval: int = INFERENCE_FRAME_INTERVAL,
+                 max_interval: int = INFERENCE_MAX_FRAME_INTERVAL,
+                 adaptive: bool = INFERENCE_ADAPTIVE,
+                 smoothing: float = 0.2):
+        """
+        Args:
+            base_interval: Run inference every N frames when the box is idle
+                (1 = every frame).
+            max_interval: Upper bound on the adaptive interval.
+            adaptive: Whether to adjust the interval from measured load.
+            smoothing: EMA factor for latency / frame-interval estimates.
+        """
+        self.base_interval = max(1, int(base_interval))
+        self.max_interval = max(self.base_interval, int(max_interval))
+        self.adaptive = adaptive
+        self.smoothing = smoothing
+
+        self.interval = self.base_interval
+        self.frames_since_inference = 0
+        self.frame_interval_s: Optional[float] = None
+        self.inference_latency_s: Optional[float] = None
+
+        self._last_frame_time: Optional[float] = None
+        self._force_next = True
+
+        # Counters (for diagnostics)
+        self.frames_seen = 0
+        self.frames_inferred = 0
+
+    def _ema(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def force_inference(self):
+        """Forces inference on the next frame (e.g. landmarks are stale or lost)."""
+        self._force_next = True
+
+    def infer_now(self):
+        """Turns the current skipped frame into an inference frame (e.g. tracking was lost)."""
+        self.frames_since_inference = 0
+        self.frames_inferred += 1
+
+    def should_infer(self, now: Optional[float] = None) -> bool:
+        """
+        Registers a new frame and returns whether inference should run on it.
+
+        Args:
+            now: Frame arrival time in seconds (defaults to time.monotonic()).
+
+        Returns:
+            bool: True to run the landmarker, False to reuse last landmarks.
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_frame_time is not None:
+            delta = now - self._last_frame_time
+            if delta > 0:
+                self.frame_interval_s = self._ema(self.frame_interval_s, delta)
+        self._last_frame_time = now
+        self.frames_seen += 1
+
+        if self._force_next or self.frames_since_inference + 1 >= self.interval:
+            self._force_next = False
+            self.frames_since_inference = 0
+            self.frames_inferred += 1
+            return True
+
+        self.frames_since_inference += 1
+        return False
+
+    def record_inference(self, latency_s: float):
+        """
+        Records the latency of an inference run and re-plans the cadence.
+
+        The interval is the number of frames one inference occupies
+        (latency / frame interval), clamped to [base_interval, max_interval].
+        """
+        self.inference_latency_s = self._ema(self.inference_latency_s, latency_s)
+        if not self.adaptive or not self.frame_interval_s:
+            return
+
+        needed = math.ceil(self.inference_latency_s / self.frame_interval_s)
+        self.interval = min(self.max_interval, max(self.base_interval, needed))
+
+    @property
+    def skip_ratio(self) -> float:
+        """Fraction of frames that reused landmarks instead of running inference."""
+        if self.frames_seen == 0:
+            return 0.0
+        return 1.0 - self.frames_inferred / self.frames_seen
@@ -0,0 +1,217 @@
+"""
+src/core/sessions.py
+
+Admission control for WebRTC sessions.
+
+Every stream asks the process-wide `SessionManager` for an `Admission`
+before its processor allocates a landmarker. The manager enforces two
+limits:
+
+    SESSION_MAX_CONCURRENT  Hard cap on active sessions; further streams
+                            are rejected.
+    SESSION_CPU_BUDGET      Node CPU utilisation at which the node counts
+                            as saturated. New sessions are then admitted in
+                            degraded mode (analysed at SESSION_DEGRADED_FPS)
+                            or rejected, per SESSION_SATURATION_POLICY.
+
+Sessions that are already running keep their mode, so drivers being
+monitored are not slowed down by a traffic spike. The admission is handed
+back when the stream ends, together with the session's other resources.
+
+CPU utilisation is sampled on a daemon thread from /proc/stat (every
+process on the node, including inference workers); where /proc is
+unavailable this process's CPU time is used instead. Sessions admitted
+since the last sample are added at the measured per-session cost, so a
+burst of connections cannot all slip in before the load shows up.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from src.config import (
+    SESSION_CPU_BUDGET,
+    SESSION_CPU_SAMPLE_INTERVAL_S,
+    SESSION_CPU_SMOOTHING,
+    SESSION_DEGRADED_FPS,
+    SESSION_MAX_CONCURRENT,
+    SESSION_SATURATION_POLICY,
+)
+
+MODE_FULL = "full"
+MODE_DEGRADED = "degraded"
+MODE_REJECTED = "rejected"
+
+POLICY_DEGRADE = "degrade"
+POLICY_REJECT = "reject"
+POLICIES = (POLICY_DEGRADE, POLICY_REJECT)
+
+
+def _node_cpu_times() -> Optional[Tuple[float, float]]:
+    """(busy, total) CPU ticks of all cores since boot, or None without /proc."""
+    try:
+        with open("/proc/stat") as f:
+            fields = f.readline().split()
+        # user nice system idle iowait irq softirq steal (guest is inside user)
+        ticks = [float(v) for v in fields[1:9]]
+        idle = ticks[3] + ticks[4]
+        return sum(ticks) - idle, sum(ticks)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class CpuMonitor:
+    """Smoothed CPU utilisation of the node, 0..1 of all cores."""
+
+    def __init__(self, smoothing: float = SESSION_CPU_SMOOTHING):
+        self.smoothing = smoothing
+        self.utilization = 0.0
+        self._cores = os.cpu_count() or 1
+        self._last = self._sample()
+
+    def _sample(self) -> Tuple[str, float, float]:
+        times = _node_cpu_times()
+        if times is not None:
+            return ("node",) + times
+        return "process", time.process_time(), time.monotonic() * self._cores
+
+    def update(self) -> float:
+        """Takes a sample and returns the smoothed utilisation since the last one."""
+        sample = self._sample()
+        last, self._last = self._last, sample
+        if sample[0] == last[0] and sample[2] > last[2]:
+            current = min(1.0, max(0.0, (sample[1] - last[1]) / (sample[2] - last[2])))
+            self.utilization += self.smoothing * (current - self.utilization)
+        return self.utilization
+
+
+class Admission:
+    """A session's admission decision; `release()` frees its slot."""
+
+    def __init__(self, manager: "SessionManager", mode: str, reason: str = ""):
+        self.mode = mode
+        self.reason = reason
+        self.degraded_fps = manager.degraded_fps
+        self._manager = manager if mode != MODE_REJECTED else None
+
+    @property
+    def rejected(self) -> bool:
+        return self.mode == MODE_REJECTED
+
+    @property
+    def degraded(self) -> bool:
+        return self.mode == MODE_DEGRADED
+
+    def release(self):
+        """Returns the session slot to the manager (idempotent)."""
+        if self._manager is not None:
+            self._manager._release(self)
+            self._manager = None
+
+
+class SessionManager:
+    """Tracks admitted sessions and decides whether new ones may start."""
+
+    def __init__(self,
+                 max_sessions: int = SESSION_MAX_CONCURRENT,
+                 cpu_budget: float = SESSION_CPU_BUDGET,
+                 policy: str = SESSION_SATURATION_POLICY,
+                 degraded_fps: float = SESSION_DEGRADED_FPS,
+                 sample_interval_s: float = SESSION_CPU_SAMPLE_INTERVAL_S):
+        """
+        Args:
+            max_sessions: Concurrent sessions before new ones are rejected.
+            cpu_budget: Node CPU utilisation (0..1) treated as saturated;
+                0 disables the CPU limit.
+            policy: One of `POLICIES`, applied to new sessions while saturated.
+            degraded_fps: Analysis rate of degraded sessions.
+            sample_interval_s: CPU sampling period.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown saturation policy '{policy}', expected one of {POLICIES}")
+        self.max_sessions = max(1, int(max_sessions))
+        self.cpu_budget = cpu_budget
+        self.policy = policy
+        self.degraded_fps = degraded_fps
+        self.sample_interval_s = sample_interval_s
+        self.cpu = CpuMonitor()
+
+        self._lock = threading.Lock()
+        self._active: Dict[int, Admission] = {}
+        self._sampled_sessions = 0      # active sessions at the last CPU sample
+        self._unsampled = 0             # admitted since the last CPU sample
+        self.counters = dict.fromkeys((MODE_FULL, MODE_DEGRADED, MODE_REJECTED), 0)
+
+        self._thread = threading.Thread(target=self._sample_loop, name="session-cpu-monitor",
+                                        daemon=True)
+        self._thread.start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.sample_interval_s)
+            self.cpu.update()
+            with self._lock:
+                self._sampled_sessions = len(self._active)
+                self._unsampled = 0
+
+    def projected_utilization(self) -> float:
+        """Measured utilisation plus the expected cost of not yet sampled sessions."""
+        with self._lock:
+            return self._projected()
+
+    def _projected(self) -> float:
+        utilization = self.cpu.utilization
+        if self._unsampled and self._sampled_sessions:
+            utilization += self._unsampled * utilization / self._sampled_sessions
+        return min(1.0, utilization)
+
+    def admit(self) -> Admission:
+        """Decides the mode of a new session and, unless rejected, counts it as active."""
+        with self._lock:
+            if len(self._active) >= self.max_sessions:
+                admission = Admission(self, MODE_REJECTED,
+                                      f"{self.max_sessions} sessions already active")
+            elif self.cpu_budget > 0 and self._projected() >= self.cpu_budget:
+                mode = MODE_DEGRADED if self.policy == POLICY_DEGRADE else MODE_REJECTED
+                admission = Admission(self, mode, f"CPU at {self._projected():.0%} "
+                                                  f"(budget {self.cpu_budget:.0%})")
+            else:
+                admission = Admission(self, MODE_FULL)
+            if not admission.rejected:
+                self._active[id(admission)] = admission
+                self._unsampled += 1
+            self.counters[admission.mode] += 1
+            active = len(self._active)
+
+        reason = f": {admission.reason}" if admission.reason else ""
+        print(f"[INFO] Session {admission.mode}{reason} ({active}/{self.max_sessions} active)")
+        return admission
+
+    def _release(self, admission: Admission):
+        with self._lock:
+            self._active.pop(id(admission), None)
+
+    @property
+    def active(self) -> int:
+        with self._lock:
+            return len(self._active)
+
+    @property
+    def degraded(self) -> int:
+        """Active sessions running in degraded mode."""
+        with self._lock:
+            return sum(a.degraded for a in self._active.values())
+
+
+_MANAGER = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_session_manager() -> SessionManager:
+    """Returns the process-wide session manager (created on first use)."""
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = SessionManager()
+        return _MANAGER
@@ -0,0 +1,225 @@
+"""
+src/core/telemetry.py
+
+Per-session binary telemetry: one fixed-width record per analysed frame.
+
+File layout: a 64-byte header (magic, version, record size, committed
+record count, session start time) followed by packed `RECORD_DTYPE`
+records. The writer appends through a memory map that grows in large
+chunks; the reader maps the committed records straight into a NumPy
+structured array, so loading a full day costs no parsing.
+
+`TelemetryRecorder.record` only copies a few fields into a bounded
+in-memory staging buffer. A writer thread swaps that buffer out and
+copies it into the file, so the video thread never touches the disk. If
+the writer falls behind and the buffer fills up, new records are dropped
+and counted rather than blocking the frame path.
+
+Only the first detected face is recorded (EARs, threshold, PERCLOS); the
+`faces` column holds how many faces the frame had. Multi-face sessions
+therefore log the driver in slot 0, not every occupant.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from src.config import (
+    TELEMETRY_BUFFER_RECORDS,
+    TELEMETRY_FLUSH_INTERVAL_S,
+    TELEMETRY_GROW_RECORDS,
+)
+
+MAGIC = b"DRWSTLM1"
+VERSION = 1
+
+RECORD_DTYPE = np.dtype([
+    ("timestamp_ms", "<i8"),
+    ("ear_left", "<f4"),        # first face only, NaN without a face
+    ("ear_right", "<f4"),
+    ("threshold", "<f4"),
+    ("perclos", "<f4"),
+    ("closed_ms", "<f4"),
+    ("faces", "u1"),
+    ("face", "u1"),
+    ("alarm", "u1"),
+    ("inferred", "u1"),
+])
+
+_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("record_size", "<u4"),
+    ("count", "<u8"),
+    ("start_unix", "<f8"),
+    ("reserved", "V32"),
+])
+HEADER_SIZE = _HEADER_DTYPE.itemsize
+
+_NAN = float("nan")
+
+
+class TelemetryRecorder:
+    """Appends FrameResults of one session to a memory-mapped file."""
+
+    def __init__(self, path: str,
+                 buffer_records: int = TELEMETRY_BUFFER_RECORDS,
+                 flush_interval_s: float = TELEMETRY_FLUSH_INTERVAL_S,
+                 grow_records: int = TELEMETRY_GROW_RECORDS):
+        """
+        Args:
+            path: Output file (created or truncated).
+            buffer_records: Records staged in memory between writes.
+            flush_interval_s: How often the writer thread commits records.
+            grow_records: File growth step, in records.
+
+        Raises:
+            OSError: If the file cannot be created.
+        """
+        self.path = path
+        self.flush_interval_s = flush_interval_s
+        self.grow_records = max(1, int(grow_records))
+        self.written = 0
+        self.dropped = 0
+
+        # Double-buffered staging: record() fills one, the writer drains the other
+        self._active = np.zeros(max(2, int(buffer_records)), dtype=RECORD_DTYPE)
+        self._spare = np.zeros_like(self._active)
+        self._fill = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._failed = False
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w+b") as f:
+            f.truncate(HEADER_SIZE + self.grow_records * RECORD_DTYPE.itemsize)
+        self._header = np.memmap(path, dtype=_HEADER_DTYPE, mode="r+", shape=(1,))
+        self._header[0] = (MAGIC, VERSION, RECORD_DTYPE.itemsize, 0, time.time(), b"")
+        self._header.flush()
+        self._capacity = self.grow_records
+        self._data = np.memmap(path, dtype=RECORD_DTYPE, mode="r+",
+                               offset=HEADER_SIZE, shape=(self._capacity,))
+
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    # -------------------------------------------------------------------------
+    # Frame thread
+    # -------------------------------------------------------------------------
+    def record(self, result) -> bool:
+        """
+        Stages one `FrameResult` (no I/O). Per-face values come from face 0.
+
+        Returns:
+            bool: False if the record was dropped (buffer full or closed).
+        """
+        if result.face_found:
+            ear_left, ear_right = result.ears[0].tolist()
+            threshold = float(result.face_thresholds[0])
+            perclos = result.fatigue.perclos
+        else:
+            ear_left = ear_right = threshold = perclos = _NAN
+        values = (result.timestamp_ms, ear_left, ear_right, threshold, perclos,
+                  result.closed_ms, len(result.face_ids), result.face_found,
+                  result.alarm_on, result.inferred)
+
+        with self._cond:
+            if self._closing or self._failed or self._fill == self._active.size:
+                self.dropped += 1
+                return False
+            self._active[self._fill] = values
+            self._fill += 1
+            if self._fill == self._active.size // 2:
+                self._cond.notify()
+        return True
+
+    # -------------------------------------------------------------------------
+    # Writer thread
+    # -------------------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closing and self._fill < self._active.size // 2:
+                    self._cond.wait(self.flush_interval_s)
+                batch, count = self._active, self._fill
+                self._active, self._spare = self._spare, self._active
+                self._fill = 0
+                closing = self._closing
+            if count and not self._failed:
+                try:
+                    self._write(batch[:count])
+                except OSError as e:
+                    print(f"Warning: Telemetry disabled for {self.path}: {e}")
+                    self._failed = True
+            if closing:
+                return
+
+    def _grow(self, needed: int):
+        capacity = max(needed, self._capacity + self.grow_records)
+        self._data.flush()
+        self._data = None
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        self._capacity = capacity
+        self._data = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r+",
+                               offset=HEADER_SIZE, shape=(capacity,))
+
+    def _write(self, records: np.ndarray):
+        end = self.written + len(records)
+        if end > self._capacity:
+            self._grow(end)
+        self._data[self.written:end] = records
+        self._data.flush()
+        # Publish the new count only once the records are on disk
+        self._header["count"][0] = end
+        self._header.flush()
+        self.written = end
+
+    def close(self):
+        """Commits staged records, trims the file and stops the writer (idempotent)."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+        self._data = None
+        self._header = None
+        try:
+            with open(self.path, "r+b") as f:
+                f.truncate(HEADER_SIZE + self.written * RECORD_DTYPE.itemsize)
+        except OSError:
+            pass
+
+
+def load_telemetry(path: str) -> np.ndarray:
+    """
+    Maps a telemetry file's committed records as a read-only NumPy array.
+
+    Works on files that are still being written (records committed so far).
+
+    Returns:
+        np.ndarray: Structured `RECORD_DTYPE` array; columns are accessed
+            by name, e.g. `data["ear_left"]`, `data["alarm"]`.
+
+    Raises:
+        ValueError: If the file is not a compatible telemetry file.
+    """
+    header = np.fromfile(path, dtype=_HEADER_DTYPE, count=1)
+    if header.size != 1 or header[0]["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a telemetry file")
+    if header[0]["version"] != VERSION or header[0]["record_size"] != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} uses an unsupported telemetry format "
+                         f"(version {header[0]['version']})")
+    count = int(header[0]["count"])
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def session_start(path: str) -> float:
+    """Wall-clock start time (Unix seconds) stored in a telemetry header."""
+    return float(np.fromfile(path, dtype=_HEADER_DTYPE, count=1)[0]["start_unix"])
@@ -0,0 +1,158 @@
+"""
+src/core/tracker.py
+
+Eye-region optical-flow tracker.
+
+Between full FaceLandmarker inferences (keyframes) the 12 eye points are
+propagated with pyramidal Lucas-Kanade flow. Only a padded patch around the
+eyes is converted to grayscale and tracked, so a tracked frame costs a small
+fraction of a full landmark inference. Forward-backward error, point status
+and eye-width drift are checked on every frame; any failure returns None so
+the caller re-detects.
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.config import (
+    EYE_TRACKER_FB_THRESHOLD,
+    EYE_TRACKER_MAX_SCALE_DRIFT,
+    EYE_TRACKER_ROI_MARGIN,
+)
+
+
+class EyeFlowTracker:
+    """Propagates (N_faces, 2, 6, 2) eye points from a keyframe with LK flow."""
+
+    def __init__(self,
+                 fb_threshold: float = EYE_TRACKER_FB_THRESHOLD,
+                 max_scale_drift: float = EYE_TRACKER_MAX_SCALE_DRIFT,
+                 roi_margin: float = EYE_TRACKER_ROI_MARGIN,
+                 win_size: Tuple[int, int] = (15, 15),
+                 max_level: int = 2,
+                 rgb_input: bool = False):
+        """
+        Args:
+            fb_threshold: Max forward-backward error (pixels) for any point.
+            max_scale_drift: Max relative change of eye width vs. keyframe.
+            roi_margin: Padding around the eye bounding box, as a fraction of
+                its width.
+            win_size: LK search window per pyramid level.
+            max_level: Number of pyramid levels (0 = no pyramid).
+            rgb_input: Frames are RGB instead of BGR.
+        """
+        self.fb_threshold = fb_threshold
+        self.max_scale_drift = max_scale_drift
+        self.roi_margin = roi_margin
+        self._to_gray = cv2.COLOR_RGB2GRAY if rgb_input else cv2.COLOR_BGR2GRAY
+        self.lk_params = dict(
+            winSize=win_size,
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+        )
+        self.reset()
+
+    def reset(self):
+        """Drops the current track; the next frame must be a keyframe."""
+        self._prev_patch = None
+        self._points = None          # (K, 1, 2) float32, patch coordinates
+        self._shape = None           # original eye_points shape
+        self._region_box = None      # (x0, y0, x1, y1) of the patch
+        self._origin = None          # (x0, y0) of the patch in the frame
+        self._ref_widths = None      # per-eye width at the keyframe
+        self.tracked_frames = 0
+
+    @property
+    def active(self) -> bool:
+        return self._prev_patch is not None
+
+    def _region(self, eye_points: np.ndarray, width: int, height: int):
+        flat = eye_points.reshape(-1, 2)
+        x_min, y_min = flat.min(axis=0)
+        x_max, y_max = flat.max(axis=0)
+        pad = max(self.roi_margin * (x_max - x_min), 8.0)
+        x0 = int(max(0, np.floor(x_min - pad)))
+        y0 = int(max(0, np.floor(y_min - pad)))
+        x1 = int(min(width, np.ceil(x_max + pad)))
+        y1 = int(min(height, np.ceil(y_max + pad)))
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _eye_widths(eye_points: np.ndarray) -> np.ndarray:
+        return np.linalg.norm(eye_points[..., 0, :] - eye_points[..., 3, :], axis=-1)
+
+    def start(self, image: np.ndarray, eye_points: np.ndarray):
+        """
+        Starts a new track from a keyframe.
+
+        Args:
+            image: Full frame the landmarks were detected on.
+            eye_points: (N_faces, 2, 6, 2) eye points in pixels.
+        """
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = self._region(eye_points, width, height)
+        if x1 - x0 < 4 or y1 - y0 < 4:
+            self.reset()
+            return
+
+        self._region_box = (x0, y0, x1, y1)
+        self._origin = np.array([x0, y0], dtype=np.float32)
+        self._prev_patch = cv2.cvtColor(image[y0:y1, x0:x1], self._to_gray)
+        self._shape = eye_points.shape
+        self._points = (eye_points.reshape(-1, 1, 2) - self._origin).astype(np.float32)
+        self._ref_widths = self._eye_widths(eye_points)
+        self.tracked_frames = 0
+
+    def update(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Propagates the eye points into a new frame.
+
+        Args:
+            image: Full frame (same color order as the keyframe).
+
+        Returns:
+            Optional[np.ndarray]: (N_faces, 2, 6, 2) eye points, or None if
+                the track failed a confidence check and must be re-detected.
+        """
+        if not self.active:
+            return None
+
+        x0, y0, x1, y1 = self._region_box
+        if image.shape[0] < y1 or image.shape[1] < x1:
+            self.reset()
+            return None
+        patch = cv2.cvtColor(image[y0:y1, x0:x1], self._to_gray)
+
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(
+            self._prev_patch, patch, self._points, None, **self.lk_params)
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(
+            patch, self._prev_patch, new_points, None, **self.lk_params)
+
+        # Confidence checks: every point found both ways, small FB error
+        if not (status.all() and back_status.all()):
+            self.reset()
+            return None
+        fb_error = np.linalg.norm((back_points - self._points).reshape(-1, 2), axis=1)
+        if fb_error.max() > self.fb_threshold:
+            self.reset()
+            return None
+
+        # Drift checks: points stay inside the patch, eye width stays stable
+        flat = new_points.reshape(-1, 2)
+        patch_h, patch_w = patch.shape
+        if (flat < 0).any() or (flat[:, 0] >= patch_w).any() or (flat[:, 1] >= patch_h).any():
+            self.reset()
+            return None
+
+        eye_points = (new_points.reshape(self._shape) + self._origin).astype(np.float32)
+        drift = np.abs(self._eye_widths(eye_points) / np.maximum(self._ref_widths, 1e-6) - 1.0)
+        if drift.max() > self.max_scale_drift:
+            self.reset()
+            return None
+
+        self._prev_patch = patch
+        self._points = new_points
+        self.tracked_frames += 1
+        return eye_points
@@ -0,0 +1,506 @@
+"""
+src/core/workers.py
+
+Landmark inference in worker processes with shared-memory frame handoff.
+
+All WebRTC sessions run in one Python process, so concurrent inferences
+compete for the interpreter. `InferenceWorkerPool` starts N spawned worker
+processes, each holding its own landmarkers (one VIDEO-mode lease per
+session it serves, from a local `LandmarkerPool`). Sessions are spread
+over the workers, so the node scales with its core count.
+
+Every session lease owns one preallocated `SharedMemory` slot: the RGB
+inference input is copied into the slot, the worker reads it in place and
+writes the normalised landmarks back into the same slot. Only small
+control tuples (slot index, shape, timestamp) cross the pipe; frames and
+landmarks are never pickled.
+
+Only the landmarks the detector reads (eye contours and face oval) are
+written back, converted once per face with NumPy.
+
+A monitor thread checks every worker each health interval. A worker whose
+process died, or that has requests outstanding but produced no answer for
+the request timeout, is terminated and respawned outside the pool lock
+(at most once per interval); a worker that is merely busy keeps answering
+and is left alone. Its sessions transparently reopen their landmarker on
+the next frame, while requests in flight fail with `WorkerError`.
+"""
+
+import atexit
+import itertools
+import multiprocessing
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from src.config import (
+    FACE_OVAL_INDICES,
+    INFERENCE_WORKER_HEALTH_INTERVAL_S,
+    INFERENCE_WORKER_MAX_FRAME,
+    INFERENCE_WORKER_TIMEOUT_S,
+    INFERENCE_WORKERS,
+    LANDMARKER_POOL_SIZE,
+    LANDMARKER_POOL_TIMEOUT_S,
+    MAX_FACES,
+)
+from src.core.landmarker import LandmarkerPoolExhausted
+from src.utils.geometry import EYE_INDICES
+
+NUM_LANDMARKS = 478
+
+# Landmarks the detector uses (EAR, eye tracking, face ROI); the others stay zero
+USED_LANDMARKS = np.union1d(EYE_INDICES.ravel(), FACE_OVAL_INDICES)
+
+# A (re)started worker first loads its landmarker; requests may wait this long
+_STARTUP_TIMEOUT_S = 30.0
+
+
+class WorkerError(RuntimeError):
+    """An inference request failed (worker error, crash or timeout)."""
+
+
+class WorkerResult(NamedTuple):
+    """Compact stand-in for a FaceLandmarkerResult."""
+    face_landmarks: List[np.ndarray]    # per face, (478, 2) normalized x, y (USED_LANDMARKS only)
+
+
+def _slot_layout(max_frame, num_faces):
+    """Byte sizes of a slot's frame area and landmark area."""
+    width, height = max_frame
+    return width * height * 3, num_faces * NUM_LANDMARKS * 2 * 4
+
+
+# -----------------------------------------------------------------------------
+# WORKER PROCESS
+# -----------------------------------------------------------------------------
+def _worker_main(conn, slot_names, max_frame, num_faces):
+    """Worker process loop: serves open / detect / close requests."""
+    import mediapipe as mp
+
+    from src.core.landmarker import LandmarkerPool
+
+    cv2.setNumThreads(1)
+    frame_bytes, _ = _slot_layout(max_frame, num_faces)
+    slots = [SharedMemory(name=name) for name in slot_names]
+    landmarks = [np.ndarray((num_faces, NUM_LANDMARKS, 2), dtype=np.float32,
+                            buffer=slot.buf, offset=frame_bytes) for slot in slots]
+    pool = LandmarkerPool(max_size=len(slots), num_faces=num_faces)
+    leases = {}
+    try:
+        pool.warm_up(1)
+        conn.send(("ready",))
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            kind = message[0]
+            if kind == "open":
+                if message[1] in leases:
+                    continue  # reopened after a timeout: keep its timestamps
+                try:
+                    leases[message[1]] = pool.checkout(timeout=0.0)
+                except Exception as e:
+                    print(f"[ERROR] Inference worker could not open a landmarker: {e}")
+            elif kind == "close":
+                lease = leases.pop(message[1], None)
+                if lease is not None:
+                    lease.release()
+            elif kind == "detect":
+                _, session, seq, slot, height, width, timestamp_ms = message
+                try:
+                    frame = np.ndarray((height, width, 3), dtype=np.uint8, buffer=slots[slot].buf)
+                    image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame)
+                    del frame
+                    faces = leases[session].detect_for_video(image, timestamp_ms).face_landmarks
+                    faces = faces[:num_faces]
+                    for i, face in enumerate(faces):
+                        landmarks[slot][i, USED_LANDMARKS] = [
+                            (face[j].x, face[j].y) for j in USED_LANDMARKS]
+                    conn.send(("result", seq, len(faces)))
+                except Exception as e:
+                    conn.send(("error", seq, repr(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for lease in leases.values():
+            lease.release()
+        pool.close()
+        del landmarks
+        for slot in slots:
+            slot.close()
+
+
+# -----------------------------------------------------------------------------
+# PARENT SIDE
+# -----------------------------------------------------------------------------
+class _Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[str] = None
+        self.sent_at = time.monotonic()
+
+
+class _Worker:
+    """Parent-side handle of one worker process (restartable)."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.generation = 0
+        self.sessions = 0
+        self.ready = threading.Event()
+        self.last_seen = 0.0            # last answer received
+        self.send_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending: Dict[int, _Waiter] = {}
+
+    def send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def add_pending(self, seq: int, waiter: _Waiter):
+        with self.pending_lock:
+            self.pending[seq] = waiter
+
+    def pop_pending(self, seq: int) -> Optional[_Waiter]:
+        with self.pending_lock:
+            return self.pending.pop(seq, None)
+
+    def oldest_pending(self) -> Optional[float]:
+        """Send time of the oldest unanswered request."""
+        with self.pending_lock:
+            return min((w.sent_at for w in self.pending.values()), default=None)
+
+
+class WorkerLease:
+    """
+    Session-scoped lease on a worker process and a shared-memory slot.
+
+    Stands in for a VIDEO-mode landmarker: `detect_for_video` takes the
+    RGB inference input as a NumPy array (no mp.Image) and returns a
+    `WorkerResult`. Inputs larger than the slot are downscaled into it;
+    landmarks are normalized, so the caller's transform is unaffected.
+    """
+
+    array_input = True
+
+    def __init__(self, pool: "InferenceWorkerPool", worker: _Worker, slot: int, session: int):
+        self._pool = pool
+        self._worker = worker
+        self._slot = slot
+        self._session = session
+        self._generation = None
+        self._frame_buf = pool._slots[slot].buf
+        self._landmarks = np.ndarray((pool.num_faces, NUM_LANDMARKS, 2), dtype=np.float32,
+                                     buffer=self._frame_buf, offset=pool._frame_bytes)
+
+    def _fit(self, image: np.ndarray):
+        """Copies (or downscales) the image into the slot; returns its shape."""
+        height, width = image.shape[:2]
+        max_width, max_height = self._pool.max_frame
+        scale = min(1.0, max_width / width, max_height / height)
+        if scale < 1.0:
+            width, height = max(1, int(width * scale)), max(1, int(height * scale))
+        frame = np.ndarray((height, width, 3), dtype=np.uint8, buffer=self._frame_buf)
+        if scale < 1.0:
+            cv2.resize(image, (width, height), dst=frame, interpolation=cv2.INTER_AREA)
+        else:
+            np.copyto(frame, image)
+        return height, width
+
+    def detect_for_video(self, image: np.ndarray, timestamp_ms: int) -> WorkerResult:
+        if self._worker is None:
+            raise RuntimeError("Worker lease has already been released")
+        worker = self._worker
+        height, width = self._fit(image)
+        if self._generation != worker.generation:
+            # First frame, or the worker was restarted: (re)open our landmarker
+            self._generation = worker.generation
+            self._pool._send(worker, ("open", self._session))
+        try:
+            count = self._pool._request(worker, "detect", self._session, self._slot,
+                                        height, width, int(timestamp_ms))
+        except WorkerError:
+            self._generation = None  # reopen on the next frame
+            raise
+        return WorkerResult(list(self._landmarks[:count].copy()))
+
+    def release(self):
+        """Closes the session's landmarker in the worker and frees the slot (idempotent)."""
+        if self._worker is not None:
+            self._pool._release(self)
+            self._worker = None
+            self._landmarks = None
+            self._frame_buf = None
+
+    close = release
+
+
+class InferenceWorkerPool:
+    """Worker processes plus one shared-memory slot per concurrent session."""
+
+    def __init__(self,
+                 workers: int = INFERENCE_WORKERS,
+                 num_faces: int = MAX_FACES,
+                 slots: int = LANDMARKER_POOL_SIZE,
+                 max_frame=INFERENCE_WORKER_MAX_FRAME,
+                 timeout_s: float = INFERENCE_WORKER_TIMEOUT_S,
+                 health_interval_s: float = INFERENCE_WORKER_HEALTH_INTERVAL_S):
+        """
+        Args:
+            workers: Worker processes to start.
+            num_faces: Maximum faces per frame.
+            slots: Shared-memory slots (= maximum concurrent sessions).
+            max_frame: (width, height) of the largest inference input kept
+                at full resolution.
+            timeout_s: A request unanswered for this long fails; a worker
+                that answers nothing for this long while requests are
+                outstanding is restarted.
+            health_interval_s: How often the monitor checks the workers.
+        """
+        self.num_faces = num_faces
+        self.max_frame = tuple(max_frame)
+        self.timeout_s = timeout_s
+        self.health_interval_s = health_interval_s
+        self.restarts = 0
+        self._frame_bytes, result_bytes = _slot_layout(self.max_frame, num_faces)
+        self._context = multiprocessing.get_context("spawn")  # MediaPipe is not fork-safe
+        self._lock = threading.Condition()
+        self._seq = itertools.count()
+        self._sessions = itertools.count()
+        self._closed = False
+
+        self._slots = [SharedMemory(create=True, size=self._frame_bytes + result_bytes)
+                       for _ in range(max(1, int(slots)))]
+        self._free_slots = list(range(len(self._slots)))
+        self._workers = [_Worker(i) for i in range(max(1, int(workers)))]
+        for worker in self._workers:
+            self._attach(worker, *self._spawn(worker))
+
+        self._monitor = threading.Thread(target=self._monitor_loop, name="inference-monitor",
+                                         daemon=True)
+        self._monitor.start()
+
+    # -------------------------------------------------------------------------
+    # Worker lifecycle
+    # -------------------------------------------------------------------------
+    def _spawn(self, worker: _Worker):
+        """Starts a worker process (slow: a fresh interpreter); returns (process, conn)."""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, name=f"inference-worker-{worker.index}",
+            args=(child_conn, [slot.name for slot in self._slots], self.max_frame,
+                  self.num_faces),
+            daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _attach(self, worker: _Worker, process, conn):
+        """Makes a spawned process the worker's current one."""
+        worker.process = process
+        worker.conn = conn
+        worker.last_seen = time.monotonic()
+        threading.Thread(target=self._receive_loop, args=(worker, conn, worker.generation),
+                         name=f"inference-receiver-{worker.index}", daemon=True).start()
+
+    def _receive_loop(self, worker: _Worker, conn, generation: int):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            worker.last_seen = time.monotonic()
+            kind = message[0]
+            if kind == "ready":
+                worker.ready.set()
+                continue
+            waiter = worker.pop_pending(message[1])
+            if waiter is None:
+                continue
+            if kind == "result":
+                waiter.value = message[2]
+            else:
+                waiter.error = message[2]
+            waiter.event.set()
+        # The monitor respawns the process; fail what it will never answer
+        with self._lock:
+            if worker.generation == generation:
+                self._fail_pending(worker, "process exited")
+
+    @staticmethod
+    def _fail_pending(worker: _Worker, reason: str):
+        with worker.pending_lock:
+            pending, worker.pending = worker.pending, {}
+        for waiter in pending.values():
+            waiter.error = f"worker {worker.index} failed ({reason})"
+            waiter.event.set()
+
+    def _restart(self, worker: _Worker, generation: int, reason: str):
+        """
+        Replaces a dead or hung worker (no-op if already replaced).
+
+        Only the generation bump happens under the pool lock; the old
+        process is reaped and the new one spawned outside it, so sessions
+        on other workers keep checking out and submitting meanwhile.
+        Requests to this worker fail fast until the new process is attached.
+        """
+        with self._lock:
+            if self._closed or worker.generation != generation:
+                return
+            worker.generation += 1
+            worker.ready = threading.Event()
+            self.restarts += 1
+            process, conn = worker.process, worker.conn
+        print(f"[WARNING] Restarting inference worker {worker.index}: {reason}")
+        self._fail_pending(worker, reason)
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=1.0)
+        conn.close()
+
+        process, conn = self._spawn(worker)
+        with self._lock:
+            if self._closed:
+                process.terminate()
+                conn.close()
+                return
+            self._attach(worker, process, conn)
+
+    def _hung(self, worker: _Worker) -> bool:
+        """Requests outstanding, but no answer at all for longer than the timeout."""
+        oldest = worker.oldest_pending()
+        if oldest is None:
+            return False
+        limit = self.timeout_s + (0.0 if worker.ready.is_set() else _STARTUP_TIMEOUT_S)
+        now = time.monotonic()
+        return now - oldest > limit and now - worker.last_seen > limit
+
+    def _monitor_loop(self):
+        while not self._closed:
+            time.sleep(self.health_interval_s)
+            for worker in self._workers:
+                generation = worker.generation
+                if not worker.process.is_alive():
+                    self._restart(worker, generation, "process died")
+                elif self._hung(worker):
+                    self._restart(worker, generation, f"no answer within {self.timeout_s:.1f}s")
+
+    def warm_up(self, timeout: float = 60.0) -> bool:
+        """Waits until every worker has loaded its first landmarker."""
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            if not worker.ready.wait(max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+    # -------------------------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------------------------
+    def _send(self, worker: _Worker, message):
+        try:
+            worker.send(message)
+        except (OSError, ValueError) as e:
+            raise WorkerError(f"Inference worker {worker.index} unavailable: {e}") from e
+
+    def _request(self, worker: _Worker, kind: str, session: int, *args):
+        """Sends (kind, session, seq, *args) and blocks for the answer."""
+        seq = next(self._seq)
+        waiter = _Waiter()
+        worker.add_pending(seq, waiter)
+        try:
+            self._send(worker, (kind, session, seq) + args)
+        except WorkerError:
+            worker.pop_pending(seq)
+            raise
+        # Leave time for the landmarker a (re)started worker loads first.
+        # Restarting is the monitor's call: a busy worker may just be late
+        timeout = self.timeout_s + (0.0 if worker.ready.is_set() else _STARTUP_TIMEOUT_S)
+        if not waiter.event.wait(timeout):
+            worker.pop_pending(seq)
+            raise WorkerError(f"Inference worker {worker.index} timed out")
+        if waiter.error is not None:
+            raise WorkerError(f"Inference worker {worker.index}: {waiter.error}")
+        return waiter.value
+
+    def checkout(self, timeout: float = LANDMARKER_POOL_TIMEOUT_S) -> WorkerLease:
+        """
+        Leases a slot on the least busy worker for one session.
+
+        Raises:
+            LandmarkerPoolExhausted: If no slot is free within `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while not self._free_slots:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._lock.wait(remaining):
+                    if not self._free_slots:
+                        raise LandmarkerPoolExhausted(
+                            f"All {len(self._slots)} inference slots are in use")
+            if self._closed:
+                raise RuntimeError("Inference worker pool is closed")
+            slot = self._free_slots.pop()
+            worker = min(self._workers, key=lambda w: w.sessions)
+            worker.sessions += 1
+        return WorkerLease(self, worker, slot, next(self._sessions))
+
+    def _release(self, lease: WorkerLease):
+        worker = lease._worker
+        if lease._generation == worker.generation:
+            try:
+                worker.send(("close", lease._session))
+            except (OSError, ValueError):
+                pass
+        with self._lock:
+            worker.sessions -= 1
+            self._free_slots.append(lease._slot)
+            self._lock.notify()
+
+    @property
+    def in_use(self) -> int:
+        with self._lock:
+            return len(self._slots) - len(self._free_slots)
+
+    def close(self):
+        """Stops the workers and frees the shared memory (idempotent)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self._workers:
+            try:
+                worker.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=2.0)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        for slot in self._slots:
+            try:
+                slot.close()
+            except BufferError:
+                pass  # still mapped by an unreleased lease; unlinked anyway
+            slot.unlink()
+
+
+_POOLS = {}
+_POOL_LOCK = threading.Lock()
+
+
+def get_worker_pool(num_faces: int = MAX_FACES) -> InferenceWorkerPool:
+    """Returns the process-wide inference worker pool for `num_faces` (started on first use)."""
+    with _POOL_LOCK:
+        pool = _POOLS.get(num_faces)
+        if pool is None:
+            pool = _POOLS[num_faces] = InferenceWorkerPool(num_faces=num_faces)
+            atexit.register(pool.close)
+        return pool
@@ -0,0 +1,329 @@
+"""
+src/processor.py
+
+WebRTC video processor for the Streamlit app.
+
+Kept out of `main.py` so the heavy CV stack (MediaPipe, OpenCV) is only
+imported when the first stream starts (or by the background prewarm),
+not on every Streamlit script run.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import List, Optional
+
+import av
+import numpy as np
+from streamlit_webrtc import VideoProcessorBase
+
+from src.config import (
+    EYE_TRACKING_ENABLED,
+    FACE_ROI_ENABLED,
+    INFERENCE_WORKERS,
+    LANDMARKER_LIVE_STREAM,
+    MAX_FACES,
+    TELEMETRY_DIR,
+    TELEMETRY_ENABLED,
+    VIDEO_OUTPUT,
+)
+from src.core.backpressure import POLICY_FIXED_RATE, FrameClock, FrameGate
+from src.core.detector import DrowsinessDetector
+from src.core.events import AlarmSignal, LiveFeed, PanelSample
+from src.core.landmarker import get_landmarker_pool
+from src.core.metrics import get_metrics_registry
+from src.core.renderer import OverlayRenderer
+from src.core.sessions import Admission, get_session_manager
+from src.core.telemetry import TelemetryRecorder
+from src.core.workers import get_worker_pool
+
+
+class DrowsinessProcessor(VideoProcessorBase):
+    """MediaPipe-based drowsiness detection processor for WebRTC streams."""
+    
+    def __init__(self, tracking: bool = EYE_TRACKING_ENABLED, face_roi: bool = FACE_ROI_ENABLED,
+                 num_faces: int = MAX_FACES, annotate: bool = VIDEO_OUTPUT == "annotated",
+                 live_stream: bool = LANDMARKER_LIVE_STREAM,
+                 inference_workers: bool = INFERENCE_WORKERS > 0,
+                 telemetry: bool = TELEMETRY_ENABLED,
+                 admission: Optional[Admission] = None):
+        """
+        Args:
+            telemetry: Record per-frame results to TELEMETRY_DIR.
+            admission: Slot granted by the session manager; owned by the
+                processor from here on and released with its other resources.
+                Degraded sessions are analysed at the admission's reduced rate.
+        """
+        self.admission = admission
+        self.alarm_signal = None
+        self.live_feed = None
+        self.landmarker = None
+        self.detector = None
+        self.metrics = None
+        self.recorder = None
+        self._closed = False
+        self._close_lock = threading.Lock()
+        # Held while a frame is processed; close() waits on it so the lease
+        # is never returned to the pool while a frame still uses it
+        self._busy_lock = threading.Lock()
+        try:
+            self._open(tracking, face_roi, num_faces, annotate, live_stream, inference_workers,
+                       telemetry)
+        except Exception:
+            # Nothing reaches on_ended for a processor that failed to start
+            self.close()
+            raise
+        
+    def _open(self, tracking: bool, face_roi: bool, num_faces: int, annotate: bool,
+              live_stream: bool, inference_workers: bool, telemetry: bool):
+        self.frame_lock = threading.Lock()
+        self.alarm_on = False
+        self.current_ear = 0.0
+        self.current_fatigue = None     # FatigueSnapshot (PERCLOS, blinks)
+        
+        # Wakes the UI only on alarm transitions
+        self.alarm_signal = AlarmSignal()
+        
+        # Per-frame values for the live metrics panel (bounded, drained by the UI)
+        self.live_feed = LiveFeed()
+        
+        # Landmarker leased for this session: from the shared in-process pool,
+        # or a shared-memory slot on an inference worker process
+        if inference_workers:
+            self.landmarker = get_worker_pool(num_faces).checkout()
+        else:
+            self.landmarker = get_landmarker_pool(num_faces, live_stream).checkout()
+        
+        # Per-stage latency histograms and counters for this session
+        self.metrics = get_metrics_registry().register()
+        
+        # Shared detection core (landmarks, EAR, time-based alarm). Frames
+        # are decoded straight to RGB, the format MediaPipe consumes. In
+        # LIVE_STREAM mode inference runs alongside decode / render / encode
+        # and each frame is annotated with the latest completed result
+        self.detector = DrowsinessDetector(tracking=tracking, face_roi=face_roi,
+                                           landmarker=self.landmarker, metrics=self.metrics,
+                                           num_faces=num_faces, rgb_input=True,
+                                           live_stream=live_stream)
+        self._face_found = False
+        self._last_result_ms = None
+        
+        # Per-frame results to a memory-mapped file (written off this thread)
+        if telemetry:
+            path = os.path.join(TELEMETRY_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_"
+                                               f"{self.metrics.session_id}.tlm")
+            try:
+                self.recorder = TelemetryRecorder(path)
+            except OSError as e:
+                print(f"Warning: Could not start telemetry recording: {e}")
+        
+        # In-place overlay rendering with cached sprites (results-only
+        # sessions return the incoming frame untouched instead)
+        self.annotate = annotate
+        self.renderer = OverlayRenderer(rgb=True)
+        
+        # Keeps only fresh frames when processing falls behind; degraded
+        # sessions are sampled at a fixed, lower rate
+        if self.admission is not None and self.admission.degraded:
+            self.gate = FrameGate(POLICY_FIXED_RATE, sample_fps=self.admission.degraded_fps)
+        else:
+            self.gate = FrameGate()
+        
+        # Session-relative frame time (raw RTP pts start at random and wrap)
+        self.clock = FrameClock()
+        
+    def _frame_timestamp_ms(self, frame: av.VideoFrame) -> float:
+        """Session time of the frame in ms, from its pts (wall clock without)."""
+        return self.clock.timestamp_ms(frame.pts, frame.time_base)
+        
+    def _decode(self, frame: av.VideoFrame) -> np.ndarray:
+        """Decode a frame to RGB, timing the decode stage."""
+        start = time.perf_counter()
+        image = frame.to_ndarray(format="rgb24")
+        self.metrics.observe("decode", time.perf_counter() - start)
+        return image
+        
+    def _detect(self, image: np.ndarray, frame: av.VideoFrame):
+        """Run the detection core on a decoded frame and publish its state."""
+        result = self.detector.process(image, self._frame_timestamp_ms(frame))
+        if result.timestamp_ms == self._last_result_ms:
+            # LIVE_STREAM: no new result since the previous frame
+            return result
+        self._last_result_ms = result.timestamp_ms
+        
+        self.metrics.inc("frames_processed")
+        if self._face_found and not result.face_found:
+            self.metrics.inc("faces_lost")
+        if result.alarm_on and not self.alarm_on:
+            self.metrics.inc("alarms_raised")
+        self._face_found = result.face_found
+        
+        # Thread-safe update of alarm state, EAR and fatigue metrics
+        with self.frame_lock:
+            self.alarm_on = result.alarm_on
+            self.current_ear = result.ear
+            self.current_fatigue = result.fatigue
+        self.alarm_signal.publish(result.alarm_on)
+        if result.face_found:
+            fatigue = result.fatigue
+            self.live_feed.push(PanelSample(result.timestamp_ms, True, result.ear,
+                                            float(result.face_thresholds[0]), fatigue.perclos,
+                                            fatigue.blink_rate, result.alarm_on))
+        else:
+            self.live_feed.push(PanelSample(result.timestamp_ms, False, 0.0, 0.0, 0.0, 0.0,
+                                            result.alarm_on))
+        if self.recorder is not None:
+            self.recorder.record(result)
+        return result
+        
+    def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
+        """Process incoming video frame for drowsiness detection."""
+        with self._busy_lock:
+            if self._closed:
+                return frame
+            return self._process(frame)
+        
+    def _process(self, frame: av.VideoFrame) -> av.VideoFrame:
+        """Analyse (and annotate) one frame; caller holds `_busy_lock`."""
+        image = self._decode(frame)
+        
+        if not self.annotate:
+            # Results only: no overlay, no re-encode of a new frame
+            try:
+                self._detect(image, frame)
+            except Exception as e:
+                self.metrics.inc("errors")
+                print(f"Error in processing: {e}")
+            return frame
+        
+        try:
+            result = self._detect(image, frame)
+            start = time.perf_counter()
+            self.renderer.render(image, result)
+            self.metrics.observe("render", time.perf_counter() - start)
+        except Exception as e:
+            self.metrics.inc("errors")
+            print(f"Error in processing: {e}")
+            
+        start = time.perf_counter()
+        out = av.VideoFrame.from_ndarray(image, format="rgb24")
+        self.metrics.observe("encode", time.perf_counter() - start)
+        return out
+        
+    async def recv_queued(self, frames: List[av.VideoFrame]) -> List[av.VideoFrame]:
+        """
+        Apply the backpressure policy to the frames queued since the last call.
+        
+        Selected frames all feed the detector, but only the newest one is
+        annotated and returned, so output latency stays bounded.
+        """
+        with self._busy_lock:
+            if self._closed:
+                return frames[-1:]
+            timestamps = [self._frame_timestamp_ms(f) for f in frames]
+            selected = self.gate.select(frames, timestamps)
+            self.metrics.inc("frames_dropped", len(frames) - len(selected))
+            if not selected:
+                return []
+            
+            for frame in selected[:-1]:
+                try:
+                    self._detect(self._decode(frame), frame)
+                except Exception as e:
+                    self.metrics.inc("errors")
+                    print(f"Error in processing: {e}")
+            
+            return [self._process(selected[-1])]
+        
+    @property
+    def frames_dropped(self) -> int:
+        """Frames discarded by the backpressure policy."""
+        return self.gate.frames_dropped
+        
+    def on_ended(self):
+        """
+        Release the session's resources and report stats.
+        
+        streamlit-webrtc calls this on the aiortc event loop (after a join
+        that may have timed out with a frame still in flight); the release
+        then waits for that frame and joins the telemetry writer on a
+        separate thread instead of stalling every other stream.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._end()
+        else:
+            threading.Thread(target=self._end, name="session-close", daemon=True).start()
+        
+    def _end(self):
+        if self.close():
+            print(f"[INFO] Stream ended: {self.gate.frames_received} frames received, "
+                  f"{self.gate.frames_dropped} dropped ({self.gate.policy})")
+        
+    def close(self) -> bool:
+        """
+        Release everything the session holds (idempotent): the landmarker
+        lease (back to the warm pool), telemetry file, metrics, buffered
+        panel samples and the admission slot. Blocks until a frame being
+        processed has finished; frames arriving later pass through.
+        
+        Returns:
+            bool: True on the call that actually released the resources.
+        """
+        with self._close_lock:
+            if self._closed:
+                return False
+            self._closed = True
+        
+        with self._busy_lock:
+            self._release()
+        return True
+        
+    def _release(self):
+        if self.alarm_signal is not None:
+            self.alarm_signal.close()
+        if self.detector is not None:
+            self.detector.close()
+        if self.landmarker is not None:
+            self.landmarker.release()
+        if self.metrics is not None:
+            get_metrics_registry().unregister(self.metrics)
+        if self.live_feed is not None:
+            self.live_feed.drain()
+        if self.recorder is not None:
+            self.recorder.close()
+            print(f"[INFO] Telemetry: {self.recorder.written} records -> {self.recorder.path} "
+                  f"({self.recorder.dropped} dropped)")
+        if self.admission is not None:
+            self.admission.release()
+
+
+class RejectedProcessor(VideoProcessorBase):
+    """
+    Stand-in for a session the session manager turned away: no landmarker
+    or buffers are allocated and frames pass through unanalysed.
+    """
+    
+    def __init__(self, admission: Admission):
+        self.admission = admission
+        
+    def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
+        return frame
+        
+    async def recv_queued(self, frames: List[av.VideoFrame]) -> List[av.VideoFrame]:
+        return frames[-1:]
+
+
+def admit_processor(**kwargs) -> VideoProcessorBase:
+    """
+    Admits a new stream with the session manager and builds its processor.
+
+    Rejected streams get a pass-through processor that allocates no model
+    or buffers; keyword arguments go to `DrowsinessProcessor`.
+    """
+    admission = get_session_manager().admit()
+    if admission.rejected:
+        return RejectedProcessor(admission)
+    return DrowsinessProcessor(admission=admission, **kwargs)
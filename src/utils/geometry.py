@@ -2,10 +2,28 @@
 utils/geometry.py
 
 Geometric utility functions for calculating distances and aspect ratios.
+
+The scalar helpers (`euclidean_distance`, `calculate_ear`) operate on a single
+eye given as a list of tuples. The vectorized helpers operate on NumPy arrays
+shaped (..., 6, 2), so every eye of every face (or every frame of an offline
+trace) is scored in one NumPy call.
 """
 
 import math
-from typing import Tuple, List
+from typing import Sequence, Tuple, List
+
+import numpy as np
+
+from src.config import LEFT_EYE_INDICES, RIGHT_EYE_INDICES
+
+# (2 eyes, 6 points) index table used to gather eye points from a full
+# (..., 478, 2) landmark array with a single fancy-index pass.
+EYE_INDICES = np.array([LEFT_EYE_INDICES, RIGHT_EYE_INDICES], dtype=np.intp)
+
+# EAR point pairs: (p2, p6) and (p3, p5) vertical, (p1, p4) horizontal
+_EAR_PAIR_A = np.array([1, 2, 0], dtype=np.intp)
+_EAR_PAIR_B = np.array([5, 4, 3], dtype=np.intp)
+
 
 def euclidean_distance(point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
     """
@@ -51,3 +69,106 @@ def calculate_ear(eye_landmarks: List[Tuple[float, float]]) -> float:
 
     # EAR Formula
     return (vert1 + vert2) / (2.0 * horiz)
+
+# -----------------------------------------------------------------------------
+# VECTORIZED EAR ENGINE
+# -----------------------------------------------------------------------------
+def landmarks_to_array(face_landmarks: Sequence, width: float, height: float,
+                       indices: np.ndarray) -> np.ndarray:
+    """
+    Gathers selected landmarks of every detected face into one float array.
+
+    Only the landmarks named in `indices` are touched, so the Python-level
+    cost scales with the index table instead of the full 478-point mesh.
+    Coordinates are kept as floats (no int truncation).
+
+    Args:
+        face_landmarks: MediaPipe `results.face_landmarks` (list of faces,
+            each a list of NormalizedLandmark, or a (478, 2) normalized
+            array as returned by an inference worker).
+        width: Horizontal scale (frame width in pixels).
+        height: Vertical scale (frame height in pixels).
+        indices: Landmark index table of any shape S.
+
+    Returns:
+        np.ndarray: (N_faces, *S, 2) float32 pixel coordinates.
+    """
+    flat = indices.ravel()
+    if len(face_landmarks) and isinstance(face_landmarks[0], np.ndarray):
+        points = np.stack(face_landmarks)[:, flat, :2].astype(np.float32)
+    else:
+        points = np.array(
+            [[(face[i].x, face[i].y) for i in flat] for face in face_landmarks],
+            dtype=np.float32,
+        )
+    points = points.reshape(len(face_landmarks), *indices.shape, 2)
+    points *= np.array([width, height], dtype=np.float32)
+    return points
+
+def landmarks_to_eye_array(face_landmarks: Sequence, width: float, height: float,
+                           eye_indices: np.ndarray = EYE_INDICES) -> np.ndarray:
+    """
+    Gathers the eye points of every detected face into one float array.
+
+    Args:
+        face_landmarks: MediaPipe `results.face_landmarks`.
+        width: Frame width in pixels.
+        height: Frame height in pixels.
+        eye_indices: (2, 6) landmark index table.
+
+    Returns:
+        np.ndarray: (N_faces, 2, 6, 2) float32 pixel coordinates.
+    """
+    return landmarks_to_array(face_landmarks, width, height, eye_indices)
+
+def gather_eye_points(landmarks: np.ndarray,
+                      eye_indices: np.ndarray = EYE_INDICES) -> np.ndarray:
+    """
+    Gathers eye points from a full landmark array with one fancy-index pass.
+
+    Args:
+        landmarks: (..., N_landmarks, 2) array of landmark coordinates.
+        eye_indices: (2, 6) landmark index table.
+
+    Returns:
+        np.ndarray: (..., 2, 6, 2) array of eye points.
+    """
+    return landmarks[..., eye_indices, :]
+
+def eye_aspect_ratios(eye_points: np.ndarray) -> np.ndarray:
+    """
+    Vectorized Eye Aspect Ratio over any number of eyes.
+
+    Equivalent to `calculate_ear` applied to every trailing (6, 2) block,
+    including the zero-width guard.
+
+    Args:
+        eye_points: (..., 6, 2) array of eye points, e.g. (N_faces, 2, 6, 2).
+
+    Returns:
+        np.ndarray: (...) array of EAR values, e.g. (N_faces, 2).
+    """
+    eye_points = np.asarray(eye_points, dtype=np.float32)
+    deltas = eye_points[..., _EAR_PAIR_A, :] - eye_points[..., _EAR_PAIR_B, :]
+    dists = np.sqrt(np.einsum("...ij,...ij->...i", deltas, deltas))
+    vertical = dists[..., 0] + dists[..., 1]
+    horizontal = 2.0 * dists[..., 2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ear = np.where(horizontal > 0, vertical / horizontal, 0.0)
+    return ear.astype(np.float32, copy=False)
+
+def batch_eye_aspect_ratios(landmark_trace: np.ndarray,
+                            eye_indices: np.ndarray = EYE_INDICES) -> np.ndarray:
+    """
+    Scores an offline landmark trace in a single call.
+
+    Args:
+        landmark_trace: (T, N_faces, N_landmarks, 2) or (T, N_landmarks, 2)
+            array of landmark coordinates (pixels).
+        eye_indices: (2, 6) landmark index table.
+
+    Returns:
+        np.ndarray: (T, N_faces, 2) or (T, 2) per-eye EAR values. Average
+            over the last axis for the per-face EAR.
+    """
+    return eye_aspect_ratios(gather_eye_points(np.asarray(landmark_trace), eye_indices))
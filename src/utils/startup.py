@@ -0,0 +1,66 @@
+"""
+src/utils/startup.py
+
+Process startup timing.
+
+Records how long each cold-start phase took (asset loading, CV imports,
+model warm-up) and when milestones such as the first page render and
+model readiness were reached, measured from process start. The report
+is printed once the app is ready and exported on the metrics endpoint.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+def _process_age_s() -> float:
+    """Seconds since this process started (0.0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+class StartupTimer:
+    """Phase durations and milestones of the current process's startup."""
+
+    def __init__(self):
+        self.origin = time.monotonic() - _process_age_s()
+        self.durations: Dict[str, float] = {}
+        self.milestones: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times the enclosed block as phase `name`."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.durations[name] = time.monotonic() - start
+
+    def mark(self, name: str):
+        """Records milestone `name` (first call wins)."""
+        with self._lock:
+            self.milestones.setdefault(name, time.monotonic() - self.origin)
+
+    def elapsed(self, name: str) -> Optional[float]:
+        with self._lock:
+            return self.milestones.get(name)
+
+    def report(self) -> str:
+        with self._lock:
+            phases = ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in self.durations.items())
+            marks = ", ".join(f"{k} at {v:.2f} s" for k, v in self.milestones.items())
+        return f"[INFO] Startup: {phases or 'no phases'} | {marks or 'no milestones'}"
+
+
+STARTUP = StartupTimer()
@@ -0,0 +1,86 @@
+"""
+tests/test_frame_clock.py
+
+Frame time across RTP timestamp wraparound.
+"""
+
+from fractions import Fraction
+
+import numpy as np
+
+from src.config import EYE_CLOSED_DURATION_MS, LEFT_EYE_INDICES, RIGHT_EYE_INDICES
+from src.core.backpressure import FrameClock
+from src.core.detector import DrowsinessDetector
+
+RTP_TIME_BASE = Fraction(1, 90000)
+TICKS_PER_FRAME = 3000                  # 30 fps at 90 kHz
+FRAME_MS = 1000.0 / 30.0
+
+
+def _rtp_pts(start, count):
+    return [(start + i * TICKS_PER_FRAME) % 2 ** 32 for i in range(count)]
+
+
+class _EyeLandmarker:
+    """Stub landmarker: one face whose eyes are open or closed."""
+
+    array_input = True
+
+    def __init__(self):
+        self.closed = False
+
+    def detect_for_video(self, image, timestamp_ms):
+        points = np.full((478, 2), 0.5, dtype=np.float32)
+        openness = 0.002 if self.closed else 0.02
+        for indices, cx in ((LEFT_EYE_INDICES, 0.4), (RIGHT_EYE_INDICES, 0.6)):
+            points[indices] = [(cx - 0.03, 0.45), (cx - 0.01, 0.45 - openness),
+                               (cx + 0.01, 0.45 - openness), (cx + 0.03, 0.45),
+                               (cx + 0.01, 0.45 + openness), (cx - 0.01, 0.45 + openness)]
+        return type("Result", (), {"face_landmarks": [points]})()
+
+
+def test_clock_unwraps_rtp_pts():
+    clock = FrameClock()
+    pts = _rtp_pts(2 ** 32 - 10 * TICKS_PER_FRAME, 20)
+    times = np.array([clock.timestamp_ms(p, RTP_TIME_BASE) for p in pts])
+    np.testing.assert_allclose(np.diff(times), FRAME_MS, rtol=1e-6)
+
+
+def test_clock_keeps_older_frames_of_a_batch_behind_the_newest():
+    clock = FrameClock()
+    first, second = _rtp_pts(2 ** 32 - TICKS_PER_FRAME, 2)
+    t_second = clock.timestamp_ms(second, RTP_TIME_BASE)
+    assert clock.timestamp_ms(first, RTP_TIME_BASE) < t_second
+    assert clock.timestamp_ms(second, RTP_TIME_BASE) == t_second
+
+
+def test_clock_replaces_jumps_with_wall_time():
+    clock = FrameClock(max_jump_ms=1000.0)
+    t0 = clock.timestamp_ms(0, RTP_TIME_BASE)
+    t1 = clock.timestamp_ms(2 ** 31 - 1, RTP_TIME_BASE)      # ~6.6 h ahead
+    assert 0.0 <= t1 - t0 < 1000.0
+
+
+def test_alarm_fires_on_time_across_wraparound():
+    landmarker = _EyeLandmarker()
+    detector = DrowsinessDetector(tracking=False, face_roi=False, landmarker=landmarker,
+                                  adaptive=False, num_faces=1, calibration="off",
+                                  rgb_input=True, live_stream=False)
+    clock = FrameClock()
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    # Eyes close 5 frames before the 32-bit pts wrap
+    pts = _rtp_pts(2 ** 32 - 40 * TICKS_PER_FRAME, 90)
+    closed_at = alarm_at = None
+    for i, p in enumerate(pts):
+        landmarker.closed = i >= 35
+        result = detector.process(image, clock.timestamp_ms(p, RTP_TIME_BASE))
+        if landmarker.closed and closed_at is None:
+            closed_at = result.timestamp_ms
+        if result.alarm_on:
+            alarm_at = result.timestamp_ms
+            break
+    detector.close()
+
+    assert alarm_at is not None
+    assert alarm_at - closed_at <= EYE_CLOSED_DURATION_MS + 2 * FRAME_MS
@@ -0,0 +1,35 @@
+"""
+tests/test_identity.py
+
+Face identities across large jumps between analysed frames.
+"""
+
+import numpy as np
+
+from src.core.identity import FaceIdentityTracker
+
+
+def _eyes(cx, cy, width=40.0):
+    """(1, 2, 6, 2) eye points of one face centred at (cx, cy)."""
+    offsets = np.linspace(-width / 2, width / 2, 12).reshape(2, 6, 1)
+    points = np.concatenate([cx + offsets, np.full_like(offsets, cy)], axis=2)
+    return points[None].astype(np.float32)
+
+
+def test_single_face_keeps_its_id_after_a_jump():
+    tracker = FaceIdentityTracker(max_faces=1)
+    first = tracker.update(_eyes(100.0, 100.0), 0.0)
+    moved = tracker.update(_eyes(400.0, 150.0), 33.0)     # ~8 eye widths
+    assert moved.tolist() == first.tolist()
+    assert tracker.expired == []
+
+
+def test_allowed_shift_grows_with_time_unseen():
+    tracker = FaceIdentityTracker(max_distance=1.0, distance_step_ms=100.0, max_faces=2)
+    first = tracker.update(_eyes(100.0, 100.0), 0.0)
+    # 2 widths in one frame is another face; after 300 ms unseen it is the same one
+    assert tracker.update(_eyes(180.0, 100.0), 33.0).tolist() != first.tolist()
+
+    tracker = FaceIdentityTracker(max_distance=1.0, distance_step_ms=100.0, max_faces=2)
+    first = tracker.update(_eyes(100.0, 100.0), 0.0)
+    assert tracker.update(_eyes(180.0, 100.0), 300.0).tolist() == first.tolist()